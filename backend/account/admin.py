@@ -1,5 +1,6 @@
 from django.contrib import admin
-from .models import MailjetSettings, PasswordResetOTP, UserProfile
+from django.utils import timezone
+from .models import MailjetSettings, PasswordResetOTP, UserProfile, EmailOutbox
 
 # Register your models here.
 
@@ -39,3 +40,22 @@ class UserProfileAdmin(admin.ModelAdmin):
     list_filter = ('gender', 'city', 'created_at')
     search_fields = ('user__email', 'full_name', 'phone')
     readonly_fields = ('created_at', 'updated_at')
+
+
+@admin.register(EmailOutbox)
+class EmailOutboxAdmin(admin.ModelAdmin):
+    list_display = ('email', 'kind', 'status', 'attempts', 'next_attempt_at', 'sent_at', 'created_at')
+    list_filter = ('status', 'kind', 'created_at')
+    search_fields = ('email',)
+    readonly_fields = ('context', 'attempts', 'claim_token', 'last_error', 'created_at', 'updated_at', 'sent_at')
+    actions = ['retry_now']
+
+    @admin.action(description='Retry selected emails now')
+    def retry_now(self, request, queryset):
+        updated = queryset.exclude(status=EmailOutbox.STATUS_SENT).update(
+            status=EmailOutbox.STATUS_PENDING,
+            attempts=0,
+            next_attempt_at=timezone.now(),
+            claim_token='',
+        )
+        self.message_user(request, f"{updated} email(s) queued for retry.")
@@ -3,3 +3,8 @@ from django.apps import AppConfig
 
 class AccountConfig(AppConfig):
     name = 'account'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        from . import email_templates
+        email_templates.preload()
@@ -0,0 +1,72 @@
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.hashers import make_password, verify_password
+from django.db.models.functions import Lower
+
+UserModel = get_user_model()
+
+# make_password() off the event loop. thread_sensitive=False runs concurrent
+# hashes in the default executor instead of queueing them on one thread.
+amake_password = sync_to_async(make_password, thread_sensitive=False)
+
+
+def normalize_email(email):
+    """Normalize an email address for case-insensitive lookups"""
+    return (email or '').strip().lower()
+
+
+class EmailBackend(ModelBackend):
+    """
+    Authenticate with email and password.
+
+    The user is found with a single query on LOWER(email), which is served by
+    the auth_user_email_lower_idx index, so login does not load the row twice
+    or scan the user table. Called as authenticate(request, email=..., password=...).
+    """
+
+    def _by_email(self, email):
+        return (
+            UserModel._default_manager
+            .annotate(email_lower=Lower('email'))
+            .filter(email_lower=normalize_email(email))
+            .order_by('pk')
+        )
+
+    def get_user_by_email(self, email):
+        return self._by_email(email).first()
+
+    def authenticate(self, request, email=None, password=None, **kwargs):
+        if not email or password is None:
+            return None
+        user = self.get_user_by_email(email)
+        if user is None:
+            # Run the default password hasher once to reduce the timing
+            # difference between an existing and a nonexistent user.
+            UserModel().set_password(password)
+            return None
+        if user.check_password(password) and self.user_can_authenticate(user):
+            return user
+        return None
+
+    async def aauthenticate(self, request, email=None, password=None, **kwargs):
+        """
+        Async authenticate() for async views
+
+        Unlike Django's ModelBackend.aauthenticate, the PBKDF2 work runs in a
+        worker thread so it does not stall the event loop.
+        """
+        if not email or password is None:
+            return None
+        user = await self._by_email(email).afirst()
+        if user is None:
+            await amake_password(password)
+            return None
+        is_correct, must_update = await sync_to_async(verify_password, thread_sensitive=False)(password, user.password)
+        if is_correct and must_update:
+            # Upgrade the stored hash (e.g. after PASSWORD_HASH_ITERATIONS was raised)
+            user.password = await amake_password(password)
+            await user.asave(update_fields=['password'])
+        if is_correct and self.user_can_authenticate(user):
+            return user
+        return None
@@ -0,0 +1,173 @@
+"""
+Profile image pipeline.
+
+update_profile_api only validates an upload (validate_image) and stores it
+with image_status 'pending'. `manage.py process_profile_images` then, off the
+request path, re-encodes the original without EXIF or other metadata (at
+most PROFILE_IMAGE_MAX_DIMENSION px) and writes a square thumbnail for every
+size in PROFILE_IMAGE_SIZES as WebP and JPEG (PNG for transparent images).
+UserProfile.image_url() picks the smallest variant that covers a display size,
+and returns PROFILE_IMAGE_PLACEHOLDER_URL rather than the unprocessed upload.
+"""
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.utils import timezone
+from PIL import Image, ImageOps
+import io
+import logging
+import posixpath
+from .models import UserProfile
+from .profile_cache import cache_profile
+
+logger = logging.getLogger(__name__)
+
+EXTENSIONS = {'JPEG': 'jpg', 'PNG': 'png', 'WEBP': 'webp'}
+
+
+def validate_image(upload):
+    """Raise ValueError unless upload is an acceptable profile image"""
+    if upload.size > settings.PROFILE_IMAGE_MAX_UPLOAD_SIZE:
+        raise ValueError(f"Profile image must be at most {settings.PROFILE_IMAGE_MAX_UPLOAD_SIZE // (1024 * 1024)} MB")
+    try:
+        with Image.open(upload) as image:
+            image_format = image.format
+            width, height = image.size
+            # Checks the file structure without decoding the pixels
+            image.verify()
+    except (OSError, SyntaxError, Image.DecompressionBombError):
+        raise ValueError('Profile image is not a valid image file')
+    finally:
+        upload.seek(0)
+    if image_format not in settings.PROFILE_IMAGE_FORMATS:
+        raise ValueError(f"Unsupported image format. Use one of: {', '.join(settings.PROFILE_IMAGE_FORMATS)}")
+    if width * height > settings.PROFILE_IMAGE_MAX_PIXELS:
+        raise ValueError('Profile image dimensions are too large')
+
+
+def _prepare(image):
+    """Upright RGB/RGBA copy of image with no metadata, and whether it has transparency"""
+    image = ImageOps.exif_transpose(image)
+    has_alpha = image.mode in ('RGBA', 'LA', 'PA') or 'transparency' in image.info
+    image = image.convert('RGBA' if has_alpha else 'RGB')
+    # EXIF, ICC profile, comments...: nothing is written unless it is in info
+    image.info.clear()
+    return image, has_alpha
+
+
+def _encode(image, image_format):
+    buffer = io.BytesIO()
+    if image_format == 'JPEG':
+        image.save(buffer, 'JPEG', quality=85, optimize=True, progressive=True)
+    elif image_format == 'WEBP':
+        image.save(buffer, 'WEBP', quality=80, method=4)
+    else:
+        image.save(buffer, 'PNG', optimize=True)
+    return buffer.getvalue()
+
+
+def image_files(profile):
+    """Storage names of the profile's image and its variants"""
+    if not profile.profile_image:
+        return []
+    names = [profile.profile_image.name]
+    for variant in (profile.image_variants or {}).values():
+        names.extend(variant.values())
+    return names
+
+
+def delete_files(storage, names):
+    """
+    Delete a profile's image files unless another profile still uses them
+
+    Identical uploads share files in content-addressed storage, and so do
+    their variants, so the whole set is kept while any profile uses one of them.
+    """
+    if UserProfile.objects.filter(profile_image__in=names).exists():
+        return
+    for name in names:
+        try:
+            storage.delete(name)
+        except OSError as e:
+            logger.warning(f"Could not delete {name}: {str(e)}")
+
+
+def process_profile_image(profile):
+    """
+    Re-encode profile.profile_image and write its variants
+
+    Returns:
+        bool: False if the profile got a different image meanwhile (nothing is kept)
+    """
+    storage = profile.profile_image.storage
+    original_name = profile.profile_image.name
+    # The storage may shard names into subdirectories; variants go next to upload_to
+    directory = UserProfile._meta.get_field('profile_image').upload_to.rstrip('/')
+    stem = posixpath.splitext(posixpath.basename(original_name))[0]
+
+    with profile.profile_image.open('rb') as f, Image.open(f) as source:
+        image, has_alpha = _prepare(source)
+    fallback = 'PNG' if has_alpha else 'JPEG'
+
+    written = []
+
+    def save(name, image_format, image):
+        written.append(storage.save(f"{name}.{EXTENSIONS[image_format]}", ContentFile(_encode(image, image_format))))
+        return written[-1]
+
+    try:
+        full = image.copy()
+        full.thumbnail((settings.PROFILE_IMAGE_MAX_DIMENSION,) * 2, Image.LANCZOS)
+        new_name = save(posixpath.join(directory, stem), fallback, full)
+        variants = {}
+        for size in settings.PROFILE_IMAGE_SIZES:
+            thumbnail = ImageOps.fit(image, (size, size), Image.LANCZOS)
+            base = posixpath.join(directory, 'variants', f"{stem}_{size}")
+            variants[str(size)] = {
+                'webp': save(base, 'WEBP', thumbnail),
+                fallback.lower(): save(base, fallback, thumbnail),
+            }
+        # Only if the user has not uploaded another image in the meantime
+        updated = UserProfile.objects.filter(pk=profile.pk, profile_image=original_name).update(
+            profile_image=new_name,
+            image_variants=variants,
+            image_status=UserProfile.IMAGE_READY,
+            updated_at=timezone.now(),
+        )
+    except Exception:
+        delete_files(storage, written)
+        raise
+
+    if not updated:
+        delete_files(storage, written)
+        return False
+    # The upload as received, possibly with EXIF location data
+    if new_name != original_name:
+        delete_files(storage, [original_name])
+    # update() bypasses the post_save signal that drops the cached profile; store
+    # the new entry rather than letting a lagging replica rebuild the old one
+    profile.refresh_from_db()
+    cache_profile(profile.user, profile)
+    return True
+
+
+def process_pending(batch_size=20):
+    """
+    Process up to batch_size pending profile images
+
+    Returns:
+        tuple: (processed, failed)
+    """
+    processed = failed = 0
+    pending = UserProfile.objects.filter(image_status=UserProfile.IMAGE_PENDING).order_by('pk')[:batch_size]
+    for profile in pending:
+        if not profile.profile_image:
+            UserProfile.objects.filter(pk=profile.pk, image_status=UserProfile.IMAGE_PENDING).update(image_status='')
+            continue
+        try:
+            process_profile_image(profile)
+            processed += 1
+        except Exception as e:
+            logger.error(f"Error processing profile image of user {profile.user_id}: {str(e)}")
+            UserProfile.objects.filter(pk=profile.pk, profile_image=profile.profile_image.name).update(image_status=UserProfile.IMAGE_FAILED)
+            failed += 1
+    return processed, failed
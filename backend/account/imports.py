@@ -0,0 +1,278 @@
+"""
+Bulk user import from CSV or JSON Lines.
+
+Records are read as a stream and deduplicated in memory against a preloaded
+set of existing emails. Passwords are hashed in a process pool when one is
+asked for (`manage.py import_users`) and inline otherwise (import_users_api,
+which is bounded to USER_IMPORT_API_MAX_ROWS records). Users and UserProfiles
+are inserted with bulk_create one batch at a time, and welcome mails are
+queued in the email outbox for batched delivery.
+
+Lines that cannot be read and rows the database rejects are counted as
+invalid with a per-record error, so one bad row does not stop the import.
+"""
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+from dataclasses import dataclass, field
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import DataError, IntegrityError, transaction
+from django.db.models.functions import Lower
+from datetime import datetime
+import csv
+import django
+import json
+import logging
+import time
+from .models import EmailOutbox, UserProfile
+from .outbox import queue_emails
+from .user_directory import clear_user_count
+
+logger = logging.getLogger(__name__)
+
+IMPORT_FORMATS = ('csv', 'jsonl')
+
+# The email doubles as the username
+USERNAME_MAX_LENGTH = User._meta.get_field('username').max_length
+
+PROFILE_FIELDS = ('full_name', 'gender', 'city', 'area', 'street_address', 'phone', 'alternate_phone', 'delivery_instructions')
+
+
+@dataclass
+class ImportResult:
+    created: int = 0
+    existing: int = 0
+    duplicates: int = 0
+    invalid: int = 0
+    truncated: bool = False
+    elapsed: float = 0.0
+    errors: list = field(default_factory=list)
+
+    def add_error(self, record_number, message, max_errors):
+        """Count an invalid record, keeping its message while under max_errors"""
+        self.invalid += 1
+        if len(self.errors) < max_errors:
+            self.errors.append(f"Record {record_number}: {message}")
+
+    @property
+    def rows(self):
+        return self.created + self.existing + self.duplicates + self.invalid
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.elapsed if self.elapsed else 0.0
+
+    def as_dict(self):
+        return {
+            'rows': self.rows,
+            'created': self.created,
+            'existing': self.existing,
+            'duplicates': self.duplicates,
+            'invalid': self.invalid,
+            'truncated': self.truncated,
+            'elapsed_seconds': round(self.elapsed, 3),
+            'rows_per_second': round(self.rows_per_second, 1),
+            'errors': self.errors,
+        }
+
+
+class InvalidRecord(str):
+    """A line that could not be read, yielded in place of its record"""
+
+
+def _decode_lines(stream, bad):
+    """Text lines of a binary stream; lines that are not UTF-8 go to bad instead"""
+    for line_number, line in enumerate(stream, start=1):
+        try:
+            yield line.decode('utf-8-sig')
+        except UnicodeDecodeError:
+            bad.append(InvalidRecord(f"Line {line_number} is not valid UTF-8"))
+
+
+def iter_records(stream, import_format='csv'):
+    """
+    Yield one dict per record from a binary or text stream
+
+    Lines that cannot be decoded or parsed are yielded as InvalidRecord, so
+    the caller can report them and carry on.
+    """
+    bad = []
+    if isinstance(stream.read(0), bytes):
+        # Line by line, so this also works on uploads and request bodies
+        stream = _decode_lines(stream, bad)
+    if import_format == 'jsonl':
+        for line in stream:
+            yield from bad
+            bad.clear()
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError as e:
+                yield InvalidRecord(f"Invalid JSON: {str(e)}")
+    else:
+        reader = csv.DictReader(stream)
+        while True:
+            try:
+                row = next(reader)
+            except StopIteration:
+                break
+            except csv.Error as e:
+                row = InvalidRecord(f"Invalid CSV: {str(e)}")
+            yield from bad
+            bad.clear()
+            yield row
+    yield from bad
+
+
+def _clean(record):
+    """Normalized record dict, or an error message string"""
+    if isinstance(record, InvalidRecord):
+        return str(record)
+    if not isinstance(record, dict):
+        return "Record is not an object"
+    email = str(record.get('email') or '').strip()
+    if '@' not in email or '.' not in email.split('@')[-1]:
+        return f"Invalid email: {email!r}"
+    email = User.objects.normalize_email(email)
+    if len(email) > USERNAME_MAX_LENGTH:
+        return f"Email longer than {USERNAME_MAX_LENGTH} characters: {email[:40]!r}..."
+    password = record.get('password') or None
+    if password is not None and len(str(password)) < 8:
+        return f"Password for {email} must be at least 8 characters long"
+
+    name = str(record.get('name') or record.get('full_name') or '').strip()
+    profile = {name_: str(record.get(name_) or '').strip() for name_ in PROFILE_FIELDS}
+    profile['full_name'] = profile['full_name'] or name
+    date_of_birth = str(record.get('date_of_birth') or '').strip()
+    try:
+        profile['date_of_birth'] = datetime.strptime(date_of_birth, '%Y-%m-%d').date() if date_of_birth else None
+    except ValueError:
+        profile['date_of_birth'] = None
+
+    return {
+        'email': email,
+        'name': name,
+        'password': None if password is None else str(password),
+        'profile': profile,
+    }
+
+
+def existing_emails():
+    """Lowercased emails and usernames already in the database"""
+    emails = set(User.objects.annotate(email_lower=Lower('email')).values_list('email_lower', flat=True).iterator(chunk_size=10000))
+    emails.update(User.objects.annotate(username_lower=Lower('username')).values_list('username_lower', flat=True).iterator(chunk_size=10000))
+    return emails
+
+
+def _hash_passwords(batch, pool=None):
+    """Password hashes for a batch; only real passwords are hashed (in the pool, if any)"""
+    hashes = [None] * len(batch)
+    positions = [i for i, record in enumerate(batch) if record['password'] is not None]
+    passwords = [batch[i]['password'] for i in positions]
+    if pool is None:
+        hashed = map(make_password, passwords)
+    else:
+        hashed = pool.map(make_password, passwords, chunksize=max(1, len(passwords) // 32))
+    for i, password_hash in zip(positions, hashed):
+        hashes[i] = password_hash
+    # No password: unusable, as set_unusable_password() would make it
+    return [make_password(None) if password_hash is None else password_hash for password_hash in hashes]
+
+
+def _insert_batch(batch, hashes, result, send_welcome, max_errors):
+    users = [
+        User(username=record['email'], email=record['email'], first_name=record['name'][:150], password=password_hash)
+        for record, password_hash in zip(batch, hashes)
+    ]
+    try:
+        with transaction.atomic():
+            User.objects.bulk_create(users)
+            if any(user.pk is None for user in users):
+                # Backend cannot return primary keys from bulk inserts
+                by_username = dict(User.objects.filter(username__in=[u.username for u in users]).values_list('username', 'id'))
+                for user in users:
+                    user.pk = by_username[user.username]
+            UserProfile.objects.bulk_create(
+                UserProfile(user_id=user.pk, **record['profile']) for user, record in zip(users, batch)
+            )
+    except (IntegrityError, DataError):
+        # A concurrent signup took one of the emails, or a value does not fit
+        # its column; insert row by row to find out which
+        created = []
+        for user, record in zip(users, batch):
+            try:
+                with transaction.atomic():
+                    user.pk = None
+                    user.save()
+                    UserProfile.objects.create(user=user, **record['profile'])
+                created.append(user)
+            except IntegrityError:
+                result.existing += 1
+            except DataError as e:
+                result.add_error(record['number'], f"Rejected by the database: {str(e).strip()}", max_errors)
+        users = created
+
+    result.created += len(users)
+    if send_welcome and users:
+        queue_emails(EmailOutbox.KIND_CONFIRMATION, [(user.email, {'user_name': user.first_name or None}) for user in users])
+
+
+def import_users(records, batch_size=1000, processes=None, send_welcome=True, max_errors=100, max_rows=None):
+    """
+    Create users (with profiles) from an iterable of record dicts
+
+    Args:
+        records: dicts with email and optional name, password and profile fields
+        batch_size: rows hashed and inserted per batch
+        processes: size of the password hashing pool; None or 1 hashes inline
+        send_welcome: queue a confirmation email for every created user
+        max_errors: most error messages kept in the result
+        max_rows: stop after this many records (result.truncated is set)
+
+    Returns:
+        ImportResult
+    """
+    result = ImportResult()
+    start = time.perf_counter()
+    existing = existing_emails()
+    imported = set()
+
+    use_pool = processes is not None and processes > 1
+    with ProcessPoolExecutor(max_workers=processes, initializer=django.setup) if use_pool else nullcontext() as pool:
+        batch = []
+
+        def flush():
+            _insert_batch(batch, _hash_passwords(batch, pool), result, send_welcome, max_errors)
+            batch.clear()
+
+        for line_number, record in enumerate(records, start=1):
+            if max_rows is not None and line_number > max_rows:
+                result.truncated = True
+                if len(result.errors) < max_errors:
+                    result.errors.append(f"Stopped after {max_rows} records")
+                break
+            cleaned = _clean(record)
+            if isinstance(cleaned, str):
+                result.add_error(line_number, cleaned, max_errors)
+                continue
+            key = cleaned['email'].lower()
+            if key in imported:
+                result.duplicates += 1
+                continue
+            if key in existing:
+                result.existing += 1
+                continue
+            imported.add(key)
+            cleaned['number'] = line_number
+            batch.append(cleaned)
+            if len(batch) >= batch_size:
+                flush()
+        if batch:
+            flush()
+
+    clear_user_count()
+    result.elapsed = time.perf_counter() - start
+    logger.info(f"Imported {result.created} users ({result.rows_per_second:.0f} rows/s)")
+    return result
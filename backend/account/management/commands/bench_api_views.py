@@ -0,0 +1,397 @@
+import asyncio
+import json
+import time
+from datetime import timedelta
+from asgiref.sync import iscoroutinefunction
+from django.contrib.auth import authenticate
+from django.contrib.auth.models import AnonymousUser, User
+from django.core.management.base import BaseCommand
+from django.http import JsonResponse
+from django.test import RequestFactory, override_settings
+from django.utils import timezone
+from django.views.decorators.csrf import csrf_exempt
+from account import views
+from account.models import EmailOutbox, PasswordResetOTP
+
+EMAIL_DOMAIN = 'bench-api-views.invalid'
+PASSWORD = 'bench-password-123'
+
+
+# Verbatim copies of the function views the ApiView ports replaced, from before
+# the port (JsonResponse, CORS headers and all). Only the synchronous Mailjet
+# call is stubbed out: the ported views queue the mail in the outbox instead.
+
+def send_confirmation_email(email, name):
+    return True, None
+
+
+def json_response_cors(data, status=200):
+    """Helper function to create JSON response with CORS headers"""
+    response = JsonResponse(data, status=status)
+    response["Access-Control-Allow-Origin"] = "*"
+    response["Access-Control-Allow-Methods"] = "GET, POST, PUT, DELETE, OPTIONS"
+    response["Access-Control-Allow-Headers"] = "Content-Type, Authorization"
+    return response
+
+
+@csrf_exempt
+def legacy_signup_api(request):
+    if request.method == 'OPTIONS':
+        response = JsonResponse({})
+        response["Access-Control-Allow-Origin"] = "*"
+        response["Access-Control-Allow-Methods"] = "GET, POST, PUT, DELETE, OPTIONS"
+        response["Access-Control-Allow-Headers"] = "Content-Type, Authorization"
+        return response
+
+    if request.method != 'POST':
+        return json_response_cors({
+            'success': False,
+            'message': 'Method not allowed'
+        }, status=405)
+
+    if request.user.is_authenticated:
+        return json_response_cors({
+            'success': False,
+            'message': 'You are already logged in. Please logout first to create a new account.'
+        }, status=403)
+
+    try:
+        data = json.loads(request.body)
+        name = data.get('name', '').strip()
+        email = data.get('email', '').strip()
+        password = data.get('password', '')
+        confirm_password = data.get('confirm-password', '')
+
+        if not name or not email or not password or not confirm_password:
+            return json_response_cors({
+                'success': False,
+                'message': 'All fields are required'
+            }, status=400)
+
+        if password != confirm_password:
+            return json_response_cors({
+                'success': False,
+                'message': 'Passwords do not match'
+            }, status=400)
+
+        if len(password) < 8:
+            return json_response_cors({
+                'success': False,
+                'message': 'Password must be at least 8 characters long'
+            }, status=400)
+
+        if User.objects.filter(username=email).exists():
+            return json_response_cors({
+                'success': False,
+                'message': 'User with this email already exists'
+            }, status=400)
+
+        if User.objects.filter(email=email).exists():
+            return json_response_cors({
+                'success': False,
+                'message': 'User with this email already exists'
+            }, status=400)
+
+        user = User.objects.create_user(
+            username=email,
+            email=email,
+            password=password,
+            first_name=name
+        )
+
+        email_sent, email_error = send_confirmation_email(email, name)
+
+        return json_response_cors({
+            'success': True,
+            'message': 'User registered successfully',
+            'user': {
+                'id': user.id,
+                'name': user.first_name,
+                'email': user.email,
+                'username': user.username
+            }
+        }, status=201)
+
+    except json.JSONDecodeError:
+        return json_response_cors({
+            'success': False,
+            'message': 'Invalid JSON data'
+        }, status=400)
+    except Exception as e:
+        return json_response_cors({
+            'success': False,
+            'message': str(e)
+        }, status=500)
+
+
+@csrf_exempt
+def legacy_login_api(request):
+    if request.method == 'OPTIONS':
+        response = JsonResponse({})
+        response["Access-Control-Allow-Origin"] = "*"
+        response["Access-Control-Allow-Methods"] = "GET, POST, PUT, DELETE, OPTIONS"
+        response["Access-Control-Allow-Headers"] = "Content-Type, Authorization"
+        return response
+
+    if request.method != 'POST':
+        return json_response_cors({
+            'success': False,
+            'message': 'Method not allowed'
+        }, status=405)
+
+    if request.user.is_authenticated:
+        return json_response_cors({
+            'success': False,
+            'message': 'You are already logged in. Please logout first.'
+        }, status=403)
+
+    try:
+        data = json.loads(request.body)
+        email = data.get('email', '').strip()
+        password = data.get('password', '')
+
+        if not email or not password:
+            return json_response_cors({
+                'success': False,
+                'message': 'Email and password are required'
+            }, status=400)
+
+        try:
+            user = User.objects.get(email=email)
+        except User.DoesNotExist:
+            return json_response_cors({
+                'success': False,
+                'message': 'Invalid email or password'
+            }, status=401)
+
+        user = authenticate(request, username=user.username, password=password)
+
+        if user is not None:
+            if user.is_active:
+                return json_response_cors({
+                    'success': True,
+                    'message': 'Login successful',
+                    'user': {
+                        'id': user.id,
+                        'name': user.first_name,
+                        'email': user.email,
+                        'username': user.username
+                    }
+                }, status=200)
+            else:
+                return json_response_cors({
+                    'success': False,
+                    'message': 'Your account has been deactivated'
+                }, status=403)
+        else:
+            return json_response_cors({
+                'success': False,
+                'message': 'Invalid email or password'
+            }, status=401)
+
+    except json.JSONDecodeError:
+        return json_response_cors({
+            'success': False,
+            'message': 'Invalid JSON data'
+        }, status=400)
+    except Exception as e:
+        return json_response_cors({
+            'success': False,
+            'message': str(e)
+        }, status=500)
+
+
+@csrf_exempt
+def legacy_verify_otp(request):
+    if request.method == 'OPTIONS':
+        response = JsonResponse({})
+        response["Access-Control-Allow-Origin"] = "*"
+        response["Access-Control-Allow-Methods"] = "GET, POST, PUT, DELETE, OPTIONS"
+        response["Access-Control-Allow-Headers"] = "Content-Type, Authorization"
+        return response
+
+    if request.method != 'POST':
+        return json_response_cors({
+            'success': False,
+            'message': 'Method not allowed'
+        }, status=405)
+
+    try:
+        data = json.loads(request.body)
+        email = data.get('email', '').strip().lower()
+        otp = data.get('otp', '').strip()
+
+        if not email or not otp:
+            return json_response_cors({
+                'success': False,
+                'message': 'Email and OTP are required'
+            }, status=400)
+
+        if len(otp) != 6:
+            return json_response_cors({
+                'success': False,
+                'message': 'OTP must be 6 digits'
+            }, status=400)
+
+        try:
+            otp_record = PasswordResetOTP.objects.filter(
+                email=email,
+                otp=otp,
+                is_verified=False
+            ).order_by('-created_at').first()
+        except PasswordResetOTP.DoesNotExist:
+            otp_record = None
+
+        if not otp_record:
+            return json_response_cors({
+                'success': False,
+                'message': 'Invalid or expired OTP'
+            }, status=400)
+
+        if otp_record.is_expired():
+            return json_response_cors({
+                'success': False,
+                'message': 'OTP has expired. Please request a new one.'
+            }, status=400)
+
+        otp_record.is_verified = True
+        otp_record.save()
+
+        return json_response_cors({
+            'success': True,
+            'message': 'OTP verified successfully',
+            'token': str(otp_record.id)
+        }, status=200)
+
+    except json.JSONDecodeError:
+        return json_response_cors({
+            'success': False,
+            'message': 'Invalid JSON data'
+        }, status=400)
+    except Exception as e:
+        return json_response_cors({
+            'success': False,
+            'message': str(e)
+        }, status=500)
+
+
+def _signup(run, i):
+    email = f"signup-{run}-{i}@{EMAIL_DOMAIN}"
+    return {'name': 'Bench User', 'email': email, 'password': PASSWORD, 'confirm-password': PASSWORD}
+
+
+def _otp_email(run, i):
+    return f"otp-{run}-{i}@{EMAIL_DOMAIN}"
+
+
+# (name, legacy view, ported view, URL, body(run, i) or a fixed body; None
+# sends malformed JSON). Runs are numbered apart for the two views, so
+# requests that create rows never collide.
+SCENARIOS = [
+    ('signup: created', legacy_signup_api, views.signup_api, '/account/api/signup/', _signup),
+    ('signup: email taken', legacy_signup_api, views.signup_api, '/account/api/signup/',
+     {'name': 'Bench User', 'email': f"login@{EMAIL_DOMAIN}", 'password': PASSWORD, 'confirm-password': PASSWORD}),
+    ('signup: passwords differ', legacy_signup_api, views.signup_api, '/account/api/signup/',
+     {'name': 'Bench User', 'email': 'bench@example.com', 'password': 'password-123', 'confirm-password': 'password-124'}),
+    ('login: success', legacy_login_api, views.login_api, '/account/api/login/',
+     {'email': f"login@{EMAIL_DOMAIN}", 'password': PASSWORD}),
+    ('login: wrong password', legacy_login_api, views.login_api, '/account/api/login/',
+     {'email': f"login@{EMAIL_DOMAIN}", 'password': 'wrong-password'}),
+    ('verify-otp: verified', legacy_verify_otp, views.forgot_password_verify_otp, '/account/api/forgot-password/verify-otp/',
+     lambda run, i: {'email': _otp_email(run, i), 'otp': '123456'}),
+    ('verify-otp: bad length', legacy_verify_otp, views.forgot_password_verify_otp, '/account/api/forgot-password/verify-otp/',
+     {'email': ' Bench@Example.com ', 'otp': '12345'}),
+    ('verify-otp: malformed JSON', legacy_verify_otp, views.forgot_password_verify_otp, '/account/api/forgot-password/verify-otp/',
+     None),
+]
+
+
+async def _anonymous():
+    return AnonymousUser()
+
+
+class Command(BaseCommand):
+    help = 'Compare per-request time of the account API views with the function views they replaced'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=1000, help='Requests per run; the best of 3 runs is reported (default: 1000)')
+
+    def _requests(self, factory, url, body, run, count):
+        requests = []
+        for i in range(count):
+            data = body(run, i) if callable(body) else body
+            request = factory.post(url, '{"email": ' if data is None else json.dumps(data), content_type='application/json')
+            # What AuthenticationMiddleware and TokenAuthMiddleware would set
+            request.user = AnonymousUser()
+            request.auser = _anonymous
+            request.token_user_id = None
+            requests.append(request)
+        return requests
+
+    def _prepare(self, name, run, count):
+        if name == 'verify-otp: verified':
+            user = User.objects.get(email=f"login@{EMAIL_DOMAIN}")
+            expires_at = timezone.now() + timedelta(hours=1)
+            PasswordResetOTP.objects.bulk_create(
+                PasswordResetOTP(user=user, email=_otp_email(run, i), otp='123456', expires_at=expires_at) for i in range(count)
+            )
+
+    def _time(self, view, requests):
+        """Microseconds per request, running async views on one event loop as ASGI would"""
+        if iscoroutinefunction(view):
+            async def run_all():
+                start = time.perf_counter()
+                for request in requests:
+                    await view(request)
+                return time.perf_counter() - start
+            elapsed = asyncio.run(run_all())
+        else:
+            start = time.perf_counter()
+            for request in requests:
+                view(request)
+            elapsed = time.perf_counter() - start
+        return elapsed / len(requests) * 1e6
+
+    def _call(self, view, request):
+        return asyncio.run(view(request)) if iscoroutinefunction(view) else view(request)
+
+    def _outcome(self, response):
+        return response.status_code, json.loads(response.content).get('message')
+
+    def handle(self, *args, **options):
+        count = options['requests']
+        factory = RequestFactory()
+        self.cleanup()
+
+        # A cheap hasher, so password hashing does not drown the request handling
+        with override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher']):
+            User.objects.create_user(username=f"login@{EMAIL_DOMAIN}", email=f"login@{EMAIL_DOMAIN}", password=PASSWORD)
+            try:
+                self.stdout.write(f"{'Scenario':<28} {'function view':>14} {'ApiView':>10} {'Speedup':>8}")
+                for name, legacy, ported, url, body in SCENARIOS:
+                    # Both views must answer a fresh request the same way
+                    self._prepare(name, 'check-legacy', 1)
+                    self._prepare(name, 'check-ported', 1)
+                    expected = self._outcome(self._call(legacy, self._requests(factory, url, body, 'check-legacy', 1)[0]))
+                    actual = self._outcome(self._call(ported, self._requests(factory, url, body, 'check-ported', 1)[0]))
+                    if expected != actual:
+                        self.stderr.write(f"{name}: responses differ ({expected!r} vs {actual!r})")
+
+                    timings = {}
+                    for label, view in (('legacy', legacy), ('ported', ported)):
+                        best = None
+                        for attempt in range(3):
+                            run = f"{label}{attempt}"
+                            self._prepare(name, run, count)
+                            elapsed = self._time(view, self._requests(factory, url, body, run, count))
+                            best = elapsed if best is None else min(best, elapsed)
+                        timings[label] = best
+                    before, after = timings['legacy'], timings['ported']
+                    self.stdout.write(f"{name:<28} {before:>11.1f} us {after:>7.1f} us {before / after:>7.2f}x")
+            finally:
+                self.cleanup()
+
+    def cleanup(self):
+        EmailOutbox.objects.filter(email__endswith=f"@{EMAIL_DOMAIN}").delete()
+        PasswordResetOTP.objects.filter(email__endswith=f"@{EMAIL_DOMAIN}").delete()
+        User.objects.filter(email__endswith=f"@{EMAIL_DOMAIN}").delete()
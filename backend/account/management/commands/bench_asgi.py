@@ -0,0 +1,154 @@
+import asyncio
+import io
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from django.contrib.auth.models import User
+from django.core.asgi import get_asgi_application
+from django.core.management.base import BaseCommand
+from django.core.wsgi import get_wsgi_application
+from django.db import close_old_connections
+from django.test import override_settings
+from account.models import UserProfile
+from account.tokens import issue_tokens
+
+EMAIL = 'bench-asgi@bench-asgi.invalid'
+
+# name -> (method, path, body); the profile scenario adds the bench user's token
+SCENARIOS = {
+    'profile': ('GET', '/account/api/profile/', None),
+    'send-otp': ('POST', '/account/api/forgot-password/send-otp/', {'email': 'nobody@bench-asgi.invalid'}),
+}
+
+
+def _percentile(latencies, fraction):
+    return latencies[min(len(latencies) - 1, int(len(latencies) * fraction))]
+
+
+def run_wsgi(method, path, body, headers, requests, concurrency):
+    """Drive the WSGI handler from a thread pool (like a threaded WSGI server)"""
+    application = get_wsgi_application()
+    payload = json.dumps(body).encode() if body is not None else b''
+    environ = {
+        'REQUEST_METHOD': method,
+        'PATH_INFO': path,
+        'QUERY_STRING': '',
+        'SERVER_NAME': 'localhost',
+        'SERVER_PORT': '80',
+        'REMOTE_ADDR': '127.0.0.1',
+        'CONTENT_TYPE': 'application/json',
+        'CONTENT_LENGTH': str(len(payload)),
+        'wsgi.url_scheme': 'http',
+        **{f"HTTP_{name.upper().replace('-', '_')}": value for name, value in headers.items()},
+    }
+
+    def request(_):
+        start = time.perf_counter()
+        status = []
+        response = application({**environ, 'wsgi.input': io.BytesIO(payload)}, lambda s, h: status.append(int(s[:3])))
+        try:
+            b''.join(response)
+        finally:
+            response.close()
+        return time.perf_counter() - start, status[0]
+
+    try:
+        with ThreadPoolExecutor(max_workers=concurrency, initializer=close_old_connections) as pool:
+            start = time.perf_counter()
+            results = list(pool.map(request, range(requests)))
+            return time.perf_counter() - start, results
+    finally:
+        close_old_connections()
+
+
+async def _arun_asgi(method, path, body, headers, requests, concurrency):
+    application = get_asgi_application()
+    payload = json.dumps(body).encode() if body is not None else b''
+    scope = {
+        'type': 'http',
+        'asgi': {'version': '3.0'},
+        'http_version': '1.1',
+        'method': method,
+        'scheme': 'http',
+        'path': path,
+        'raw_path': path.encode(),
+        'query_string': b'',
+        'root_path': '',
+        'headers': [
+            (b'host', b'localhost'),
+            (b'content-type', b'application/json'),
+            (b'content-length', str(len(payload)).encode()),
+            *((name.lower().encode(), value.encode()) for name, value in headers.items()),
+        ],
+        'client': ('127.0.0.1', 50000),
+        'server': ('localhost', 80),
+    }
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def request():
+        async with semaphore:
+            start = time.perf_counter()
+            messages = [{'type': 'http.request', 'body': payload, 'more_body': False}]
+            status = []
+            done = asyncio.Event()
+
+            async def receive():
+                if messages:
+                    return messages.pop()
+                # The client never disconnects; Django cancels this wait
+                await asyncio.Future()
+
+            async def send(message):
+                if message['type'] == 'http.response.start':
+                    status.append(message['status'])
+                elif not message.get('more_body'):
+                    done.set()
+
+            await application(dict(scope), receive, send)
+            await done.wait()
+            return time.perf_counter() - start, status[0]
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*(request() for _ in range(requests)))
+    return time.perf_counter() - start, results
+
+
+def run_asgi(method, path, body, headers, requests, concurrency):
+    """Drive the ASGI handler on one event loop (like a single uvicorn worker)"""
+    return asyncio.run(_arun_asgi(method, path, body, headers, requests, concurrency))
+
+
+class Command(BaseCommand):
+    help = 'Load-test the account API through the ASGI and WSGI handlers and compare throughput and latency'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scenario', choices=sorted(SCENARIOS), action='append', help='Scenario to run, repeatable (default: all)')
+        parser.add_argument('--requests', type=int, default=2000, help='Requests per scenario and handler (default: 2000)')
+        parser.add_argument('--concurrency', type=int, default=50, help='Requests in flight; WSGI gets this many threads (default: 50)')
+
+    def handle(self, *args, **options):
+        requests, concurrency = options['requests'], options['concurrency']
+
+        User.objects.filter(email=EMAIL).delete()
+        user = User.objects.create_user(username=EMAIL, email=EMAIL, first_name='Bench')
+        UserProfile.objects.get_or_create(user=user, defaults={'city': 'Dhaka'})
+        token_headers = {'Authorization': f"Bearer {issue_tokens(user)['access_token']}"}
+
+        self.stdout.write(f"{requests} requests per run, {concurrency} in flight")
+        self.stdout.write(f"{'Scenario':<10} {'Handler':<5} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'non-2xx':>8}")
+        try:
+            # Every request comes from one address; measure the handlers, not the rate limiter
+            with override_settings(RATE_LIMIT_ENABLED=False):
+                for name in options['scenario'] or sorted(SCENARIOS):
+                    method, path, body = SCENARIOS[name]
+                    headers = token_headers if name == 'profile' else {}
+                    for handler, run in (('wsgi', run_wsgi), ('asgi', run_asgi)):
+                        elapsed, results = run(method, path, body, headers, requests, concurrency)
+                        latencies = sorted(latency for latency, _ in results)
+                        failed = sum(1 for _, status in results if not 200 <= status < 300)
+                        self.stdout.write(
+                            f"{name:<10} {handler:<5} {len(results) / elapsed:>8.0f} "
+                            f"{_percentile(latencies, 0.5) * 1000:>8.1f} {_percentile(latencies, 0.99) * 1000:>8.1f} {failed:>8}"
+                        )
+        finally:
+            User.objects.filter(email=EMAIL).delete()
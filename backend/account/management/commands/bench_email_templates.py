@@ -0,0 +1,30 @@
+import time
+from django.core.management.base import BaseCommand
+from django.template.loader import render_to_string
+from account import email_templates
+from account.email_templates import EMAIL_TEMPLATE_NAMES, render_email
+
+
+class Command(BaseCommand):
+    help = 'Compare renders per second of render_to_string and the pre-rendered email templates'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=5000, help='Renders per template and method (default: 5000)')
+
+    def _rate(self, render, template_name, iterations):
+        context = {'user_name': 'Benchmark User', 'otp': '123456', 'email': 'bench@example.com'}
+        render(template_name, context)
+        start = time.perf_counter()
+        for _ in range(iterations):
+            render(template_name, context)
+        return iterations / (time.perf_counter() - start)
+
+    def handle(self, *args, **options):
+        iterations = options['iterations']
+        email_templates.preload()
+
+        self.stdout.write(f"{'Template':<45} {'render_to_string':>18} {'render_email':>14} {'Speedup':>8}")
+        for template_name in EMAIL_TEMPLATE_NAMES:
+            before = self._rate(render_to_string, template_name, iterations)
+            after = self._rate(render_email, template_name, iterations)
+            self.stdout.write(f"{template_name:<45} {before:>14,.0f}/s {after:>12,.0f}/s {after / before:>7.1f}x")
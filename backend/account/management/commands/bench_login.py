@@ -0,0 +1,65 @@
+import os
+import time
+from multiprocessing import get_context
+from django.contrib.auth.hashers import get_hasher
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.test import Client, override_settings
+
+EMAIL_DOMAIN = 'bench-login.invalid'
+PASSWORD = 'bench-password-123'
+
+
+def _run_logins(args):
+    """Worker process: perform logins through login_api and return (ok, elapsed)"""
+    worker, count, users = args
+    connections.close_all()
+    client = Client(HTTP_HOST='localhost')
+    ok = 0
+    start = time.perf_counter()
+    # Every request comes from one address; measure hashing, not the rate limiter
+    with override_settings(RATE_LIMIT_ENABLED=False):
+        for i in range(count):
+            email = f'user{(worker * count + i) % users}@{EMAIL_DOMAIN}'
+            response = client.post('/account/api/login/', {'email': email, 'password': PASSWORD}, content_type='application/json')
+            ok += response.status_code == 200
+    return ok, time.perf_counter() - start
+
+
+class Command(BaseCommand):
+    help = 'Load-test login_api and report logins per second per core'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100, help='Temporary users to create (default: 100)')
+        parser.add_argument('--logins', type=int, default=50, help='Logins per process (default: 50)')
+        parser.add_argument('--processes', type=int, default=os.cpu_count() or 1, help='Worker processes (default: CPU count)')
+
+    def handle(self, *args, **options):
+        users, logins, processes = options['users'], options['logins'], options['processes']
+
+        hasher = get_hasher()
+        start = time.perf_counter()
+        password_hash = hasher.encode(PASSWORD, hasher.salt())
+        hash_ms = (time.perf_counter() - start) * 1000
+        self.stdout.write(f"Hasher {hasher.algorithm}, {getattr(hasher, 'iterations', '-')} iterations: {hash_ms:.1f} ms per hash")
+
+        User.objects.filter(email__endswith=f'@{EMAIL_DOMAIN}').delete()
+        User.objects.bulk_create(
+            User(username=f'user{i}@{EMAIL_DOMAIN}', email=f'user{i}@{EMAIL_DOMAIN}', password=password_hash)
+            for i in range(users)
+        )
+        connections.close_all()
+
+        try:
+            with get_context('fork').Pool(processes) as pool:
+                start = time.perf_counter()
+                results = pool.map(_run_logins, [(worker, logins, users) for worker in range(processes)])
+                wall = time.perf_counter() - start
+        finally:
+            User.objects.filter(email__endswith=f'@{EMAIL_DOMAIN}').delete()
+
+        total_ok = sum(ok for ok, _ in results)
+        per_process = [ok / elapsed for ok, elapsed in results if elapsed]
+        self.stdout.write(f"{total_ok}/{logins * processes} logins succeeded in {wall:.2f}s with {processes} process(es)")
+        self.stdout.write(f"Throughput: {total_ok / wall:.1f} logins/s total, {sum(per_process) / len(per_process):.1f} logins/s per core")
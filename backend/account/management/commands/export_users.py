@@ -0,0 +1,27 @@
+import sys
+from django.core.management.base import BaseCommand
+from account.exports import EXPORT_FORMATS, iter_export
+
+
+class Command(BaseCommand):
+    help = 'Stream all users and profiles to a CSV or JSON Lines file (or stdout)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=EXPORT_FORMATS, default='csv')
+        parser.add_argument('--gzip', action='store_true', help='Compress the output with gzip')
+        parser.add_argument('--output', '-o', help='Output file (default: stdout)')
+        parser.add_argument('--chunk-size', type=int, default=2000, help='Rows fetched per database round trip (default: 2000)')
+
+    def handle(self, *args, **options):
+        chunks = iter_export(options['format'], compress=options['gzip'], chunk_size=options['chunk_size'])
+        if options['output']:
+            written = 0
+            with open(options['output'], 'wb') as output:
+                for chunk in chunks:
+                    output.write(chunk)
+                    written += len(chunk)
+            self.stderr.write(f"Wrote {written} bytes to {options['output']}")
+        else:
+            for chunk in chunks:
+                sys.stdout.buffer.write(chunk)
+            sys.stdout.buffer.flush()
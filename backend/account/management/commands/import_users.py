@@ -0,0 +1,36 @@
+import os
+from django.core.management.base import BaseCommand, CommandError
+from account.imports import IMPORT_FORMATS, import_users, iter_records
+
+
+class Command(BaseCommand):
+    help = 'Bulk-create users and profiles from a CSV or JSON Lines file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV or JSON Lines file to import')
+        parser.add_argument('--format', choices=IMPORT_FORMATS, help='Input format (default: from the file extension, else csv)')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows hashed and inserted per batch (default: 1000)')
+        parser.add_argument('--processes', type=int, default=os.cpu_count(), help='Password hashing processes; 1 hashes inline (default: CPU count)')
+        parser.add_argument('--no-welcome-email', action='store_true', help='Do not queue confirmation emails')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        import_format = options['format'] or ('jsonl' if path.endswith(('.jsonl', '.ndjson')) else 'csv')
+        try:
+            with open(path, 'rb') as stream:
+                result = import_users(
+                    iter_records(stream, import_format),
+                    batch_size=options['batch_size'],
+                    processes=options['processes'],
+                    send_welcome=not options['no_welcome_email'],
+                )
+        except (OSError, ValueError) as e:
+            raise CommandError(str(e))
+
+        for error in result.errors:
+            self.stderr.write(error)
+        self.stdout.write(self.style.SUCCESS(
+            f"{result.created} created, {result.existing} already existed, "
+            f"{result.duplicates} duplicates, {result.invalid} invalid "
+            f"({result.rows} rows in {result.elapsed:.2f}s, {result.rows_per_second:.0f} rows/s)"
+        ))
@@ -0,0 +1,73 @@
+import json
+import random
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = 'Run a local stand-in for the Mailjet v3.1 send API (set MAILJET_API_URL to point at it)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8025)
+        parser.add_argument('--fail-rate', type=float, default=0.0, help='Fraction of requests answered with HTTP 500 (0-1)')
+        parser.add_argument('--latency', type=float, default=0.0, help='Seconds to wait before answering each request')
+
+    def handle(self, *args, **options):
+        stdout = self.stdout
+        fail_rate = options['fail_rate']
+        latency = options['latency']
+
+        class MailjetStubHandler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            disable_nagle_algorithm = True
+
+            def _reply(self, status, payload):
+                body = json.dumps(payload).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                raw = self.rfile.read(length)
+                if latency:
+                    time.sleep(latency)
+
+                if not self.path.rstrip('/').endswith('/send'):
+                    self._reply(404, {'ErrorMessage': 'Not found'})
+                    return
+                if random.random() < fail_rate:
+                    self._reply(500, {'ErrorMessage': 'Stub server simulated failure'})
+                    return
+                try:
+                    messages = json.loads(raw).get('Messages', [])
+                except (ValueError, AttributeError):
+                    self._reply(400, {'ErrorMessage': 'Invalid JSON payload'})
+                    return
+
+                results = []
+                for message in messages:
+                    recipients = [
+                        {'Email': to.get('Email'), 'MessageUUID': str(uuid.uuid4()), 'MessageID': random.randint(10 ** 15, 10 ** 16)}
+                        for to in message.get('To', [])
+                    ]
+                    results.append({'Status': 'success', 'To': recipients})
+                    stdout.write(f"Accepted '{message.get('Subject', '')}' for {', '.join(r['Email'] or '' for r in recipients)}")
+                self._reply(200, {'Messages': results})
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer((options['host'], options['port']), MailjetStubHandler)
+        self.stdout.write(f"Mailjet stub listening on http://{options['host']}:{options['port']}/")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
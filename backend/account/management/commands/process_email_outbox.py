@@ -0,0 +1,76 @@
+import asyncio
+import time
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+from account.models import EmailOutbox, MailjetSettings
+from account.outbox import aprocess_batch, process_batch
+from account.utils import AsyncMailjetClient
+
+
+class Command(BaseCommand):
+    help = 'Deliver queued emails from the email outbox, retrying failures with backoff'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=50, help='Emails claimed per batch (default: 50)')
+        parser.add_argument('--interval', type=float, default=2.0, help='Seconds to sleep when the outbox is empty (default: 2)')
+        parser.add_argument('--once', action='store_true', help='Process due emails once and exit')
+        parser.add_argument(
+            '--concurrency', type=int, default=1,
+            help='Batches sent at the same time through the async Mailjet client (default: 1, synchronous)',
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        interval = options['interval']
+        concurrency = options['concurrency']
+        self.next_prune = 0.0
+
+        self.stdout.write(f"Processing email outbox (batch size {batch_size}, concurrency {concurrency})")
+        try:
+            if concurrency > 1:
+                asyncio.run(self._run_async(batch_size, interval, concurrency, options['once']))
+                return
+            while True:
+                close_old_connections()
+                sent, failed = process_batch(batch_size)
+                if sent or failed:
+                    self.stdout.write(f"Sent {sent}, failed {failed}")
+                    continue
+                self.prune()
+                if options['once']:
+                    break
+                time.sleep(interval)
+        except KeyboardInterrupt:
+            self.stdout.write("Stopping email outbox worker")
+
+    async def _run_async(self, batch_size, interval, concurrency, once):
+        mailjet_settings = await sync_to_async(MailjetSettings.get_active_settings)()
+        if not mailjet_settings or not mailjet_settings.api_key or not mailjet_settings.api_secret:
+            raise CommandError("Mailjet settings not configured. Please configure at /account/mailjet-setup/")
+
+        async with AsyncMailjetClient(mailjet_settings.api_key, mailjet_settings.api_secret) as client:
+            async def worker():
+                while True:
+                    await sync_to_async(close_old_connections)()
+                    sent, failed = await aprocess_batch(batch_size, client=client)
+                    if sent or failed:
+                        self.stdout.write(f"Sent {sent}, failed {failed}")
+                        continue
+                    await sync_to_async(self.prune)()
+                    if once:
+                        return
+                    await asyncio.sleep(interval)
+
+            await asyncio.gather(*(worker() for _ in range(concurrency)))
+
+    def prune(self):
+        """Delete old sent emails, at most every EMAIL_OUTBOX_PRUNE_INTERVAL seconds"""
+        now = time.monotonic()
+        if now < self.next_prune:
+            return
+        self.next_prune = now + settings.EMAIL_OUTBOX_PRUNE_INTERVAL
+        deleted = EmailOutbox.prune_sent()
+        if deleted:
+            self.stdout.write(f"Deleted {deleted} sent emails")
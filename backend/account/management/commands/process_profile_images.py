@@ -0,0 +1,31 @@
+import time
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from account.images import process_pending
+
+
+class Command(BaseCommand):
+    help = 'Strip metadata from uploaded profile images and generate their thumbnail and WebP variants'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=20, help='Images processed per batch (default: 20)')
+        parser.add_argument('--interval', type=float, default=2.0, help='Seconds to sleep when no image is pending (default: 2)')
+        parser.add_argument('--once', action='store_true', help='Process pending images once and exit')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        interval = options['interval']
+
+        self.stdout.write(f"Processing profile images (batch size {batch_size})")
+        try:
+            while True:
+                close_old_connections()
+                processed, failed = process_pending(batch_size)
+                if processed or failed:
+                    self.stdout.write(f"Processed {processed}, failed {failed}")
+                    continue
+                if options['once']:
+                    break
+                time.sleep(interval)
+        except KeyboardInterrupt:
+            self.stdout.write("Stopping profile image worker")
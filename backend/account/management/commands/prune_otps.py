@@ -0,0 +1,25 @@
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from account.models import PasswordResetOTP
+
+
+class Command(BaseCommand):
+    help = 'Delete expired and used password reset OTPs in bounded batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=settings.OTP_PRUNE_BATCH_SIZE, help='Rows deleted per statement')
+        parser.add_argument('--interval', type=float, help='Keep running, pruning every this many seconds (default: prune once and exit)')
+
+    def handle(self, *args, **options):
+        try:
+            while True:
+                close_old_connections()
+                deleted = PasswordResetOTP.prune_expired(options['batch_size'])
+                self.stdout.write(f"Deleted {deleted} expired or used OTPs")
+                if not options['interval']:
+                    break
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            self.stdout.write("Stopping OTP pruner")
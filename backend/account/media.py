@@ -0,0 +1,58 @@
+"""
+Serving user-uploaded media under MEDIA_URL.
+
+settings.MEDIA_SERVE_MODE picks how the bytes are sent:
+
+- 'django': streamed by Django's static file view (development only)
+- 'x-accel-redirect': an empty response whose X-Accel-Redirect header points
+  nginx at MEDIA_ACCEL_REDIRECT_PREFIX + path, e.g.
+
+      location /protected-media/ { internal; alias /srv/sreca/backend/media/; }
+
+- 'x-sendfile': X-Sendfile with the absolute path (Apache mod_xsendfile, lighttpd)
+
+In the last two modes the worker never opens the file. Content-addressed names
+(account.storage) are sent with a one-year immutable Cache-Control header.
+"""
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import Http404, HttpResponse
+from django.utils._os import safe_join
+from django.views.static import serve
+import mimetypes
+import posixpath
+import re
+
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+# .../ab/cd/abcd<60 more hex digits>[.ext] as written by ContentAddressedStorage
+_HASHED_NAME_RE = re.compile(r'(?:^|/)([0-9a-f]{2})/([0-9a-f]{2})/\1\2[0-9a-f]{60}(?:\.[a-z0-9]+)?$')
+
+
+def is_content_addressed(path):
+    return _HASHED_NAME_RE.search(path) is not None
+
+
+def serve_media(request, path):
+    path = posixpath.normpath(path).lstrip('/')
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404('File not found')
+
+    mode = settings.MEDIA_SERVE_MODE
+    if mode == 'django':
+        response = serve(request, path, document_root=settings.MEDIA_ROOT)
+    else:
+        content_type, encoding = mimetypes.guess_type(path)
+        response = HttpResponse(content_type=content_type or 'application/octet-stream')
+        if encoding:
+            response['Content-Encoding'] = encoding
+        if mode == 'x-accel-redirect':
+            response['X-Accel-Redirect'] = settings.MEDIA_ACCEL_REDIRECT_PREFIX.rstrip('/') + '/' + path
+        else:
+            response['X-Sendfile'] = full_path
+
+    if is_content_addressed(path):
+        response['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+    return response
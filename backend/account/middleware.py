@@ -0,0 +1,123 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.http import HttpResponse
+from .ratelimit import check_rate_limit
+from .responses import json_response
+from .tokens import verify_token
+
+
+class InlineMiddleware:
+    """
+    Base for middleware that supports both WSGI and ASGI without threads.
+
+    Subclasses implement process_request(request) -> response or None and
+    optionally process_response(request, response). Unlike Django's
+    MiddlewareMixin, which runs those hooks through sync_to_async under ASGI,
+    they are called inline, so they must never block (no database or network).
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        response = self.process_request(request)
+        if response is None:
+            response = self.get_response(request)
+        return self.process_response(request, response)
+
+    async def __acall__(self, request):
+        response = self.process_request(request)
+        if response is None:
+            response = await self.get_response(request)
+        return self.process_response(request, response)
+
+    def process_request(self, request):
+        return None
+
+    def process_response(self, request, response):
+        return response
+
+
+class CorsMiddleware(InlineMiddleware):
+    """
+    CORS for the JSON API, first in MIDDLEWARE.
+
+    Preflight (OPTIONS) requests to CORS_PATH_PREFIXES are answered here,
+    before sessions, CSRF or the view run, with headers built once at
+    startup. Access-Control-Max-Age lets browsers reuse a preflight instead
+    of sending one before every POST. Other responses on those paths get
+    Access-Control-Allow-Origin added.
+    """
+
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        self.prefixes = tuple(settings.CORS_PATH_PREFIXES)
+        self.allow_origin = settings.CORS_ALLOW_ORIGIN
+        self.preflight_headers = {
+            'Access-Control-Allow-Origin': settings.CORS_ALLOW_ORIGIN,
+            'Access-Control-Allow-Methods': ', '.join(settings.CORS_ALLOW_METHODS),
+            'Access-Control-Allow-Headers': ', '.join(settings.CORS_ALLOW_HEADERS),
+            'Access-Control-Max-Age': str(settings.CORS_MAX_AGE),
+        }
+
+    def process_request(self, request):
+        if request.method == 'OPTIONS' and request.path.startswith(self.prefixes):
+            response = HttpResponse()
+            for header, value in self.preflight_headers.items():
+                response[header] = value
+            return response
+        return None
+
+    def process_response(self, request, response):
+        if request.path.startswith(self.prefixes) and 'Access-Control-Allow-Origin' not in response:
+            response['Access-Control-Allow-Origin'] = self.allow_origin
+        return response
+
+
+class TokenAuthMiddleware(InlineMiddleware):
+    """
+    Resolve the API caller from an "Authorization: Bearer <token>" header.
+
+    Sets request.token_user_id to the verified user id, or None. The token is
+    checked by signature and expiry only, so this never touches the database.
+    """
+
+    def process_request(self, request):
+        request.token_user_id = None
+        header = request.META.get('HTTP_AUTHORIZATION', '')
+        if header[:7].lower() == 'bearer ':
+            request.token_user_id = verify_token(header[7:].strip())
+        return None
+
+
+class RateLimitMiddleware(InlineMiddleware):
+    """
+    Reject over-limit requests with 429 and Retry-After before the view runs.
+
+    Rules are looked up by the resolved URL name (see register_rate_limits in
+    account/urls.py); CORS preflight requests are never counted. Under ASGI,
+    Django runs process_view in one worker thread, which covers all of its
+    cache calls.
+    """
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if not settings.RATE_LIMIT_ENABLED or request.method == 'OPTIONS':
+            return None
+        url_name = request.resolver_match.url_name if request.resolver_match else None
+        retry_after = check_rate_limit(request, url_name) if url_name else 0
+        if not retry_after:
+            return None
+        response = json_response({
+            'success': False,
+            'message': 'Too many requests. Please try again later.'
+        }, status=429)
+        response['Retry-After'] = str(retry_after)
+        return response
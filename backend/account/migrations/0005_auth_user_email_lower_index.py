@@ -0,0 +1,32 @@
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models.functions import Lower
+
+INDEX_NAME = 'auth_user_email_lower_idx'
+
+
+def email_lower_index():
+    return models.Index(Lower('email'), name=INDEX_NAME)
+
+
+def add_index(apps, schema_editor):
+    User = apps.get_model(settings.AUTH_USER_MODEL)
+    schema_editor.add_index(User, email_lower_index())
+
+
+def remove_index(apps, schema_editor):
+    User = apps.get_model(settings.AUTH_USER_MODEL)
+    schema_editor.remove_index(User, email_lower_index())
+
+
+class Migration(migrations.Migration):
+    """Case-insensitive email index on the user table, used by account.backends.EmailBackend"""
+
+    dependencies = [
+        ('account', '0004_emailoutbox'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(add_index, remove_index),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 6.0.1 on 2026-10-18 10:41
+
+import django.db.models.functions.text
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models.functions import Lower
+
+
+def user_indexes():
+    return [
+        models.Index(Lower('first_name'), name='auth_user_first_name_lower_idx'),
+        models.Index(fields=['date_joined', 'id'], name='auth_user_joined_id_idx'),
+    ]
+
+
+def add_user_indexes(apps, schema_editor):
+    User = apps.get_model(settings.AUTH_USER_MODEL)
+    for index in user_indexes():
+        schema_editor.add_index(User, index)
+
+
+def remove_user_indexes(apps, schema_editor):
+    User = apps.get_model(settings.AUTH_USER_MODEL)
+    for index in user_indexes():
+        schema_editor.remove_index(User, index)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0005_auth_user_email_lower_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='userprofile',
+            index=models.Index(django.db.models.functions.text.Lower('full_name'), name='account_profile_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='userprofile',
+            index=models.Index(fields=['phone'], name='account_profile_phone_idx'),
+        ),
+        # Keyset pagination and name search on the user_list page
+        migrations.RunPython(add_user_indexes, remove_user_indexes),
+    ]
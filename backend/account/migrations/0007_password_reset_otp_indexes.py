@@ -0,0 +1,23 @@
+# Generated by Django 6.0.1 on 2026-10-18 11:20
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0006_user_list_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='passwordresetotp',
+            index=models.Index(fields=['email', 'otp', 'is_verified', '-created_at'], name='account_otp_lookup_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='passwordresetotp',
+            index=models.Index(fields=['expires_at'], name='account_otp_expires_idx'),
+        ),
+    ]
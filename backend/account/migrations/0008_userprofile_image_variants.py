@@ -0,0 +1,36 @@
+# Generated by Django 6.0.1 on 2026-10-18 11:00
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def queue_existing_images(apps, schema_editor):
+    """Existing uploads get variants on the next run of process_profile_images"""
+    UserProfile = apps.get_model('account', 'UserProfile')
+    UserProfile.objects.exclude(profile_image__isnull=True).exclude(profile_image='').update(image_status='pending')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0007_password_reset_otp_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userprofile',
+            name='image_status',
+            field=models.CharField(blank=True, choices=[('pending', 'Pending'), ('ready', 'Ready'), ('failed', 'Failed')], max_length=10),
+        ),
+        migrations.AddField(
+            model_name='userprofile',
+            name='image_variants',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddIndex(
+            model_name='userprofile',
+            index=models.Index(condition=models.Q(('image_status', 'pending')), fields=['image_status'], name='account_profile_image_idx'),
+        ),
+        migrations.RunPython(queue_existing_images, migrations.RunPython.noop),
+    ]
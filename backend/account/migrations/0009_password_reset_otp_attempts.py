@@ -0,0 +1,18 @@
+# Generated by Django 6.0.1 on 2026-10-18 14:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0008_userprofile_image_variants'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='passwordresetotp',
+            name='attempts',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+    ]
@@ -1,11 +1,19 @@
+from django.conf import settings
 from django.db import models
+from django.db.models import Q
+from django.db.models.functions import Lower
 from django.contrib.auth.models import User
 from django.utils import timezone
-import random
-import string
+from datetime import timedelta
+import secrets
+import time
 
 # Create your models here.
 
+_NOT_LOADED = object()
+_active_settings_cache = {}
+
+
 class MailjetSettings(models.Model):
     """Store Mailjet API credentials dynamically"""
     api_key = models.CharField(max_length=255)
@@ -25,8 +33,19 @@ class MailjetSettings(models.Model):
 
     @classmethod
     def get_active_settings(cls):
-        """Get active Mailjet settings"""
-        return cls.objects.filter(is_active=True).first()
+        """Get active Mailjet settings (cached in-process, see clear_cache)"""
+        now = time.monotonic()
+        cached = _active_settings_cache.get('value', _NOT_LOADED)
+        if cached is _NOT_LOADED or now >= _active_settings_cache['expires']:
+            cached = cls.objects.filter(is_active=True).first()
+            _active_settings_cache['value'] = cached
+            _active_settings_cache['expires'] = now + getattr(settings, 'MAILJET_SETTINGS_CACHE_TTL', 60)
+        return cached
+
+    @classmethod
+    def clear_cache(cls):
+        """Drop the cached active settings so the next lookup hits the database"""
+        _active_settings_cache.clear()
 
 
 class PasswordResetOTP(models.Model):
@@ -35,6 +54,8 @@ class PasswordResetOTP(models.Model):
     email = models.EmailField()
     otp = models.CharField(max_length=6)
     is_verified = models.BooleanField(default=False)
+    # Guesses counted against the email's codes since the last issue (DatabaseOTPStore lockout)
+    attempts = models.PositiveSmallIntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
     expires_at = models.DateTimeField()
 
@@ -42,6 +63,12 @@ class PasswordResetOTP(models.Model):
         verbose_name = "Password Reset OTP"
         verbose_name_plural = "Password Reset OTPs"
         ordering = ['-created_at']
+        indexes = [
+            # forgot_password_verify_otp / forgot_password_reset lookups
+            models.Index(fields=['email', 'otp', 'is_verified', '-created_at'], name='account_otp_lookup_idx'),
+            # prune_expired
+            models.Index(fields=['expires_at'], name='account_otp_expires_idx'),
+        ]
 
     def __str__(self):
         return f"OTP for {self.email}"
@@ -49,7 +76,7 @@ class PasswordResetOTP(models.Model):
     @staticmethod
     def generate_otp():
         """Generate a 6-digit OTP"""
-        return ''.join(random.choices(string.digits, k=6))
+        return f"{secrets.randbelow(10 ** 6):06d}"
 
     def is_expired(self):
         """Check if OTP has expired"""
@@ -59,6 +86,24 @@ class PasswordResetOTP(models.Model):
         """Check if OTP is valid (not expired and not verified)"""
         return not self.is_expired() and not self.is_verified
 
+    @classmethod
+    def prune_expired(cls, batch_size=1000):
+        """
+        Delete expired OTPs, and verified ones issued more than OTP_TTL_SECONDS
+        ago, batch_size rows per statement
+
+        Returns:
+            int: number of rows deleted
+        """
+        now = timezone.now()
+        stale = Q(expires_at__lt=now) | Q(is_verified=True, created_at__lt=now - timedelta(seconds=settings.OTP_TTL_SECONDS))
+        deleted = 0
+        while True:
+            ids = list(cls.objects.filter(stale).order_by().values_list('pk', flat=True)[:batch_size])
+            if not ids:
+                return deleted
+            deleted += cls.objects.filter(pk__in=ids).delete()[0]
+
 
 class UserProfile(models.Model):
     """Extended user profile information"""
@@ -67,6 +112,16 @@ class UserProfile(models.Model):
         ('Female', 'Female'),
         ('Other', 'Other'),
     ]
+
+    # Processing state of profile_image (see account.images)
+    IMAGE_PENDING = 'pending'
+    IMAGE_READY = 'ready'
+    IMAGE_FAILED = 'failed'
+    IMAGE_STATUS_CHOICES = [
+        (IMAGE_PENDING, 'Pending'),
+        (IMAGE_READY, 'Ready'),
+        (IMAGE_FAILED, 'Failed'),
+    ]
     
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='profile')
     full_name = models.CharField(max_length=255, blank=True)
@@ -79,12 +134,101 @@ class UserProfile(models.Model):
     alternate_phone = models.CharField(max_length=20, blank=True)
     delivery_instructions = models.TextField(blank=True)
     profile_image = models.ImageField(upload_to='profile_images/', null=True, blank=True)
+    image_status = models.CharField(max_length=10, choices=IMAGE_STATUS_CHOICES, blank=True)
+    # {"<size>": {"webp": name, "jpeg" or "png": name}} written by `manage.py process_profile_images`
+    image_variants = models.JSONField(default=dict, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         verbose_name = "User Profile"
         verbose_name_plural = "User Profiles"
+        indexes = [
+            # Prefix search on the user_list page
+            models.Index(Lower('full_name'), name='account_profile_name_idx'),
+            models.Index(fields=['phone'], name='account_profile_phone_idx'),
+            # Work queue of the image worker
+            models.Index(fields=['image_status'], name='account_profile_image_idx', condition=models.Q(image_status='pending')),
+        ]
 
     def __str__(self):
         return f"Profile of {self.user.email}"
+
+    def image_url(self, size=None, image_format='webp'):
+        """
+        URL of the smallest variant at least size px wide (the largest if none is)
+
+        None if there is no image. Until the variants exist (and if processing
+        failed) it is settings.PROFILE_IMAGE_PLACEHOLDER_URL: the upload as
+        received may carry EXIF data such as its GPS location, so it is never
+        served. size defaults to settings.PROFILE_IMAGE_API_SIZE.
+        """
+        if not self.profile_image:
+            return None
+        if not self.image_variants:
+            return settings.PROFILE_IMAGE_PLACEHOLDER_URL
+        size = size or settings.PROFILE_IMAGE_API_SIZE
+        sizes = sorted(int(key) for key in self.image_variants)
+        names = self.image_variants[str(next((s for s in sizes if s >= size), sizes[-1]))]
+        return self.profile_image.storage.url(names.get(image_format) or next(iter(names.values())))
+
+
+class EmailOutbox(models.Model):
+    """Queued outgoing email, delivered by the process_email_outbox worker"""
+    KIND_OTP = 'otp'
+    KIND_CONFIRMATION = 'confirmation'
+    KIND_CHOICES = [
+        (KIND_OTP, 'Password Reset OTP'),
+        (KIND_CONFIRMATION, 'Account Confirmation'),
+    ]
+
+    STATUS_PENDING = 'pending'
+    STATUS_SENDING = 'sending'
+    STATUS_SENT = 'sent'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_SENDING, 'Sending'),
+        (STATUS_SENT, 'Sent'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    email = models.EmailField()
+    context = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    claim_token = models.CharField(max_length=32, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = "Email Outbox"
+        verbose_name_plural = "Email Outbox"
+        ordering = ['next_attempt_at']
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='account_outbox_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} to {self.email} ({self.status})"
+
+    @classmethod
+    def prune_sent(cls, batch_size=1000):
+        """
+        Delete emails sent more than EMAIL_OUTBOX_KEEP_SENT_SECONDS ago,
+        batch_size rows per statement
+
+        Returns:
+            int: number of rows deleted
+        """
+        sent_before = timezone.now() - timedelta(seconds=settings.EMAIL_OUTBOX_KEEP_SENT_SECONDS)
+        deleted = 0
+        while True:
+            ids = list(cls.objects.filter(status=cls.STATUS_SENT, sent_at__lt=sent_before).order_by().values_list('pk', flat=True)[:batch_size])
+            if not ids:
+                return deleted
+            deleted += cls.objects.filter(pk__in=ids).delete()[0]
@@ -0,0 +1,297 @@
+"""
+Storage for password reset OTPs.
+
+The forgot-password views talk to the store returned by get_otp_store(),
+chosen with settings.OTP_STORE:
+
+- DatabaseOTPStore (default) keeps codes in the PasswordResetOTP table.
+- CacheOTPStore keeps only an HMAC of each code in the cache named by
+  settings.OTP_CACHE_ALIAS, expiring with the code.
+
+Both lock an email after OTP_MAX_ATTEMPTS wrong guesses: its codes stop
+verifying until a new one is issued, which resets the count (issuing is
+rate-limited per email, see account/urls.py). Every guess, to verify() or
+consume(), is counted before the code is compared and only compared while
+the count is within the limit, so concurrent guesses cannot get past it; a
+successful verify() gives its attempt back.
+"""
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.crypto import constant_time_compare, salted_hmac
+from django.utils.module_loading import import_string
+from datetime import timedelta
+import threading
+import time
+from .models import PasswordResetOTP
+
+# verify() / consume() outcomes
+VERIFIED = 'verified'
+INVALID = 'invalid'
+EXPIRED = 'expired'
+LOCKED = 'locked'
+
+_store = None
+_store_lock = threading.Lock()
+
+
+class BaseOTPStore:
+    """Issue, verify and consume password reset OTPs for an email address"""
+
+    def issue(self, user, email, replace=True):
+        """
+        Create a new OTP for user/email and return the plain code
+
+        Args:
+            replace: invalidate earlier codes for the email (False keeps them valid too)
+        """
+        raise NotImplementedError
+
+    def verify(self, email, otp):
+        """
+        Check a code and mark it verified
+
+        Returns:
+            tuple: (outcome, token) - token is only set when outcome is VERIFIED
+        """
+        raise NotImplementedError
+
+    def consume(self, email, otp):
+        """
+        Use up a verified code, dropping every code of the email
+
+        Returns:
+            tuple: (outcome, user_id) - user_id is only set when outcome is VERIFIED
+        """
+        raise NotImplementedError
+
+    # Async variants for async views. By default each runs the sync method in
+    # one worker thread, which beats a thread hop per call on backends whose
+    # async API is itself a sync_to_async wrapper (Django's caches).
+
+    async def aissue(self, user, email, replace=True):
+        return await sync_to_async(self.issue)(user, email, replace)
+
+    async def averify(self, email, otp):
+        return await sync_to_async(self.verify)(email, otp)
+
+    async def aconsume(self, email, otp):
+        return await sync_to_async(self.consume)(email, otp)
+
+
+class DatabaseOTPStore(BaseOTPStore):
+    """OTPs as PasswordResetOTP rows"""
+
+    def _new_values(self):
+        return {
+            'otp': PasswordResetOTP.generate_otp(),
+            'is_verified': False,
+            'expires_at': timezone.now() + timedelta(seconds=settings.OTP_TTL_SECONDS),
+        }
+
+    def issue(self, user, email, replace=True):
+        values = self._new_values()
+        with transaction.atomic():
+            if replace:
+                # Every earlier row, including the extra ones replace=False kept
+                PasswordResetOTP.objects.filter(user=user, email=email).delete()
+            else:
+                # A new code starts a new count for the codes kept with it, so
+                # all of an email's rows always carry the same count
+                PasswordResetOTP.objects.filter(email=email).update(attempts=0)
+            PasswordResetOTP.objects.create(user=user, email=email, **values)
+        return values['otp']
+
+    def _unlocked(self, email):
+        """The email's codes that are not locked out"""
+        return PasswordResetOTP.objects.filter(email=email, attempts__lt=settings.OTP_MAX_ATTEMPTS)
+
+    def _count_attempt(self, email):
+        """
+        Count a guess against the email's codes before it is checked
+
+        Returns:
+            None if it may be checked, else the outcome to return (LOCKED, or
+            INVALID when the email has no codes)
+        """
+        # The UPDATE is atomic, so once the codes reach the limit no other guess gets counted
+        if self._unlocked(email).update(attempts=F('attempts') + 1):
+            return None
+        return LOCKED if PasswordResetOTP.objects.filter(email=email).exists() else INVALID
+
+    def _miss(self, email):
+        """Outcome of a counted wrong guess: LOCKED if it used up the last attempt"""
+        return (INVALID if self._unlocked(email).exists() else LOCKED), None
+
+    def _lookup(self, email, otp, is_verified):
+        return PasswordResetOTP.objects.filter(email=email, otp=otp, is_verified=is_verified).order_by('-created_at')
+
+    def verify(self, email, otp):
+        outcome = self._count_attempt(email)
+        if outcome is not None:
+            return outcome, None
+        otp_record = self._lookup(email, otp, is_verified=False).first()
+        if otp_record is None:
+            return self._miss(email)
+        if otp_record.is_expired():
+            return EXPIRED, None
+        with transaction.atomic():
+            PasswordResetOTP.objects.filter(pk=otp_record.pk).update(is_verified=True)
+            PasswordResetOTP.objects.filter(email=email, attempts__gt=0).update(attempts=F('attempts') - 1)
+        return VERIFIED, str(otp_record.pk)
+
+    def consume(self, email, otp):
+        outcome = self._count_attempt(email)
+        if outcome is not None:
+            return outcome, None
+        otp_record = self._lookup(email, otp, is_verified=True).first()
+        if otp_record is None:
+            return self._miss(email)
+        if otp_record.is_expired():
+            return EXPIRED, None
+        PasswordResetOTP.objects.filter(user_id=otp_record.user_id, email=email).delete()
+        return VERIFIED, otp_record.user_id
+
+    async def _acount_attempt(self, email):
+        if await self._unlocked(email).aupdate(attempts=F('attempts') + 1):
+            return None
+        return LOCKED if await PasswordResetOTP.objects.filter(email=email).aexists() else INVALID
+
+    async def _amiss(self, email):
+        return (INVALID if await self._unlocked(email).aexists() else LOCKED), None
+
+    async def averify(self, email, otp):
+        outcome = await self._acount_attempt(email)
+        if outcome is not None:
+            return outcome, None
+        otp_record = await self._lookup(email, otp, is_verified=False).afirst()
+        if otp_record is None:
+            return await self._amiss(email)
+        if otp_record.is_expired():
+            return EXPIRED, None
+        await PasswordResetOTP.objects.filter(pk=otp_record.pk).aupdate(is_verified=True)
+        await PasswordResetOTP.objects.filter(email=email, attempts__gt=0).aupdate(attempts=F('attempts') - 1)
+        return VERIFIED, str(otp_record.pk)
+
+    async def aconsume(self, email, otp):
+        outcome = await self._acount_attempt(email)
+        if outcome is not None:
+            return outcome, None
+        otp_record = await self._lookup(email, otp, is_verified=True).afirst()
+        if otp_record is None:
+            return await self._amiss(email)
+        if otp_record.is_expired():
+            return EXPIRED, None
+        await PasswordResetOTP.objects.filter(user_id=otp_record.user_id, email=email).adelete()
+        return VERIFIED, otp_record.user_id
+
+
+class CacheOTPStore(BaseOTPStore):
+    """
+    OTPs as cache entries
+
+    One entry per email holds the user id, the HMACs of the live codes, the
+    HMAC of the verified code and the expiry time; the cache drops it when the
+    newest code expires. Guesses are counted with an atomic cache counter,
+    reset by issue() and expiring with the codes.
+    """
+
+    # Codes kept valid per email when issuing with replace=False
+    MAX_CODES = 5
+
+    def _cache(self):
+        return caches[settings.OTP_CACHE_ALIAS]
+
+    def _digest(self, email, otp):
+        return salted_hmac('account.otp_store', f"{email}:{otp}", algorithm='sha256').hexdigest()
+
+    def _key(self, email):
+        return f"account:otp:{self._digest(email, '')}"
+
+    def _attempts_key(self, email):
+        return f"account:otp-attempts:{self._digest(email, '')}"
+
+    def _count_attempt(self, email):
+        """Count a guess against the email's codes before it is checked; returns the new count"""
+        cache = self._cache()
+        key = self._attempts_key(email)
+        cache.add(key, 0, settings.OTP_TTL_SECONDS)
+        try:
+            return cache.incr(key)
+        except ValueError:
+            # Expired between add() and incr()
+            cache.add(key, 1, settings.OTP_TTL_SECONDS)
+            return 1
+
+    def _refund_attempt(self, email):
+        try:
+            self._cache().decr(self._attempts_key(email))
+        except ValueError:
+            pass
+
+    def _miss(self, attempts):
+        """Outcome of a counted wrong guess: LOCKED if it used up the last attempt"""
+        return (LOCKED if attempts >= settings.OTP_MAX_ATTEMPTS else INVALID), None
+
+    def issue(self, user, email, replace=True):
+        cache = self._cache()
+        otp = PasswordResetOTP.generate_otp()
+        expires_at = time.time() + settings.OTP_TTL_SECONDS
+        entry = None if replace else cache.get(self._key(email))
+        # Earlier codes share the entry and so now expire with the new one
+        codes = entry['codes'][-(self.MAX_CODES - 1):] if entry else []
+        cache.set(self._key(email), {
+            'user_id': user.pk,
+            'codes': codes + [self._digest(email, otp)],
+            'verified': None,
+            'expires_at': expires_at,
+        }, settings.OTP_TTL_SECONDS)
+        # A new code starts a new count, which lives as long as the code
+        cache.set(self._attempts_key(email), 0, settings.OTP_TTL_SECONDS)
+        return otp
+
+    def _live_entry(self, email):
+        entry = self._cache().get(self._key(email))
+        if entry is not None and entry['expires_at'] <= time.time():
+            return None
+        return entry
+
+    def verify(self, email, otp):
+        attempts = self._count_attempt(email)
+        if attempts > settings.OTP_MAX_ATTEMPTS:
+            return LOCKED, None
+        entry = self._live_entry(email)
+        digest = self._digest(email, otp)
+        if entry is None or not any(constant_time_compare(digest, code) for code in entry['codes']):
+            return self._miss(attempts)
+        entry['verified'] = digest
+        timeout = max(1, int(entry['expires_at'] - time.time()))
+        self._cache().set(self._key(email), entry, timeout)
+        self._refund_attempt(email)
+        return VERIFIED, digest[:16]
+
+    def consume(self, email, otp):
+        attempts = self._count_attempt(email)
+        if attempts > settings.OTP_MAX_ATTEMPTS:
+            return LOCKED, None
+        entry = self._live_entry(email)
+        if entry is None or not entry['verified'] or not constant_time_compare(self._digest(email, otp), entry['verified']):
+            return self._miss(attempts)
+        # delete() reports whether the key existed, so a code is used only once
+        if not self._cache().delete(self._key(email)):
+            return INVALID, None
+        self._cache().delete(self._attempts_key(email))
+        return VERIFIED, entry['user_id']
+
+
+def get_otp_store():
+    """The configured OTP store (settings.OTP_STORE), shared by the process"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = import_string(settings.OTP_STORE)()
+    return _store
@@ -0,0 +1,207 @@
+"""
+Persistent email outbox.
+
+Views enqueue mail with queue_otp_email / queue_confirmation_email and return
+immediately; the process_email_outbox management command claims due rows and
+delivers each batch with one bulk Mailjet call, retrying failures with
+exponential backoff. Async views use the aqueue_* variants, and
+`process_email_outbox --concurrency N` keeps N batches in flight through
+the async Mailjet client.
+
+The plain OTP in a password reset email's context is blanked as soon as the
+row is sent or given up on, and an OTP email is not sent (or retried) once
+its code has expired. Sent rows are deleted by the worker after
+EMAIL_OUTBOX_KEEP_SENT_SECONDS.
+"""
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.utils import timezone
+from datetime import timedelta
+import logging
+import random
+import uuid
+from .models import EmailOutbox
+from .utils import asend_bulk_emails, send_bulk_emails
+
+logger = logging.getLogger(__name__)
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def queue_email(kind, email, **context):
+    """Add an email to the outbox; it is sent by the outbox worker"""
+    entry = EmailOutbox.objects.create(kind=kind, email=email, context=context)
+    logger.debug(f"Queued {kind} email to {email} (outbox #{entry.pk})")
+    return entry
+
+
+def queue_emails(kind, recipients):
+    """
+    Add many emails of one kind to the outbox with a single bulk insert
+
+    Args:
+        recipients: iterable of (email, context) pairs
+    """
+    return EmailOutbox.objects.bulk_create(
+        EmailOutbox(kind=kind, email=email, context=context) for email, context in recipients
+    )
+
+
+def queue_otp_email(email, otp, user_name=None):
+    """Queue a password reset OTP email"""
+    return queue_email(EmailOutbox.KIND_OTP, email, otp=otp, user_name=user_name)
+
+
+def queue_confirmation_email(email, user_name=None):
+    """Queue an account confirmation email"""
+    return queue_email(EmailOutbox.KIND_CONFIRMATION, email, user_name=user_name)
+
+
+async def aqueue_email(kind, email, **context):
+    """Async queue_email for async views"""
+    entry = await EmailOutbox.objects.acreate(kind=kind, email=email, context=context)
+    logger.debug(f"Queued {kind} email to {email} (outbox #{entry.pk})")
+    return entry
+
+
+async def aqueue_otp_email(email, otp, user_name=None):
+    return await aqueue_email(EmailOutbox.KIND_OTP, email, otp=otp, user_name=user_name)
+
+
+async def aqueue_confirmation_email(email, user_name=None):
+    return await aqueue_email(EmailOutbox.KIND_CONFIRMATION, email, user_name=user_name)
+
+
+def backoff_delay(attempts):
+    """Seconds to wait before the next attempt, doubling per failed attempt with jitter"""
+    base = _setting('EMAIL_OUTBOX_BACKOFF_SECONDS', 30)
+    cap = _setting('EMAIL_OUTBOX_MAX_BACKOFF_SECONDS', 3600)
+    delay = min(cap, base * (2 ** max(attempts - 1, 0)))
+    return delay + random.uniform(0, base)
+
+
+def claim_batch(batch_size=50):
+    """
+    Claim up to batch_size due emails for this worker.
+
+    Claimed rows are moved to 'sending' and their next_attempt_at is pushed out
+    by the lease, so a second worker cannot pick them up and rows left behind by
+    a crashed worker become due again once the lease runs out.
+    """
+    now = timezone.now()
+    lease = timedelta(seconds=_setting('EMAIL_OUTBOX_LEASE_SECONDS', 300))
+    token = uuid.uuid4().hex
+    due = EmailOutbox.objects.filter(
+        status__in=[EmailOutbox.STATUS_PENDING, EmailOutbox.STATUS_SENDING],
+        next_attempt_at__lte=now,
+    )
+    ids = list(due.order_by('next_attempt_at').values_list('pk', flat=True)[:batch_size])
+    if not ids:
+        return []
+    due.filter(pk__in=ids).update(
+        status=EmailOutbox.STATUS_SENDING,
+        claim_token=token,
+        next_attempt_at=now + lease,
+    )
+    return list(EmailOutbox.objects.filter(claim_token=token, status=EmailOutbox.STATUS_SENDING))
+
+
+def otp_expired(entry, now=None):
+    """Whether entry is an OTP email whose code can no longer be used"""
+    if entry.kind != EmailOutbox.KIND_OTP:
+        return False
+    return entry.created_at <= (now or timezone.now()) - timedelta(seconds=settings.OTP_TTL_SECONDS)
+
+
+def record_result(entry, success, error_message=None):
+    """Store the outcome of a delivery attempt and schedule a retry if needed"""
+    now = timezone.now()
+    entry.attempts += 1
+    if success:
+        entry.status = EmailOutbox.STATUS_SENT
+        entry.sent_at = now
+        entry.last_error = ''
+    elif entry.attempts >= _setting('EMAIL_OUTBOX_MAX_ATTEMPTS', 5) or otp_expired(entry, now):
+        entry.status = EmailOutbox.STATUS_FAILED
+        entry.last_error = error_message or ''
+        logger.error(f"Giving up on outbox #{entry.pk} to {entry.email} after {entry.attempts} attempts: {error_message}")
+    else:
+        entry.status = EmailOutbox.STATUS_PENDING
+        entry.next_attempt_at = now + timedelta(seconds=backoff_delay(entry.attempts))
+        entry.last_error = error_message or ''
+        logger.warning(f"Outbox #{entry.pk} to {entry.email} failed (attempt {entry.attempts}), retrying at {entry.next_attempt_at}: {error_message}")
+    if entry.status != EmailOutbox.STATUS_PENDING and entry.context.get('otp'):
+        # Done with the code: do not keep it readable in the table or the admin
+        entry.context = {**entry.context, 'otp': ''}
+    entry.claim_token = ''
+    entry.save(update_fields=['status', 'attempts', 'next_attempt_at', 'claim_token', 'last_error', 'sent_at', 'context', 'updated_at'])
+    return success
+
+
+def _skip_expired(entries):
+    """Give up on the OTP emails whose code expired before they went out; returns (the rest, skipped)"""
+    now = timezone.now()
+    send = []
+    for entry in entries:
+        if otp_expired(entry, now):
+            record_result(entry, False, 'The code expired before it could be sent')
+        else:
+            send.append(entry)
+    return send, len(entries) - len(send)
+
+
+def process_batch(batch_size=50):
+    """
+    Claim one batch of due emails and send them together
+
+    Returns:
+        tuple: (int, int) - (sent, failed)
+    """
+    entries = claim_batch(batch_size)
+    if not entries:
+        return 0, 0
+    entries, expired = _skip_expired(entries)
+    if not entries:
+        return 0, expired
+
+    try:
+        results = send_bulk_emails((entry.email, entry.kind, entry.context) for entry in entries)
+    except Exception as e:
+        results = [(False, str(e))] * len(entries)
+
+    return _record_results(entries, results, expired)
+
+
+def _record_results(entries, results, failed=0):
+    sent = 0
+    for entry, (success, error_message) in zip(entries, results):
+        if record_result(entry, success, error_message):
+            sent += 1
+        else:
+            failed += 1
+    return sent, failed
+
+
+async def aprocess_batch(batch_size=50, client=None):
+    """
+    Async process_batch: the Mailjet calls go through an AsyncMailjetClient
+
+    Claiming and recording stay synchronous database work and run in a
+    worker thread, so several batches can be in flight on one event loop.
+
+    Returns:
+        tuple: (int, int) - (sent, failed)
+    """
+    entries = await sync_to_async(claim_batch)(batch_size)
+    if not entries:
+        return 0, 0
+    entries, expired = await sync_to_async(_skip_expired)(entries)
+    if not entries:
+        return 0, expired
+    try:
+        results = await asend_bulk_emails(((entry.email, entry.kind, entry.context) for entry in entries), client=client)
+    except Exception as e:
+        results = [(False, str(e))] * len(entries)
+    return await sync_to_async(_record_results)(entries, results, expired)
@@ -0,0 +1,131 @@
+"""
+Read-through cache of serialized user profiles for get_profile_api.
+
+Entries live in the cache named by settings.PROFILE_CACHE_ALIAS and are
+dropped by the UserProfile/User save and delete signals. Each entry carries
+an ETag and Last-Modified value so clients can revalidate with a 304.
+"""
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.utils.http import http_date, parse_http_date_safe, quote_etag
+import hashlib
+import json
+from .models import UserProfile
+
+
+def _cache():
+    return caches[settings.PROFILE_CACHE_ALIAS]
+
+
+def _key(user_id):
+    return f"account:profile:{user_id}"
+
+
+def serialize_profile(user, profile):
+    """
+    Profile payload shared by the profile APIs
+
+    profile_image is the relative URL of the PROFILE_IMAGE_API_SIZE variant
+    (PROFILE_IMAGE_PLACEHOLDER_URL until the image worker has processed it).
+    """
+    return {
+        'full_name': (profile.full_name if profile else '') or user.first_name or '',
+        'email': user.email,
+        'date_of_birth': profile.date_of_birth.strftime('%Y-%m-%d') if profile and profile.date_of_birth else '',
+        'gender': (profile.gender if profile else '') or '',
+        'city': (profile.city if profile else '') or '',
+        'area': (profile.area if profile else '') or '',
+        'street_address': (profile.street_address if profile else '') or '',
+        'phone': (profile.phone if profile else '') or '',
+        'alternate_phone': (profile.alternate_phone if profile else '') or '',
+        'instructions': (profile.delivery_instructions if profile else '') or '',
+        'profile_image': profile.image_url() if profile else None,
+    }
+
+
+def _entry(user, profile):
+    data = serialize_profile(user, profile)
+    modified = profile.updated_at if profile else user.date_joined
+    return {
+        'profile': data,
+        'etag': quote_etag(hashlib.md5(json.dumps(data, sort_keys=True).encode()).hexdigest()),
+        'last_modified': int(modified.timestamp()),
+    }
+
+
+def _build_entry(user_id):
+    profile = UserProfile.objects.select_related('user').filter(user_id=user_id).first()
+    if profile is not None:
+        return _entry(profile.user, profile)
+    # No profile row yet: serve defaults without creating one on a read
+    user = User.objects.filter(id=user_id).first()
+    return _entry(user, None) if user is not None else None
+
+
+async def _abuild_entry(user_id):
+    profile = await UserProfile.objects.select_related('user').filter(user_id=user_id).afirst()
+    if profile is not None:
+        return _entry(profile.user, profile)
+    user = await User.objects.filter(id=user_id).afirst()
+    return _entry(user, None) if user is not None else None
+
+
+def get_profile_entry(user_id):
+    """Cached {'profile', 'etag', 'last_modified'} for user_id, or None if the user does not exist"""
+    cache = _cache()
+    entry = cache.get(_key(user_id))
+    if entry is None:
+        entry = _build_entry(user_id)
+        if entry is not None:
+            cache.set(_key(user_id), entry, settings.PROFILE_CACHE_TIMEOUT)
+    return entry
+
+
+async def aget_profile_entry(user_id):
+    """Async get_profile_entry for async views"""
+    cache = _cache()
+    entry = await cache.aget(_key(user_id))
+    if entry is None:
+        entry = await _abuild_entry(user_id)
+        if entry is not None:
+            await cache.aset(_key(user_id), entry, settings.PROFILE_CACHE_TIMEOUT)
+    return entry
+
+
+def cache_profile(user, profile):
+    """
+    Store the entry for freshly saved objects
+
+    Used after writes instead of waiting for the next read to rebuild it, which
+    could come from a lagging read replica and cache the old data.
+    """
+    _cache().set(_key(user.pk), _entry(user, profile), settings.PROFILE_CACHE_TIMEOUT)
+
+
+async def acache_profile(user, profile):
+    await _cache().aset(_key(user.pk), _entry(user, profile), settings.PROFILE_CACHE_TIMEOUT)
+
+
+def invalidate_profile(user_id):
+    """Drop the cached profile of user_id"""
+    _cache().delete(_key(user_id))
+
+
+def is_not_modified(request, entry):
+    """True if the request's validators show the client already has this entry"""
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+    if if_none_match is not None:
+        etags = [tag.strip() for tag in if_none_match.split(',')]
+        return '*' in etags or entry['etag'] in etags or f"W/{entry['etag']}" in etags
+    if_modified_since = parse_http_date_safe(request.META.get('HTTP_IF_MODIFIED_SINCE', ''))
+    return if_modified_since is not None and entry['last_modified'] <= if_modified_since
+
+
+def set_validators(response, entry):
+    """Add ETag/Last-Modified and per-user revalidation headers to a profile response"""
+    response['ETag'] = entry['etag']
+    response['Last-Modified'] = http_date(entry['last_modified'])
+    response['Cache-Control'] = 'private, no-cache'
+    response['Vary'] = 'Authorization'
+    return response
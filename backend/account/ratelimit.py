@@ -0,0 +1,149 @@
+"""
+Sliding-window rate limits for the account API.
+
+Limits are registered per URL name (see account/urls.py) as rule strings
+"<key>:<count>/<period>", e.g. "ip:20/m" or "email:5/15m". Keys are
+"ip" (client address) and "email" (the "email" field of a JSON body);
+periods are s, m, h or d with an optional multiplier.
+
+Each rule keeps a counter per fixed window in the cache named by
+settings.RATE_LIMIT_CACHE_ALIAS and weighs the previous window by how much
+of it still overlaps the sliding window, so a check is one get() and one
+add() or incr() regardless of traffic. The request is counted first and
+allowed on the count incr() returns, so concurrent requests cannot all pass
+before any of them is counted; a rejected request is uncounted again.
+"""
+from django.conf import settings
+from django.core.cache import caches
+from dataclasses import dataclass
+import hashlib
+import math
+import re
+import time
+from .responses import loads
+
+PERIODS = {'s': 1, 'm': 60, 'h': 60 * 60, 'd': 24 * 60 * 60}
+
+_RULE_RE = re.compile(r'^(?P<key>ip|email):(?P<count>\d+)/(?P<multiplier>\d*)(?P<unit>[smhd])$')
+
+# Bodies larger than this are not parsed for the "email" key
+MAX_BODY_SIZE = 16 * 1024
+
+# URL name -> list of Rule
+_limits = {}
+
+
+@dataclass(frozen=True)
+class Rule:
+    key: str
+    count: int
+    period: int
+
+    @classmethod
+    def parse(cls, rule):
+        match = _RULE_RE.match(rule.replace(' ', ''))
+        if not match:
+            raise ValueError(f"Invalid rate limit rule: {rule!r}")
+        period = int(match['multiplier'] or 1) * PERIODS[match['unit']]
+        return cls(match['key'], int(match['count']), period)
+
+
+def register_rate_limits(limits):
+    """Set the rules for each URL name in a {url_name: [rule, ...]} mapping"""
+    for url_name, rules in limits.items():
+        _limits[url_name] = [Rule.parse(rule) for rule in rules]
+
+
+def get_rate_limits(url_name):
+    return _limits.get(url_name, ())
+
+
+def client_ip(request):
+    header = getattr(settings, 'RATE_LIMIT_IP_HEADER', None)
+    if header and request.META.get(header):
+        # Left-most address of X-Forwarded-For style headers
+        return request.META[header].split(',')[0].strip()
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def request_email(request):
+    """Lowercased "email" from a small JSON body, or None"""
+    if request.content_type != 'application/json':
+        return None
+    try:
+        if int(request.META.get('CONTENT_LENGTH') or 0) > MAX_BODY_SIZE:
+            return None
+        data = loads(request.body)
+    except (ValueError, TypeError):
+        return None
+    email = data.get('email') if isinstance(data, dict) else None
+    return email.strip().lower() if isinstance(email, str) and email.strip() else None
+
+
+def _hit(cache, scope, rule, value, now):
+    """
+    Count one request against rule
+
+    Returns:
+        int: 0 if allowed, else seconds until the request would be allowed
+    """
+    window = int(now // rule.period)
+    elapsed = now - window * rule.period
+    digest = hashlib.md5(value.encode()).hexdigest()
+    current_key = f"rl:{scope}:{rule.key}:{rule.count}/{rule.period}:{digest}:{window}"
+    previous_key = f"rl:{scope}:{rule.key}:{rule.count}/{rule.period}:{digest}:{window - 1}"
+
+    previous = cache.get(previous_key, 0)
+    # Keep each window until the next one has fully passed
+    if cache.add(current_key, 1, rule.period * 2):
+        current = 1
+    else:
+        try:
+            current = cache.incr(current_key)
+        except ValueError:
+            # Expired between add() and incr()
+            cache.add(current_key, 1, rule.period * 2)
+            current = 1
+
+    # Requests counted before this one
+    before = current - 1
+    weight = 1 - elapsed / rule.period
+    if previous * weight + before < rule.count:
+        return 0
+
+    try:
+        cache.decr(current_key)
+    except ValueError:
+        pass
+    if before >= rule.count or not previous:
+        return max(1, math.ceil(rule.period - elapsed))
+    # Wait until enough of the previous window has slid out
+    wait = rule.period * (1 - (rule.count - before) / previous) - elapsed
+    return max(1, math.ceil(wait))
+
+
+def check_rate_limit(request, url_name):
+    """
+    Apply the rules registered for url_name to request
+
+    Returns:
+        int: 0 if the request may proceed, else the Retry-After value in seconds
+    """
+    rules = get_rate_limits(url_name)
+    if not rules:
+        return 0
+    cache = caches[settings.RATE_LIMIT_CACHE_ALIAS]
+    now = time.time()
+    email = None
+    for rule in rules:
+        if rule.key == 'ip':
+            value = client_ip(request)
+        else:
+            email = email or request_email(request)
+            value = email
+        if not value:
+            continue
+        retry_after = _hit(cache, url_name, rule, value, now)
+        if retry_after:
+            return retry_after
+    return 0
@@ -0,0 +1,55 @@
+"""
+JSON responses for the account API.
+
+Every API view answers through json_response() and parses bodies with
+loads(), using orjson when it is installed and the json module otherwise. CORS
+headers are added by account.middleware.CorsMiddleware, not here.
+"""
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse
+from functools import lru_cache
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+if orjson is not None:
+    _ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS
+
+    def _default(value):
+        return DjangoJSONEncoder().default(value)
+
+    def dumps(data):
+        """Serialize data to UTF-8 JSON bytes"""
+        return orjson.dumps(data, default=_default, option=_ORJSON_OPTIONS)
+
+    def loads(body):
+        """Parse a JSON request body (bytes or str); raises ValueError if malformed"""
+        return orjson.loads(body)
+else:
+    _encoder = DjangoJSONEncoder(separators=(',', ':'), ensure_ascii=False)
+
+    def dumps(data):
+        """Serialize data to UTF-8 JSON bytes"""
+        return _encoder.encode(data).encode('utf-8')
+
+    def loads(body):
+        """Parse a JSON request body (bytes or str); raises ValueError if malformed"""
+        return json.loads(body)
+
+
+def json_response(data, status=200):
+    """JSON API response"""
+    return HttpResponse(dumps(data), status=status, content_type='application/json')
+
+
+@lru_cache(maxsize=512)
+def _error_body(message):
+    return dumps({'success': False, 'message': message})
+
+
+def error_response(message, status=400):
+    """{'success': False, 'message': message} response; bodies of repeated messages are reused"""
+    return HttpResponse(_error_body(message), status=status, content_type='application/json')
@@ -0,0 +1,49 @@
+"""
+Optional in-process scheduler for periodic maintenance.
+
+Started by the WSGI and ASGI entry points (ecommerce.wsgi, ecommerce.asgi)
+when settings.OTP_PRUNE_INTERVAL is set, so management commands (migrate,
+shell, the outbox worker) never run it. Each web process runs its own daemon
+thread, so prefer cron with `manage.py prune_otps` (or a single
+`manage.py prune_otps --interval N` worker) when running many workers.
+"""
+from django.conf import settings
+from django.db import close_old_connections
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+_started = False
+_lock = threading.Lock()
+
+
+def prune_otps():
+    from .models import PasswordResetOTP
+    deleted = PasswordResetOTP.prune_expired(settings.OTP_PRUNE_BATCH_SIZE)
+    if deleted:
+        logger.info(f"Pruned {deleted} expired or used password reset OTPs")
+
+
+def _run(interval, task):
+    stop = threading.Event()
+    while not stop.wait(interval):
+        try:
+            task()
+        except Exception as e:
+            logger.error(f"Scheduled task {task.__name__} failed: {str(e)}")
+        finally:
+            close_old_connections()
+
+
+def start():
+    """Start the periodic OTP pruner once per process (no-op if disabled)"""
+    global _started
+    interval = getattr(settings, 'OTP_PRUNE_INTERVAL', 0)
+    if not interval:
+        return
+    with _lock:
+        if _started:
+            return
+        _started = True
+    threading.Thread(target=_run, args=(interval, prune_otps), name='otp-pruner', daemon=True).start()
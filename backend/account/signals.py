@@ -0,0 +1,28 @@
+from django.contrib.auth.models import User
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .models import MailjetSettings, UserProfile
+from .profile_cache import invalidate_profile
+from .user_directory import clear_user_count
+from .utils import reset_mailjet_clients
+
+
+@receiver([post_save, post_delete], sender=MailjetSettings)
+def clear_mailjet_settings_cache(sender, **kwargs):
+    """Forget cached Mailjet settings and clients whenever the settings change"""
+    MailjetSettings.clear_cache()
+    reset_mailjet_clients()
+
+
+@receiver([post_save, post_delete], sender=UserProfile)
+def clear_cached_profile(sender, instance, **kwargs):
+    """Drop the cached profile whenever it is saved (e.g. by update_profile_api) or deleted"""
+    invalidate_profile(instance.user_id)
+
+
+@receiver([post_save, post_delete], sender=User)
+def clear_cached_user_profile(sender, instance, created=False, **kwargs):
+    """The cached profile includes the user's email and name"""
+    invalidate_profile(instance.pk)
+    if created or kwargs.get('signal') is post_delete:
+        clear_user_count()
@@ -0,0 +1,71 @@
+"""
+Content-addressed media storage.
+
+ContentAddressedStorage names every saved file by the SHA-256 of its bytes,
+sharded two levels deep to keep directories small:
+
+    profile_images/photo.jpg -> profile_images/3f/a2/3fa2...e1.jpg
+
+The extension comes from the image format Pillow detects in the bytes, never
+from the uploaded name (every FileField here is an ImageField), so a file
+that also parses as HTML is not served as text/html; content Pillow does not
+recognize gets no extension and is served as application/octet-stream.
+
+Saving bytes that are already stored writes nothing and returns the existing
+name, so identical uploads share one file. A name always refers to the same
+content, which is what lets account.media serve files with a one-year
+immutable Cache-Control header. Files are shared, so delete a name only when
+nothing references it any more (see account.images.delete_files).
+"""
+from django.core.files.storage import FileSystemStorage
+from PIL import Image
+import hashlib
+import posixpath
+
+# Extensions of the usual formats; others get the first one Pillow registers
+EXTENSIONS = {'JPEG': '.jpg', 'PNG': '.png', 'GIF': '.gif', 'WEBP': '.webp'}
+
+
+def content_hash(content):
+    """Hex SHA-256 of a File, read in chunks"""
+    digest = hashlib.sha256()
+    for chunk in content.chunks():
+        digest.update(chunk if isinstance(chunk, bytes) else chunk.encode())
+    return digest.hexdigest()
+
+
+def image_extension(content):
+    """Extension for the image format of a File's bytes, or '' if Pillow does not recognize it"""
+    try:
+        content.seek(0)
+        # Reads the header only
+        with Image.open(content) as image:
+            image_format = image.format
+    except (OSError, SyntaxError, ValueError, Image.DecompressionBombError):
+        return ''
+    finally:
+        content.seek(0)
+    if image_format in EXTENSIONS:
+        return EXTENSIONS[image_format]
+    registered = [extension for extension, name in Image.registered_extensions().items() if name == image_format]
+    return registered[0] if registered else ''
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """FileSystemStorage that stores files under their content hash"""
+
+    # Directory levels of two hex digits each
+    shard_depth = 2
+
+    def hashed_name(self, name, digest, extension=''):
+        directory = posixpath.dirname(name)
+        shards = [digest[i * 2:i * 2 + 2] for i in range(self.shard_depth)]
+        return posixpath.join(directory, *shards, f"{digest}{extension}")
+
+    def _save(self, name, content):
+        # Uploads through account.uploads.ProfileImageUploadHandler are hashed already
+        digest = getattr(content, 'content_hash', None) or content_hash(content)
+        name = self.hashed_name(name, digest, image_extension(content))
+        if self.exists(name):
+            return name
+        return super()._save(name, content)
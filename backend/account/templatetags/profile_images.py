@@ -0,0 +1,9 @@
+from django import template
+
+register = template.Library()
+
+
+@register.filter
+def profile_image_url(profile, size):
+    """{{ profile|profile_image_url:64 }} - smallest variant covering 64px, see UserProfile.image_url"""
+    return profile.image_url(int(size)) if profile else None
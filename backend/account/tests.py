@@ -1,3 +1,474 @@
-from django.test import TestCase
+import io
+import posixpath
+import shutil
+import tempfile
+import threading
+import time
+from unittest import mock
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.files.base import ContentFile
+from django.db import connection
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings, skipUnlessDBFeature
+from django.utils import timezone
+from datetime import timedelta
+from . import otp_store, outbox, ratelimit, tokens
+from .imports import import_users, iter_records
+from .images import process_pending
+from .media import serve_media
+from .models import EmailOutbox, PasswordResetOTP, UserProfile
 
-# Create your tests here.
+
+@override_settings(RATE_LIMIT_ENABLED=False)
+class TokenTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='ada@example.com', email='ada@example.com', password='correct horse')
+
+    def refresh(self, refresh_token):
+        return self.client.post('/account/api/token/refresh/', {'refresh_token': refresh_token}, content_type='application/json')
+
+    def test_access_token_round_trip(self):
+        token = tokens.make_token(self.user.pk)
+        self.assertEqual(tokens.verify_token(token), self.user.pk)
+
+    def test_rejects_tampered_expired_and_wrong_kind_tokens(self):
+        token = tokens.make_token(self.user.pk)
+        user_id, expires, signature = token.split('.')
+        self.assertIsNone(tokens.verify_token(f"{self.user.pk + 1}.{expires}.{signature}"))
+        self.assertIsNone(tokens.verify_token(token, kind=tokens.REFRESH))
+        self.assertIsNone(tokens.verify_token('garbage'))
+        self.assertIsNone(tokens.verify_token(None))
+        with mock.patch('account.tokens.time.time', return_value=int(expires) + 1):
+            self.assertIsNone(tokens.verify_token(token))
+
+    def test_rejects_non_ascii_tokens(self):
+        for token in ('1.2.\u00e9', f"{tokens.make_token(self.user.pk)}\u00e9", '1.2.\udcff'):
+            with self.subTest(token=token):
+                self.assertIsNone(tokens.verify_token(token))
+        response = self.client.get('/account/api/profile/', headers={'Authorization': 'Bearer 1.2.\u00e9'})
+        self.assertEqual(response.status_code, 401)
+
+    def test_refresh_issues_new_tokens(self):
+        response = self.refresh(tokens.issue_tokens(self.user)['refresh_token'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(tokens.verify_token(response.json()['access_token']), self.user.pk)
+
+    def test_password_change_revokes_refresh_tokens(self):
+        refresh_token = tokens.issue_tokens(self.user)['refresh_token']
+        self.user.set_password('another horse')
+        self.user.save()
+        self.assertEqual(self.refresh(refresh_token).status_code, 401)
+        self.assertEqual(self.refresh(tokens.issue_tokens(self.user)['refresh_token']).status_code, 200)
+
+    def test_refresh_rejects_unstamped_and_inactive(self):
+        self.assertEqual(self.refresh(tokens.make_token(self.user.pk, tokens.REFRESH)).status_code, 401)
+        refresh_token = tokens.issue_tokens(self.user)['refresh_token']
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        self.assertEqual(self.refresh(refresh_token).status_code, 401)
+
+
+@override_settings(RATE_LIMIT_ENABLED=False)
+class ImportTests(TestCase):
+
+    def test_bad_lines_are_per_record_errors(self):
+        User.objects.create_user(username='old@example.com', email='old@example.com')
+        data = (
+            b'{"email": "a@example.com", "name": "A", "password": "long enough"}\n'
+            b'{"email": "broken\n'
+            b'\xff\xfe not utf-8\n'
+            b'{"email": "b@example.com"}\n'
+            b'{"email": "A@example.com"}\n'
+            b'{"email": "old@example.com"}\n'
+            b'{"email": "' + b'x' * 150 + b'@example.com"}\n'
+        )
+        result = import_users(iter_records(io.BytesIO(data), 'jsonl'), batch_size=1)
+        self.assertEqual((result.created, result.duplicates, result.existing, result.invalid), (2, 1, 1, 3))
+        self.assertEqual(len(result.errors), 3)
+        self.assertEqual(UserProfile.objects.filter(user__email__in=['a@example.com', 'b@example.com']).count(), 2)
+        self.assertEqual(EmailOutbox.objects.filter(kind=EmailOutbox.KIND_CONFIRMATION).count(), 2)
+
+    def test_csv_rows_and_passwords(self):
+        data = 'email,name,password,city\r\nc@example.com,C,long enough,Dhaka\r\nd@example.com,D,,\r\ne@example.com,E,short,\r\n'
+        with mock.patch('account.imports.ProcessPoolExecutor') as pool:
+            result = import_users(iter_records(io.BytesIO(data.encode()), 'csv'), send_welcome=False)
+        pool.assert_not_called()
+        self.assertEqual((result.created, result.invalid), (2, 1))
+        self.assertTrue(User.objects.get(email='c@example.com').check_password('long enough'))
+        self.assertFalse(User.objects.get(email='d@example.com').has_usable_password())
+        self.assertEqual(UserProfile.objects.get(user__email='c@example.com').city, 'Dhaka')
+
+    @override_settings(USER_IMPORT_API_MAX_ROWS=2)
+    def test_api_is_bounded_and_reports_counts(self):
+        staff = User.objects.create_user(username='staff@example.com', email='staff@example.com', is_staff=True)
+        data = b'not json\n' + b''.join(b'{"email": "u%d@example.com"}\n' % i for i in range(5))
+        with mock.patch('account.imports.ProcessPoolExecutor') as pool:
+            response = self.client.post(
+                '/account/api/users/import/?format=jsonl&welcome_email=0', data, content_type='application/x-ndjson',
+                headers={'Authorization': f"Bearer {tokens.issue_tokens(staff)['access_token']}"},
+            )
+        pool.assert_not_called()
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual((body['created'], body['invalid'], body['truncated']), (1, 1, True))
+
+
+class DatabaseOTPStoreTests(TestCase):
+
+    def setUp(self):
+        self.store = otp_store.DatabaseOTPStore()
+        self.user = User.objects.create_user(username='otp@example.com', email='otp@example.com')
+
+    def test_issue_after_resend_replaces_every_code(self):
+        first = self.store.issue(self.user, self.user.email)
+        self.store.issue(self.user, self.user.email, replace=False)
+        self.assertEqual(PasswordResetOTP.objects.filter(email=self.user.email).count(), 2)
+        latest = self.store.issue(self.user, self.user.email)
+        self.assertEqual(PasswordResetOTP.objects.filter(email=self.user.email).count(), 1)
+        if first != latest:
+            self.assertEqual(self.store.verify(self.user.email, first), (otp_store.INVALID, None))
+
+    def test_verify_and_consume(self):
+        otp = self.store.issue(self.user, self.user.email)
+        self.assertEqual(self.store.consume(self.user.email, otp), (otp_store.INVALID, None))
+        self.assertEqual(self.store.verify(self.user.email, otp)[0], otp_store.VERIFIED)
+        self.assertEqual(self.store.consume(self.user.email, otp), (otp_store.VERIFIED, self.user.pk))
+        self.assertEqual(self.store.consume(self.user.email, otp), (otp_store.INVALID, None))
+
+    def test_expired_code(self):
+        otp = self.store.issue(self.user, self.user.email)
+        PasswordResetOTP.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(self.store.verify(self.user.email, otp), (otp_store.EXPIRED, None))
+
+    @override_settings(OTP_TTL_SECONDS=60)
+    def test_prune_drops_expired_and_old_verified_codes(self):
+        now = timezone.now()
+        fresh = PasswordResetOTP.objects.create(user=self.user, email=self.user.email, otp='111111', expires_at=now + timedelta(minutes=1))
+        PasswordResetOTP.objects.create(user=self.user, email=self.user.email, otp='222222', expires_at=now - timedelta(seconds=1))
+        used = PasswordResetOTP.objects.create(user=self.user, email=self.user.email, otp='333333', is_verified=True, expires_at=now + timedelta(minutes=1))
+        PasswordResetOTP.objects.filter(pk=used.pk).update(created_at=now - timedelta(minutes=2))
+        self.assertEqual(PasswordResetOTP.prune_expired(batch_size=1), 2)
+        self.assertEqual(list(PasswordResetOTP.objects.values_list('pk', flat=True)), [fresh.pk])
+
+
+def guess_concurrently(store, email, otp, count):
+    """verify() outcomes of count threads guessing otp at the same time"""
+    barrier = threading.Barrier(count)
+    outcomes = []
+
+    def guess():
+        try:
+            barrier.wait()
+            outcomes.append(store.verify(email, otp)[0])
+        finally:
+            connection.close()
+
+    threads = [threading.Thread(target=guess) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return outcomes
+
+
+@override_settings(OTP_MAX_ATTEMPTS=3)
+class OTPLockoutTests(TestCase):
+
+    def setUp(self):
+        caches['default'].clear()
+        self.user = User.objects.create_user(username='lock@example.com', email='lock@example.com')
+
+    def wrong(self, otp):
+        return '000000' if otp != '000000' else '111111'
+
+    def assert_locks_until_reissued(self, store, verify):
+        email = self.user.email
+        otp = store.issue(self.user, email)
+        self.assertEqual(verify(email, self.wrong(otp))[0], otp_store.INVALID)
+        self.assertEqual(verify(email, self.wrong(otp))[0], otp_store.INVALID)
+        self.assertEqual(verify(email, self.wrong(otp))[0], otp_store.LOCKED)
+        # The right code no longer works once locked
+        self.assertEqual(verify(email, otp)[0], otp_store.LOCKED)
+        self.assertEqual(store.consume(email, otp)[0], otp_store.LOCKED)
+        # A new code starts a new count
+        otp = store.issue(self.user, email)
+        self.assertEqual(verify(email, self.wrong(otp))[0], otp_store.INVALID)
+        self.assertEqual(verify(email, otp)[0], otp_store.VERIFIED)
+
+    def test_database_store(self):
+        store = otp_store.DatabaseOTPStore()
+        self.assert_locks_until_reissued(store, store.verify)
+
+    def test_database_store_async(self):
+        store = otp_store.DatabaseOTPStore()
+        self.assert_locks_until_reissued(store, async_to_sync(store.averify))
+
+    def test_cache_store(self):
+        store = otp_store.CacheOTPStore()
+        self.assert_locks_until_reissued(store, store.verify)
+
+    def assert_consume_misses_count(self, store):
+        email = self.user.email
+        otp = store.issue(self.user, email)
+        self.assertEqual(store.verify(email, otp)[0], otp_store.VERIFIED)
+        # The verified code cannot be guessed at through consume() either
+        self.assertEqual(store.consume(email, self.wrong(otp))[0], otp_store.INVALID)
+        self.assertEqual(store.consume(email, self.wrong(otp))[0], otp_store.INVALID)
+        self.assertEqual(store.consume(email, self.wrong(otp))[0], otp_store.LOCKED)
+        self.assertEqual(store.consume(email, otp)[0], otp_store.LOCKED)
+
+    def test_database_store_consume_misses_count(self):
+        self.assert_consume_misses_count(otp_store.DatabaseOTPStore())
+
+    def test_cache_store_consume_misses_count(self):
+        self.assert_consume_misses_count(otp_store.CacheOTPStore())
+
+    def test_successful_verify_gives_its_attempt_back(self):
+        for store in (otp_store.DatabaseOTPStore(), otp_store.CacheOTPStore()):
+            with self.subTest(store=type(store).__name__):
+                otp = store.issue(self.user, self.user.email)
+                self.assertEqual(store.verify(self.user.email, self.wrong(otp))[0], otp_store.INVALID)
+                self.assertEqual(store.verify(self.user.email, self.wrong(otp))[0], otp_store.INVALID)
+                self.assertEqual(store.verify(self.user.email, otp)[0], otp_store.VERIFIED)
+                self.assertEqual(store.consume(self.user.email, otp), (otp_store.VERIFIED, self.user.pk))
+
+    def test_cache_store_concurrent_guesses(self):
+        store = otp_store.CacheOTPStore()
+        otp = store.issue(self.user, self.user.email)
+        live_entry, compared = store._live_entry, []
+
+        def slow_live_entry(email):
+            # Keep every guess in flight at once
+            compared.append(email)
+            time.sleep(0.05)
+            return live_entry(email)
+
+        with mock.patch.object(store, '_live_entry', slow_live_entry):
+            outcomes = guess_concurrently(store, self.user.email, self.wrong(otp), 20)
+        # Only the guesses counted within the limit compare the code
+        self.assertEqual(len(compared), 3)
+        self.assertEqual(outcomes.count(otp_store.INVALID), 2)
+        self.assertEqual(outcomes.count(otp_store.LOCKED), 18)
+
+    def test_codes_are_six_digits(self):
+        codes = {PasswordResetOTP.generate_otp() for _ in range(50)}
+        self.assertTrue(all(len(code) == 6 and code.isdigit() for code in codes))
+        self.assertGreater(len(codes), 1)
+
+
+@override_settings(OTP_MAX_ATTEMPTS=3)
+class ConcurrentOTPGuessTests(TransactionTestCase):
+
+    @skipUnlessDBFeature('test_db_allows_multiple_connections')
+    def test_database_store_concurrent_guesses(self):
+        user = User.objects.create_user(username='race@example.com', email='race@example.com')
+        store = otp_store.DatabaseOTPStore()
+        otp = store.issue(user, user.email)
+        with mock.patch.object(store, '_lookup', wraps=store._lookup) as lookup:
+            outcomes = guess_concurrently(store, user.email, '000000' if otp != '000000' else '111111', 20)
+        # Only the guesses counted within the limit compare the code
+        self.assertEqual(lookup.call_count, 3)
+        self.assertEqual(outcomes.count(otp_store.VERIFIED), 0)
+        self.assertGreaterEqual(outcomes.count(otp_store.LOCKED), 18)
+        self.assertEqual(PasswordResetOTP.objects.get(email=user.email).attempts, 3)
+
+
+@override_settings(EMAIL_OUTBOX_MAX_ATTEMPTS=2, OTP_TTL_SECONDS=60, EMAIL_OUTBOX_KEEP_SENT_SECONDS=3600)
+class EmailOutboxTests(TestCase):
+
+    def process(self, *results):
+        """process_batch() with Mailjet returning results; also returns the messages it was given"""
+        messages = []
+
+        def send(emails):
+            messages.extend(emails)
+            return list(results)
+
+        with mock.patch('account.outbox.send_bulk_emails', send):
+            counts = outbox.process_batch()
+        return counts, messages
+
+    def due_now(self):
+        EmailOutbox.objects.update(next_attempt_at=timezone.now())
+
+    def test_sent_otp_is_blanked(self):
+        entry = outbox.queue_otp_email('ada@example.com', '123456', user_name='Ada')
+        (sent, failed), send = self.process((True, None))
+        self.assertEqual((sent, failed), (1, 0))
+        self.assertEqual(send, [('ada@example.com', EmailOutbox.KIND_OTP, {'otp': '123456', 'user_name': 'Ada'})])
+        entry.refresh_from_db()
+        self.assertEqual((entry.status, entry.context), (EmailOutbox.STATUS_SENT, {'otp': '', 'user_name': 'Ada'}))
+
+    def test_otp_kept_for_retries_and_blanked_when_given_up(self):
+        entry = outbox.queue_otp_email('ada@example.com', '123456')
+        self.process((False, 'Mailjet is down'))
+        entry.refresh_from_db()
+        self.assertEqual((entry.status, entry.context['otp']), (EmailOutbox.STATUS_PENDING, '123456'))
+        self.due_now()
+        self.process((False, 'Mailjet is down'))
+        entry.refresh_from_db()
+        self.assertEqual((entry.status, entry.context['otp']), (EmailOutbox.STATUS_FAILED, ''))
+
+    def test_expired_otp_is_not_sent_or_retried(self):
+        old = outbox.queue_otp_email('old@example.com', '111111')
+        EmailOutbox.objects.filter(pk=old.pk).update(created_at=timezone.now() - timedelta(seconds=61))
+        outbox.queue_confirmation_email('new@example.com')
+        (sent, failed), send = self.process((True, None))
+        self.assertEqual((sent, failed), (1, 1))
+        self.assertEqual([email for email, _, _ in send], ['new@example.com'])
+        old.refresh_from_db()
+        self.assertEqual((old.status, old.context['otp']), (EmailOutbox.STATUS_FAILED, ''))
+
+        # A failure after the code expired is not retried
+        late = outbox.queue_otp_email('late@example.com', '222222')
+        with mock.patch('account.outbox.timezone.now', return_value=timezone.now() + timedelta(seconds=61)):
+            self.assertEqual(outbox.claim_batch(), [late])
+            outbox.record_result(late, False, 'Mailjet is down')
+        late.refresh_from_db()
+        self.assertEqual((late.status, late.attempts, late.context['otp']), (EmailOutbox.STATUS_FAILED, 1, ''))
+
+    def test_prune_sent(self):
+        now = timezone.now()
+        old = outbox.queue_confirmation_email('old@example.com')
+        recent = outbox.queue_confirmation_email('recent@example.com')
+        failed = outbox.queue_confirmation_email('failed@example.com')
+        EmailOutbox.objects.filter(pk=old.pk).update(status=EmailOutbox.STATUS_SENT, sent_at=now - timedelta(hours=2))
+        EmailOutbox.objects.filter(pk=recent.pk).update(status=EmailOutbox.STATUS_SENT, sent_at=now)
+        EmailOutbox.objects.filter(pk=failed.pk).update(status=EmailOutbox.STATUS_FAILED, updated_at=now - timedelta(hours=2))
+        self.assertEqual(EmailOutbox.prune_sent(batch_size=1), 1)
+        self.assertEqual(set(EmailOutbox.objects.values_list('pk', flat=True)), {recent.pk, failed.pk})
+
+
+class RateLimitTests(TestCase):
+
+    def setUp(self):
+        caches['default'].clear()
+        self.rule = ratelimit.Rule.parse('ip:5/m')
+
+    def test_concurrent_requests_do_not_exceed_the_limit(self):
+        barrier = threading.Barrier(20)
+        allowed = []
+
+        def hit():
+            barrier.wait()
+            allowed.append(ratelimit._hit(caches['default'], 'test', self.rule, '10.0.0.1', 1000.0) == 0)
+
+        threads = [threading.Thread(target=hit) for _ in range(20)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(allowed.count(True), 5)
+
+    def test_rejected_requests_are_not_counted(self):
+        cache = caches['default']
+        results = [ratelimit._hit(cache, 'test', self.rule, '10.0.0.2', 1000.0) for _ in range(8)]
+        self.assertEqual(results[:5], [0] * 5)
+        self.assertTrue(all(retry_after > 0 for retry_after in results[5:]))
+        # Next window: the previous one's 5 requests weigh in, not the 3 rejected ones
+        self.assertEqual(ratelimit._hit(cache, 'test', self.rule, '10.0.0.2', 1030.0), 0)
+        self.assertGreater(ratelimit._hit(cache, 'test', self.rule, '10.0.0.2', 1030.0), 0)
+
+    def test_request_email(self):
+        factory = RequestFactory()
+        request = factory.post('/', {'email': ' Ada@Example.com '}, content_type='application/json')
+        self.assertEqual(ratelimit.request_email(request), 'ada@example.com')
+        self.assertIsNone(ratelimit.request_email(factory.post('/', 'not json', content_type='application/json')))
+        self.assertIsNone(ratelimit.request_email(factory.post('/', {'email': 'a@example.com'})))
+
+
+@override_settings(RATE_LIMIT_ENABLED=False)
+class SignupLoginTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='in@example.com', email='in@example.com', password='correct horse')
+
+    def post(self, url, data):
+        return self.client.post(url, data, content_type='application/json')
+
+    def test_logged_in_check_comes_before_validation(self):
+        self.client.force_login(self.user)
+        for url in ('/account/api/signup/', '/account/api/login/'):
+            response = self.post(url, {'email': ''})
+            self.assertEqual(response.status_code, 403)
+            self.assertIn('already logged in', response.json()['message'])
+
+    def test_signup_and_login(self):
+        response = self.post('/account/api/signup/', {'name': 'New', 'email': 'new@example.com', 'password': 'long enough', 'confirm-password': 'long enough'})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.post('/account/api/signup/', {'name': 'New', 'email': 'new@example.com', 'password': 'long enough', 'confirm-password': 'long enough'}).status_code, 400)
+        self.assertEqual(self.post('/account/api/signup/', {'name': 'X', 'email': 'x@example.com', 'password': 'long enough', 'confirm-password': 'different'}).status_code, 400)
+        response = self.post('/account/api/login/', {'email': 'new@example.com', 'password': 'long enough'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(tokens.verify_token(response.json()['access_token']), User.objects.get(email='new@example.com').pk)
+        self.assertEqual(self.post('/account/api/login/', {'email': 'new@example.com', 'password': 'wrong one'}).status_code, 401)
+
+
+class ProfileImageTests(TestCase):
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings_override = override_settings(MEDIA_ROOT=media_root, RATE_LIMIT_ENABLED=False, PROFILE_IMAGE_PLACEHOLDER_URL=None)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        caches['default'].clear()
+        self.user = User.objects.create_user(username='pic@example.com', email='pic@example.com')
+
+    def jpeg_with_gps(self):
+        from PIL import Image
+        image = Image.new('RGB', (300, 200), 'red')
+        exif = Image.Exif()
+        # GPSInfo
+        exif[0x8825] = {1: 'N', 2: (51.0, 30.0, 0.0)}
+        buffer = io.BytesIO()
+        image.save(buffer, 'JPEG', exif=exif)
+        buffer.name = 'photo.jpg'
+        buffer.seek(0)
+        return buffer
+
+    def test_unprocessed_upload_is_never_served(self):
+        from PIL import Image
+        response = self.client.post(
+            '/account/api/profile/update/', {'profile_image': self.jpeg_with_gps()},
+            headers={'Authorization': f"Bearer {tokens.issue_tokens(self.user)['access_token']}"},
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(response.json()['profile']['profile_image'])
+        profile = UserProfile.objects.get(user=self.user)
+        self.assertIsNone(profile.image_url())
+
+        self.assertEqual(process_pending(), (1, 0))
+        profile.refresh_from_db()
+        self.assertEqual(profile.image_status, UserProfile.IMAGE_READY)
+        self.assertIn('variants', profile.image_url())
+        with profile.profile_image.open('rb') as f, Image.open(f) as image:
+            self.assertEqual(len(image.getexif()), 0)
+
+    def test_stored_extension_comes_from_the_image_format(self):
+        # Valid JPEG that a browser would also render as HTML
+        polyglot = io.BytesIO(self.jpeg_with_gps().getvalue() + b'<html><script>alert(1)</script></html>')
+        polyglot.name = 'x.html'
+        response = self.client.post(
+            '/account/api/profile/update/', {'profile_image': polyglot},
+            headers={'Authorization': f"Bearer {tokens.issue_tokens(self.user)['access_token']}"},
+        )
+        self.assertEqual(response.status_code, 200)
+        name = UserProfile.objects.get(user=self.user).profile_image.name
+        self.assertTrue(name.startswith('profile_images/') and name.endswith('.jpg'), name)
+        for mode in ('django', 'x-accel-redirect'):
+            with self.subTest(mode=mode), override_settings(MEDIA_SERVE_MODE=mode):
+                self.assertEqual(serve_media(RequestFactory().get('/'), name)['Content-Type'], 'image/jpeg')
+
+        # Content Pillow does not recognize gets no extension
+        storage = UserProfile._meta.get_field('profile_image').storage
+        name = storage.save('profile_images/page.html', ContentFile(b'<html></html>'))
+        self.assertEqual(posixpath.splitext(name)[1], '')
+        self.assertEqual(serve_media(RequestFactory().get('/'), name)['Content-Type'], 'application/octet-stream')
+
+    @override_settings(PROFILE_IMAGE_PLACEHOLDER_URL='/static/avatar.png')
+    def test_failed_processing_keeps_the_placeholder(self):
+        profile = UserProfile.objects.create(user=self.user, image_status=UserProfile.IMAGE_FAILED)
+        profile.profile_image.save('photo.jpg', self.jpeg_with_gps())
+        self.assertEqual(profile.image_url(), '/static/avatar.png')
@@ -0,0 +1,92 @@
+"""
+Stateless signed API tokens.
+
+A token is "<user_id>.<expires>.<signature>", where the signature is an
+HMAC-SHA256 over the user id and expiry timestamp keyed from SECRET_KEY and
+the token type. Verifying an access token needs no database access.
+
+Refresh tokens also carry a stamp of the user's password hash
+("<user_id>.<expires>.<stamp>.<signature>"), checked against the database
+on refresh, so a password change or reset revokes every refresh token issued
+before it.
+"""
+from django.conf import settings
+import base64
+import hashlib
+import hmac
+import time
+
+ACCESS = 'access'
+REFRESH = 'refresh'
+
+_keys = {}
+
+
+def _key(kind):
+    secret = settings.SECRET_KEY
+    key = _keys.get((kind, secret))
+    if key is None:
+        key = hashlib.sha256(f"account.tokens.{kind}:{secret}".encode()).digest()
+        _keys[(kind, secret)] = key
+    return key
+
+
+def _signature(kind, payload):
+    digest = hmac.new(_key(kind), payload.encode(), hashlib.sha256).digest()
+    return base64.urlsafe_b64encode(digest).rstrip(b'=')
+
+
+def _lifetime(kind):
+    if kind == REFRESH:
+        return settings.REFRESH_TOKEN_LIFETIME
+    return settings.ACCESS_TOKEN_LIFETIME
+
+
+def user_stamp(user):
+    """Short HMAC of the user's password hash; changes whenever the password does"""
+    digest = hmac.new(_key('stamp'), f"{user.pk}:{user.password}".encode(), hashlib.sha256).digest()
+    return base64.urlsafe_b64encode(digest[:16]).rstrip(b'=').decode()
+
+
+def make_token(user_id, kind=ACCESS, stamp=None):
+    """Create a signed token of the given kind for user_id, bound to stamp if given"""
+    payload = f"{int(user_id)}.{int(time.time()) + _lifetime(kind)}"
+    if stamp:
+        payload = f"{payload}.{stamp}"
+    return f"{payload}.{_signature(kind, payload).decode()}"
+
+
+def read_token(token, kind=ACCESS):
+    """Return (user_id, stamp or None) of a valid, unexpired token of the given kind, else None"""
+    try:
+        payload, signature = token.rsplit('.', 1)
+        # As bytes: compare_digest raises TypeError on non-ASCII str
+        if not hmac.compare_digest(signature.encode(), _signature(kind, payload)):
+            return None
+        user_id, expires, *stamp = payload.split('.')
+        if int(expires) < time.time() or len(stamp) > 1:
+            return None
+        return int(user_id), stamp[0] if stamp else None
+    except (AttributeError, ValueError):
+        return None
+
+
+def verify_token(token, kind=ACCESS):
+    """Return the user id of a valid, unexpired token of the given kind, else None"""
+    claims = read_token(token, kind)
+    return claims[0] if claims else None
+
+
+def stamp_matches(user, stamp):
+    """Whether a refresh token's stamp still matches the user's password"""
+    return stamp is not None and hmac.compare_digest(stamp, user_stamp(user))
+
+
+def issue_tokens(user):
+    """Token payload returned to the client on login and refresh"""
+    return {
+        'access_token': make_token(user.pk, ACCESS),
+        'refresh_token': make_token(user.pk, REFRESH, stamp=user_stamp(user)),
+        'token_type': 'Bearer',
+        'expires_in': settings.ACCESS_TOKEN_LIFETIME,
+    }
@@ -0,0 +1,114 @@
+"""
+Streaming upload handler for profile images.
+
+ProfileImageUploadHandler runs ahead of Django's default handlers for
+update_profile_api (see ApiView.upload_handlers). It writes the image field
+straight to a temporary file, hashing it (SHA-256, reused by
+ContentAddressedStorage) and checking its magic bytes as chunks arrive, and
+stops parsing at the first chunk over PROFILE_IMAGE_MAX_UPLOAD_SIZE or with a
+non-image header. A body whose Content-Length is already too large is
+rejected before any of it is read.
+"""
+from django.conf import settings
+from django.core.files.uploadedfile import TemporaryUploadedFile
+from django.core.files.uploadhandler import FileUploadHandler, StopFutureHandlers
+from django.http.multipartparser import MultiPartParserError
+import hashlib
+
+# Room for the non-file profile fields in a multipart body
+FORM_FIELDS_ALLOWANCE = 64 * 1024
+
+# Enough of the file to tell the formats below apart
+SNIFF_LENGTH = 12
+
+
+class UploadRejected(MultiPartParserError):
+    """Raised while parsing the request body; turned into an API error response"""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+def sniff_image_format(head):
+    """Pillow format name for the first bytes of a file, or None"""
+    if head.startswith(b'\xff\xd8\xff'):
+        return 'JPEG'
+    if head.startswith(b'\x89PNG\r\n\x1a\n'):
+        return 'PNG'
+    if head.startswith((b'GIF87a', b'GIF89a')):
+        return 'GIF'
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return 'WEBP'
+    return None
+
+
+def too_large_message():
+    return f"Profile image must be at most {settings.PROFILE_IMAGE_MAX_UPLOAD_SIZE // (1024 * 1024)} MB"
+
+
+class ProfileImageUploadHandler(FileUploadHandler):
+    """Bounded, hashed upload of the profile_image field; other files go to the next handlers"""
+
+    field_name = 'profile_image'
+
+    def __init__(self, request=None):
+        super().__init__(request)
+        self.active = False
+
+    def handle_raw_input(self, input_data, META, content_length, boundary, encoding=None):
+        if content_length > settings.PROFILE_IMAGE_MAX_UPLOAD_SIZE + FORM_FIELDS_ALLOWANCE:
+            raise UploadRejected(413, too_large_message())
+        return None
+
+    def new_file(self, field_name, *args, **kwargs):
+        super().new_file(field_name, *args, **kwargs)
+        self.active = field_name == self.field_name
+        if not self.active:
+            return
+        self.file = TemporaryUploadedFile(self.file_name, self.content_type, 0, self.charset, self.content_type_extra)
+        self.digest = hashlib.sha256()
+        self.head = b''
+        self.size = 0
+        raise StopFutureHandlers()
+
+    def _reject(self, status, message):
+        self.active = False
+        self.file.close()
+        raise UploadRejected(status, message)
+
+    def _check_format(self):
+        if sniff_image_format(self.head) not in settings.PROFILE_IMAGE_FORMATS:
+            self._reject(400, f"Unsupported image format. Use one of: {', '.join(settings.PROFILE_IMAGE_FORMATS)}")
+
+    def receive_data_chunk(self, raw_data, start):
+        if not self.active:
+            return raw_data
+        self.size += len(raw_data)
+        if self.size > settings.PROFILE_IMAGE_MAX_UPLOAD_SIZE:
+            self._reject(413, too_large_message())
+        if len(self.head) < SNIFF_LENGTH:
+            self.head += raw_data[:SNIFF_LENGTH - len(self.head)]
+            if len(self.head) == SNIFF_LENGTH:
+                self._check_format()
+        self.digest.update(raw_data)
+        self.file.write(raw_data)
+        return None
+
+    def file_complete(self, file_size):
+        if not self.active:
+            return None
+        # Files shorter than SNIFF_LENGTH
+        if len(self.head) < SNIFF_LENGTH:
+            self._check_format()
+        self.active = False
+        self.file.seek(0)
+        self.file.size = file_size
+        self.file.content_hash = self.digest.hexdigest()
+        return self.file
+
+    def upload_interrupted(self):
+        if self.active:
+            self.active = False
+            self.file.close()
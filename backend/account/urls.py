@@ -1,16 +1,30 @@
 from django.urls import path
 from . import views
+from .ratelimit import register_rate_limits
 
 urlpatterns = [
     path('api/signup/', views.signup_api, name='signup_api'),
     path('api/login/', views.login_api, name='login_api'),
+    path('api/token/refresh/', views.token_refresh_api, name='token_refresh_api'),
     path('api/forgot-password/send-otp/', views.forgot_password_send_otp, name='forgot_password_send_otp'),
     path('api/forgot-password/verify-otp/', views.forgot_password_verify_otp, name='forgot_password_verify_otp'),
     path('api/forgot-password/reset/', views.forgot_password_reset, name='forgot_password_reset'),
     path('api/forgot-password/resend-otp/', views.forgot_password_resend_otp, name='forgot_password_resend_otp'),
     path('api/profile/', views.get_profile_api, name='get_profile_api'),
     path('api/profile/update/', views.update_profile_api, name='update_profile_api'),
+    path('api/users/import/', views.import_users_api, name='import_users_api'),
     path('mailjet-setup/', views.mailjet_setup, name='mailjet_setup'),
     path('users/', views.user_list, name='user_list'),
+    path('users/export/', views.export_users, name='export_users'),
     path('users/<int:user_id>/', views.user_details, name='user_details'),
 ]
+
+# Enforced by account.middleware.RateLimitMiddleware before the view runs
+register_rate_limits({
+    'signup_api': ['ip:10/h'],
+    'login_api': ['ip:30/m', 'email:10/15m'],
+    'forgot_password_send_otp': ['ip:10/h', 'email:3/15m'],
+    'forgot_password_resend_otp': ['ip:10/h', 'email:3/15m'],
+    'forgot_password_verify_otp': ['ip:30/15m'],
+    'forgot_password_reset': ['ip:30/15m'],
+})
@@ -0,0 +1,139 @@
+"""
+Queries behind the user_list admin page.
+
+Users are paged with a keyset on (date_joined, id) instead of OFFSET, searched
+with index-friendly prefix ranges on normalized columns, and the total comes
+from a cached (and, on PostgreSQL, estimated) count.
+"""
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Q
+from django.db.models.functions import Lower
+from datetime import datetime
+from .models import UserProfile
+
+USER_COUNT_CACHE_KEY = 'account:user_count'
+
+# Highest code point, used as the open end of a prefix range
+_PREFIX_END = '\U0010ffff'
+
+
+def _prefix_range(field, prefix):
+    """field >= prefix AND field < prefix + max char; can use a plain b-tree index"""
+    return Q(**{f'{field}__gte': prefix, f'{field}__lt': prefix + _PREFIX_END})
+
+
+def search_users(queryset, query):
+    """
+    Filter users whose email, name or phone starts with query (case-insensitive)
+
+    Matches run against LOWER(email), LOWER(first_name), LOWER(full_name) and
+    phone, each backed by an index (see migrations 0005 and 0006).
+    """
+    query = (query or '').strip()
+    if not query:
+        return queryset
+
+    if query.lstrip('+').isdigit():
+        matches = UserProfile.objects.filter(_prefix_range('phone', query)).values('user_id')
+        return queryset.filter(id__in=matches)
+
+    lowered = query.lower()
+    matches = (
+        UserProfile.objects.annotate(full_name_lower=Lower('full_name'))
+        .filter(_prefix_range('full_name_lower', lowered))
+        .values('user_id')
+    )
+    queryset = queryset.annotate(email_lower=Lower('email'), first_name_lower=Lower('first_name'))
+    return queryset.filter(
+        _prefix_range('email_lower', lowered)
+        | _prefix_range('first_name_lower', lowered)
+        | Q(id__in=matches)
+    )
+
+
+def encode_cursor(user):
+    return f"{user.date_joined.isoformat()}|{user.id}"
+
+
+def decode_cursor(cursor):
+    """(date_joined, id) from a cursor string, or None if it is malformed"""
+    try:
+        date_joined, user_id = cursor.rsplit('|', 1)
+        return datetime.fromisoformat(date_joined), int(user_id)
+    except (AttributeError, ValueError):
+        return None
+
+
+def keyset_page(queryset, after=None, before=None, page_size=None):
+    """
+    One page of users, newest first, positioned by cursor
+
+    Args:
+        after: cursor of the last row of the previous page (older rows follow)
+        before: cursor of the first row of the next page (newer rows precede)
+
+    Returns:
+        tuple: (list of users, next cursor or None, previous cursor or None)
+    """
+    page_size = page_size or settings.USER_LIST_PAGE_SIZE
+    after, before = decode_cursor(after) if after else None, decode_cursor(before) if before else None
+
+    # Written as "date_joined >= x AND (date_joined > x OR id > y)" so the
+    # leading condition is a plain range on the (date_joined, id) index
+    if before:
+        date_joined, user_id = before
+        rows = list(
+            queryset.filter(Q(date_joined__gt=date_joined) | Q(id__gt=user_id), date_joined__gte=date_joined)
+            .order_by('date_joined', 'id')[:page_size + 1]
+        )
+        has_newer = len(rows) > page_size
+        users = rows[:page_size][::-1]
+        has_older = True
+    else:
+        if after:
+            date_joined, user_id = after
+            queryset = queryset.filter(Q(date_joined__lt=date_joined) | Q(id__lt=user_id), date_joined__lte=date_joined)
+        rows = list(queryset.order_by('-date_joined', '-id')[:page_size + 1])
+        has_older = len(rows) > page_size
+        users = rows[:page_size]
+        has_newer = after is not None
+
+    next_cursor = encode_cursor(users[-1]) if users and has_older else None
+    previous_cursor = encode_cursor(users[0]) if users and has_newer else None
+    return users, next_cursor, previous_cursor
+
+
+def _estimated_count():
+    """Planner row estimate for auth_user on PostgreSQL, else None"""
+    if connection.vendor != 'postgresql':
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass", [User._meta.db_table])
+        row = cursor.fetchone()
+    return row[0] if row and row[0] > 0 else None
+
+
+def user_count():
+    """
+    Total number of users, cached for USER_COUNT_CACHE_TIMEOUT seconds
+
+    Returns:
+        tuple: (int, bool) - (count, is_estimate)
+    """
+    cached = cache.get(USER_COUNT_CACHE_KEY)
+    if cached is None:
+        estimate = _estimated_count()
+        if estimate is not None and estimate >= settings.USER_COUNT_ESTIMATE_THRESHOLD:
+            cached = (estimate, True)
+        else:
+            cached = (User.objects.count(), False)
+        cache.set(USER_COUNT_CACHE_KEY, cached, settings.USER_COUNT_CACHE_TIMEOUT)
+    return cached
+
+
+def clear_user_count():
+    """Forget the cached user count, e.g. after users are added or removed"""
+    cache.delete(USER_COUNT_CACHE_KEY)
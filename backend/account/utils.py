@@ -1,15 +1,77 @@
+from asgiref.sync import sync_to_async
 from mailjet_rest import Client
+from mailjet_rest.client import Endpoint, ApiError, TimeoutError as MailjetTimeoutError
 from django.conf import settings
-from django.template.loader import render_to_string
 from .models import MailjetSettings
+from .email_templates import render_email
+import asyncio
 import logging
 import json
+import threading
+import requests
+from requests.adapters import HTTPAdapter
 
 logger = logging.getLogger(__name__)
 
+_client_lock = threading.Lock()
+_clients = {}
+
+
+class PooledEndpoint(Endpoint):
+    """Endpoint that posts over the owning client's shared session"""
+
+    def create(self, data=None, filters=None, id=None, action_id=None, **kwargs):
+        if self.headers['Content-type'] == 'application/json':
+            data = json.dumps(data)
+        try:
+            return self._session.post(
+                self._url,
+                data=data,
+                params=filters,
+                headers=self.headers,
+                auth=self._auth,
+                timeout=settings.MAILJET_TIMEOUT,
+            )
+        except requests.exceptions.Timeout:
+            raise MailjetTimeoutError
+        except requests.RequestException as e:
+            raise ApiError(e)
+
+
+class PooledClient(Client):
+    """
+    Mailjet client whose sends share one keep-alive HTTP session.
+
+    mailjet_rest opens a new connection (and TLS handshake) for every call;
+    this client keeps a connection pool open for the life of the process.
+    """
+
+    def __init__(self, auth=None, **kwargs):
+        super().__init__(auth=auth, **kwargs)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=settings.MAILJET_POOL_SIZE)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def __getattr__(self, name):
+        endpoint = super().__getattr__(name)
+        if name != 'send':
+            return endpoint
+        pooled = PooledEndpoint(url=endpoint._url, headers=endpoint.headers, auth=endpoint._auth, action=endpoint.action)
+        pooled._session = self.session
+        return pooled
+
+
+def reset_mailjet_clients():
+    """Close pooled Mailjet clients, e.g. after the credentials change"""
+    with _client_lock:
+        for client in _clients.values():
+            client.session.close()
+        _clients.clear()
+
 
 def get_mailjet_client():
-    """Get Mailjet client with stored credentials"""
+    """Get the shared Mailjet client for the stored credentials"""
     try:
         mailjet_settings = MailjetSettings.get_active_settings()
         
@@ -22,7 +84,15 @@ def get_mailjet_client():
         if not api_key or not api_secret:
             raise Exception("Mailjet API credentials are incomplete. Please check your settings.")
         
-        return Client(auth=(api_key, api_secret), version='v3.1')
+        key = (api_key, api_secret, settings.MAILJET_API_URL)
+        client = _clients.get(key)
+        if client is None:
+            with _client_lock:
+                client = _clients.get(key)
+                if client is None:
+                    client = PooledClient(auth=(api_key, api_secret), version='v3.1', api_url=settings.MAILJET_API_URL)
+                    _clients[key] = client
+        return client
     except ImportError:
         raise Exception("Mailjet package not installed. Please run: pip install mailjet-rest")
 
@@ -57,8 +127,8 @@ def send_otp_email(email, otp, user_name=None):
         }
         
         try:
-            html_content = render_to_string('account/emails/password_reset_otp.html', context)
-            text_content = render_to_string('account/emails/password_reset_otp.txt', context)
+            html_content = render_email('account/emails/password_reset_otp.html', context)
+            text_content = render_email('account/emails/password_reset_otp.txt', context)
         except Exception as e:
             error_msg = f"Error rendering email template: {str(e)}"
             logger.error(error_msg)
@@ -300,8 +370,8 @@ def send_confirmation_email(email, user_name=None):
         }
         
         try:
-            html_content = render_to_string('account/emails/account_confirmation.html', context)
-            text_content = render_to_string('account/emails/account_confirmation.txt', context)
+            html_content = render_email('account/emails/account_confirmation.html', context)
+            text_content = render_email('account/emails/account_confirmation.txt', context)
         except Exception as e:
             error_msg = f"Error rendering email template: {str(e)}"
             logger.error(error_msg)
@@ -417,3 +487,259 @@ def send_confirmation_email(email, user_name=None):
         error_msg = f"Error sending email: {str(e)}"
         logger.error(f"Error sending confirmation email to {email}: {error_msg}")
         return False, error_msg
+
+
+# Templates available to send_bulk_emails, keyed by name
+EMAIL_TEMPLATES = {
+    'otp': {
+        'subject': "Password Reset OTP - Sreca",
+        'html': 'account/emails/password_reset_otp.html',
+        'text': 'account/emails/password_reset_otp.txt',
+    },
+    'confirmation': {
+        'subject': "Welcome to Sreca - Account Created Successfully",
+        'html': 'account/emails/account_confirmation.html',
+        'text': 'account/emails/account_confirmation.txt',
+    },
+}
+
+
+def _message_errors(message):
+    """Collect error strings from one entry of a v3.1 Messages response"""
+    errors = []
+    for err in message.get('Errors') or []:
+        if isinstance(err, dict):
+            errors.append(err.get('ErrorMessage') or err.get('Error') or err.get('ErrorCode') or str(err))
+        else:
+            errors.append(str(err))
+    return " | ".join(errors) or f"Mailjet API: Message status - {message.get('Status', '')}"
+
+
+def _chunk_statuses(chunk, status_code, response_data, text=''):
+    """
+    Per-message outcome of one v3.1 send response
+
+    Returns:
+        dict: index -> (bool, str)
+    """
+    messages = response_data.get('Messages') if isinstance(response_data, dict) else None
+    if isinstance(messages, list) and len(messages) == len(chunk):
+        # Mailjet answers with one status per message, in request order
+        statuses = {}
+        for (index, _), message in zip(chunk, messages):
+            status = message.get('Status', '') if isinstance(message, dict) else ''
+            if status == 'success' or 'Sent' in str(status):
+                statuses[index] = (True, None)
+            else:
+                statuses[index] = (False, _message_errors(message) if isinstance(message, dict) else str(message))
+        return statuses
+
+    if status_code == 200:
+        return {index: (True, None) for index, _ in chunk}
+
+    error_msg = f"Mailjet API error (Status {status_code}): {(text or '')[:500]}"
+    logger.error(f"Failed to send batch of {len(chunk)} emails: {error_msg}")
+    return {index: (False, error_msg) for index, _ in chunk}
+
+
+def _send_chunk(mailjet, chunk):
+    """
+    Send one v3.1 request for a chunk of (index, message) pairs
+
+    Returns:
+        dict: index -> (bool, str)
+    """
+    try:
+        result = mailjet.send.create(data={'Messages': [message for _, message in chunk]})
+    except Exception as api_error:
+        error_msg = f"Failed to connect to Mailjet API: {str(api_error)}"
+        logger.error(error_msg)
+        return {index: (False, error_msg) for index, _ in chunk}
+
+    try:
+        response_data = result.json()
+    except (ValueError, AttributeError, TypeError):
+        response_data = None
+    return _chunk_statuses(chunk, result.status_code, response_data, getattr(result, 'text', ''))
+
+
+def _build_messages(messages, mailjet_settings, results):
+    """
+    v3.1 message dicts for (email, template, context) tuples
+
+    Entries that cannot be sent get their error stored in results.
+
+    Returns:
+        list: (index, message) pairs
+    """
+    pending = []
+    for index, (email, template, context) in enumerate(messages):
+        spec = EMAIL_TEMPLATES.get(template)
+        if spec is None:
+            results[index] = (False, f"Unknown email template: {template}")
+            continue
+        if '@' not in email or '.' not in email.split('@')[1]:
+            results[index] = (False, "Invalid email format")
+            continue
+
+        context = dict(context, email=email)
+        context['user_name'] = context.get('user_name') or email.split('@')[0]
+        try:
+            html_content = render_email(spec['html'], context)
+            text_content = render_email(spec['text'], context)
+        except Exception as e:
+            results[index] = (False, f"Error rendering email template: {str(e)}")
+            continue
+
+        pending.append((index, {
+            "From": {
+                "Email": mailjet_settings.from_email,
+                "Name": mailjet_settings.from_name
+            },
+            "To": [
+                {
+                    "Email": email,
+                    "Name": context['user_name']
+                }
+            ],
+            "Subject": spec['subject'],
+            "TextPart": text_content,
+            "HTMLPart": html_content
+        }))
+    return pending
+
+
+def _chunks(pending):
+    chunk_size = settings.MAILJET_MAX_MESSAGES_PER_CALL
+    return [pending[start:start + chunk_size] for start in range(0, len(pending), chunk_size)]
+
+
+def send_bulk_emails(messages):
+    """
+    Send many template emails with as few Mailjet calls as possible
+
+    Messages are packed into v3.1 send requests of up to
+    MAILJET_MAX_MESSAGES_PER_CALL messages each.
+
+    Args:
+        messages: iterable of (email, template, context) tuples, where template
+            is a key of EMAIL_TEMPLATES and context may include user_name
+
+    Returns:
+        list: one (bool, str) - (success, error_message) per message, in order
+    """
+    messages = list(messages)
+    results = [(False, None)] * len(messages)
+    if not messages:
+        return results
+
+    try:
+        mailjet = get_mailjet_client()
+        mailjet_settings = MailjetSettings.get_active_settings()
+    except Exception as e:
+        error_msg = f"Error sending email: {str(e)}"
+        logger.error(error_msg)
+        return [(False, error_msg)] * len(messages)
+
+    if '@' not in mailjet_settings.from_email:
+        logger.error(f"Invalid sender email: {mailjet_settings.from_email}")
+        return [(False, "Invalid sender email format in settings")] * len(messages)
+
+    for chunk in _chunks(_build_messages(messages, mailjet_settings, results)):
+        for index, outcome in _send_chunk(mailjet, chunk).items():
+            results[index] = outcome
+
+    sent = sum(1 for success, _ in results if success)
+    logger.info(f"Bulk send: {sent}/{len(messages)} emails accepted by Mailjet")
+    return results
+
+
+class AsyncMailjetClient:
+    """
+    Mailjet v3.1 send client for asyncio code, built on httpx.AsyncClient.
+
+    Keeps a pool of keep-alive connections (MAILJET_POOL_SIZE) for its
+    lifetime; use it as an async context manager or call aclose().
+    """
+
+    def __init__(self, api_key, api_secret, api_url=None):
+        try:
+            import httpx
+        except ImportError:
+            raise Exception("httpx package not installed. Please run: pip install httpx")
+        self.api_key = api_key
+        self.url = f"{(api_url or settings.MAILJET_API_URL).rstrip('/')}/v3.1/send"
+        self._http = httpx.AsyncClient(
+            auth=(api_key, api_secret),
+            timeout=settings.MAILJET_TIMEOUT,
+            limits=httpx.Limits(max_connections=settings.MAILJET_POOL_SIZE, max_keepalive_connections=settings.MAILJET_POOL_SIZE),
+        )
+
+    async def send_chunk(self, chunk):
+        """Async counterpart of _send_chunk: dict index -> (bool, str)"""
+        try:
+            response = await self._http.post(self.url, json={'Messages': [message for _, message in chunk]})
+        except Exception as api_error:
+            error_msg = f"Failed to connect to Mailjet API: {str(api_error)}"
+            logger.error(error_msg)
+            return {index: (False, error_msg) for index, _ in chunk}
+        try:
+            response_data = response.json()
+        except ValueError:
+            response_data = None
+        return _chunk_statuses(chunk, response.status_code, response_data, response.text)
+
+    async def aclose(self):
+        await self._http.aclose()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+
+async def asend_bulk_emails(messages, client=None):
+    """
+    Async send_bulk_emails: the v3.1 requests of one call run concurrently
+
+    Args:
+        messages: iterable of (email, template, context) tuples
+        client: AsyncMailjetClient to reuse (default: one for this call)
+
+    Returns:
+        list: one (bool, str) - (success, error_message) per message, in order
+    """
+    messages = list(messages)
+    results = [(False, None)] * len(messages)
+    if not messages:
+        return results
+
+    mailjet_settings = await sync_to_async(MailjetSettings.get_active_settings)()
+    if not mailjet_settings or not mailjet_settings.api_key or not mailjet_settings.api_secret:
+        error_msg = "Error sending email: Mailjet settings not configured. Please configure at /account/mailjet-setup/"
+        logger.error(error_msg)
+        return [(False, error_msg)] * len(messages)
+    if '@' not in mailjet_settings.from_email:
+        logger.error(f"Invalid sender email: {mailjet_settings.from_email}")
+        return [(False, "Invalid sender email format in settings")] * len(messages)
+
+    own_client = client is None
+    try:
+        if own_client:
+            client = AsyncMailjetClient(mailjet_settings.api_key, mailjet_settings.api_secret)
+        chunks = _chunks(_build_messages(messages, mailjet_settings, results))
+        for statuses in await asyncio.gather(*(client.send_chunk(chunk) for chunk in chunks)):
+            for index, outcome in statuses.items():
+                results[index] = outcome
+    except Exception as e:
+        error_msg = f"Error sending email: {str(e)}"
+        logger.error(error_msg)
+        return [(False, error_msg)] * len(messages)
+    finally:
+        if own_client and client is not None:
+            await client.aclose()
+
+    sent = sum(1 for success, _ in results if success)
+    logger.info(f"Bulk send: {sent}/{len(messages)} emails accepted by Mailjet")
+    return results
@@ -1,109 +1,73 @@
+from asgiref.sync import sync_to_async
+from django.conf import settings
 from django.shortcuts import render
 from django.contrib.auth.models import User
-from django.contrib.auth import authenticate
-from django.http import JsonResponse
-from django.views.decorators.csrf import csrf_exempt
-from django.views.decorators.http import require_http_methods
+from django.contrib.auth import aauthenticate
+from django.http import HttpResponseNotModified, StreamingHttpResponse
+from django.contrib.admin.views.decorators import staff_member_required
+from django.db.models import Q
 from django.utils import timezone
-from datetime import timedelta
-import json
 import logging
-from .models import PasswordResetOTP, UserProfile
-from .utils import send_otp_email, send_confirmation_email
+from .api import ApiError, ApiView, Date, Same, Schema, String
+from .models import UserProfile
+from .responses import json_response
+from . import otp_store
+from .otp_store import get_otp_store
+from .outbox import aqueue_otp_email, aqueue_confirmation_email
+from .backends import amake_password
+from .utils import reset_mailjet_clients
+from .tokens import issue_tokens, read_token, stamp_matches, REFRESH
+from .profile_cache import acache_profile, aget_profile_entry, is_not_modified, set_validators, serialize_profile
+from .user_directory import search_users, keyset_page, user_count
+from .exports import EXPORT_FORMATS, CONTENT_TYPES, iter_export
+from .imports import IMPORT_FORMATS, iter_records, import_users
+from .images import delete_files, image_files, validate_image
+from .uploads import ProfileImageUploadHandler
+from ecommerce.routers import read_from_replica
 
 logger = logging.getLogger(__name__)
 
 
-def json_response_cors(data, status=200):
-    """Helper function to create JSON response with CORS headers"""
-    response = JsonResponse(data, status=status)
-    response["Access-Control-Allow-Origin"] = "*"
-    response["Access-Control-Allow-Methods"] = "GET, POST, PUT, DELETE, OPTIONS"
-    response["Access-Control-Allow-Headers"] = "Content-Type, Authorization"
-    return response
-
 # Create your views here.
 
-@csrf_exempt
-def signup_api(request):
+class SignupApi(ApiView):
     """
     API endpoint for user registration
     """
-    # Handle CORS preflight
-    if request.method == 'OPTIONS':
-        response = JsonResponse({})
-        response["Access-Control-Allow-Origin"] = "*"
-        response["Access-Control-Allow-Methods"] = "GET, POST, PUT, DELETE, OPTIONS"
-        response["Access-Control-Allow-Headers"] = "Content-Type, Authorization"
-        return response
-    
-    if request.method != 'POST':
-        return json_response_cors({
-            'success': False,
-            'message': 'Method not allowed'
-        }, status=405)
+    schema = Schema(
+        String('name', required=True),
+        String('email', required=True),
+        String('password', required=True, strip=False, min_length=8, message='Password must be at least 8 characters long'),
+        String('confirm-password', required=True, strip=False),
+        checks=[Same('password', 'confirm_password', 'Passwords do not match')],
+    )
     
-    # Check if user is already authenticated/logged in
-    if request.user.is_authenticated:
-        return json_response_cors({
-            'success': False,
-            'message': 'You are already logged in. Please logout first to create a new account.'
-        }, status=403)
+    async def aauthenticate(self, request):
+        # Check if user is already authenticated/logged in (before the body is validated)
+        if (await request.auser()).is_authenticated:
+            raise ApiError(403, 'You are already logged in. Please logout first to create a new account.')
     
-    try:
-        data = json.loads(request.body)
-        name = data.get('name', '').strip()
-        email = data.get('email', '').strip()
-        password = data.get('password', '')
-        confirm_password = data.get('confirm-password', '')
-        
-        # Validation
-        if not name or not email or not password or not confirm_password:
-            return json_response_cors({
-                'success': False,
-                'message': 'All fields are required'
-            }, status=400)
-        
-        if password != confirm_password:
-            return json_response_cors({
-                'success': False,
-                'message': 'Passwords do not match'
-            }, status=400)
-        
-        if len(password) < 8:
-            return json_response_cors({
-                'success': False,
-                'message': 'Password must be at least 8 characters long'
-            }, status=400)
+    async def post(self, request, data):
+        name = data['name']
+        email = data['email']
         
         # Check if user already exists
-        if User.objects.filter(username=email).exists():
-            return json_response_cors({
-                'success': False,
-                'message': 'User with this email already exists'
-            }, status=400)
-        
-        if User.objects.filter(email=email).exists():
-            return json_response_cors({
-                'success': False,
-                'message': 'User with this email already exists'
-            }, status=400)
-        
-        # Create user
-        user = User.objects.create_user(
-            username=email,
-            email=email,
-            password=password,
-            first_name=name
+        if await User.objects.filter(Q(username=email) | Q(email=email)).aexists():
+            raise ApiError(400, 'User with this email already exists')
+        
+        # Create user (same fields as create_user(), with the password hashed off the event loop)
+        user = User(
+            username=User.normalize_username(email),
+            email=User.objects.normalize_email(email),
+            first_name=name,
+            password=await amake_password(data['password'])
         )
+        await user.asave()
         
-        # Send confirmation email
-        email_sent, email_error = send_confirmation_email(email, name)
-        if not email_sent:
-            # Log error but don't fail registration if email fails
-            logger.warning(f"Failed to send confirmation email to {email}: {email_error}")
+        # Queue confirmation email (delivered by the outbox worker)
+        await aqueue_confirmation_email(email, name)
         
-        return json_response_cors({
+        return json_response({
             'success': True,
             'message': 'User registered successfully',
             'user': {
@@ -113,455 +77,186 @@ def signup_api(request):
                 'username': user.username
             }
         }, status=201)
-        
-    except json.JSONDecodeError:
-        return json_response_cors({
-            'success': False,
-            'message': 'Invalid JSON data'
-        }, status=400)
-    except Exception as e:
-        return json_response_cors({
-            'success': False,
-            'message': str(e)
-        }, status=500)
 
 
-@csrf_exempt
-def login_api(request):
+class LoginApi(ApiView):
     """
     API endpoint for user login
     """
-    # Handle CORS preflight
-    if request.method == 'OPTIONS':
-        response = JsonResponse({})
-        response["Access-Control-Allow-Origin"] = "*"
-        response["Access-Control-Allow-Methods"] = "GET, POST, PUT, DELETE, OPTIONS"
-        response["Access-Control-Allow-Headers"] = "Content-Type, Authorization"
-        return response
-    
-    if request.method != 'POST':
-        return json_response_cors({
-            'success': False,
-            'message': 'Method not allowed'
-        }, status=405)
+    schema = Schema(
+        String('email', required=True),
+        String('password', required=True, strip=False),
+        required_message='Email and password are required',
+    )
     
-    # Check if user is already authenticated/logged in
-    if request.user.is_authenticated:
-        return json_response_cors({
-            'success': False,
-            'message': 'You are already logged in. Please logout first.'
-        }, status=403)
+    async def aauthenticate(self, request):
+        # Check if user is already authenticated/logged in (before the body is validated)
+        if (await request.auser()).is_authenticated:
+            raise ApiError(403, 'You are already logged in. Please logout first.')
     
-    try:
-        data = json.loads(request.body)
-        email = data.get('email', '').strip()
-        password = data.get('password', '')
+    async def post(self, request, data):
+        # Authenticate user by email (one indexed query, see account.backends.EmailBackend)
+        user = await aauthenticate(request, email=data['email'], password=data['password'])
         
-        # Validation
-        if not email or not password:
-            return json_response_cors({
-                'success': False,
-                'message': 'Email and password are required'
-            }, status=400)
+        if user is None:
+            raise ApiError(401, 'Invalid email or password')
+        if not user.is_active:
+            raise ApiError(403, 'Your account has been deactivated')
         
-        # Authenticate user
-        # Since we're using email as username, we need to find user by email first
-        try:
-            user = User.objects.get(email=email)
-        except User.DoesNotExist:
-            return json_response_cors({
-                'success': False,
-                'message': 'Invalid email or password'
-            }, status=401)
-        
-        # Authenticate using username (which is email in our case)
-        user = authenticate(request, username=user.username, password=password)
-        
-        if user is not None:
-            if user.is_active:
-                return json_response_cors({
-                    'success': True,
-                    'message': 'Login successful',
-                    'user': {
-                        'id': user.id,
-                        'name': user.first_name,
-                        'email': user.email,
-                        'username': user.username
-                    }
-                }, status=200)
-            else:
-                return json_response_cors({
-                    'success': False,
-                    'message': 'Your account has been deactivated'
-                }, status=403)
-        else:
-            return json_response_cors({
-                'success': False,
-                'message': 'Invalid email or password'
-            }, status=401)
-        
-    except json.JSONDecodeError:
-        return json_response_cors({
-            'success': False,
-            'message': 'Invalid JSON data'
-        }, status=400)
-    except Exception as e:
-        return json_response_cors({
-            'success': False,
-            'message': str(e)
-        }, status=500)
+        return json_response({
+            'success': True,
+            'message': 'Login successful',
+            'user': {
+                'id': user.id,
+                'name': user.first_name,
+                'email': user.email,
+                'username': user.username
+            },
+            **issue_tokens(user)
+        }, status=200)
 
 
-@csrf_exempt
-def forgot_password_send_otp(request):
+class TokenRefreshApi(ApiView):
     """
-    API endpoint to send OTP for password reset
+    API endpoint to exchange a refresh token for a new access/refresh token pair
     """
-    # Handle CORS preflight
-    if request.method == 'OPTIONS':
-        response = JsonResponse({})
-        response["Access-Control-Allow-Origin"] = "*"
-        response["Access-Control-Allow-Methods"] = "GET, POST, PUT, DELETE, OPTIONS"
-        response["Access-Control-Allow-Headers"] = "Content-Type, Authorization"
-        return response
+    schema = Schema(String('refresh_token', strip=False))
     
-    if request.method != 'POST':
-        return json_response_cors({
-            'success': False,
-            'message': 'Method not allowed'
-        }, status=405)
+    async def post(self, request, data):
+        claims = read_token(data.get('refresh_token', ''), kind=REFRESH)
+        if claims is None:
+            raise ApiError(401, 'Invalid or expired refresh token. Please login again.')
+        user_id, stamp = claims
+        
+        # Refresh is the one place a token holder is re-checked against the database
+        user = await User.objects.filter(id=user_id).only('id', 'password', 'is_active').afirst()
+        if user is None or not user.is_active:
+            raise ApiError(401, 'Your account is no longer active. Please login again.')
+        # Password changed (or reset) since the token was issued
+        if not stamp_matches(user, stamp):
+            raise ApiError(401, 'Invalid or expired refresh token. Please login again.')
+        
+        return json_response({
+            'success': True,
+            **issue_tokens(user)
+        }, status=200)
+
+
+class SendOtpApi(ApiView):
+    """
+    API endpoint to send OTP for password reset
+    """
+    schema = Schema(String('email', required=True, lower=True), required_message='Email is required')
+    # Earlier OTPs for the email stop working
+    replace_otp = True
+    sent_message = 'OTP sent to your email address'
     
-    try:
-        data = json.loads(request.body)
-        email = data.get('email', '').strip().lower()
-        
-        # Validation
-        if not email:
-            return json_response_cors({
-                'success': False,
-                'message': 'Email is required'
-            }, status=400)
+    async def post(self, request, data):
+        email = data['email']
         
         # Check if user exists
-        try:
-            user = User.objects.get(email=email)
-        except User.DoesNotExist:
+        user = await User.objects.filter(email=email).afirst()
+        if user is None:
             # Don't reveal if user exists for security
-            return json_response_cors({
+            return json_response({
                 'success': True,
                 'message': 'If the email exists, an OTP has been sent.'
             }, status=200)
         
-        # Generate OTP
-        otp = PasswordResetOTP.generate_otp()
-        expires_at = timezone.now() + timedelta(minutes=15)
-        
-        # Create or update OTP record
-        otp_record, created = PasswordResetOTP.objects.update_or_create(
-            user=user,
-            email=email,
-            defaults={
-                'otp': otp,
-                'is_verified': False,
-                'expires_at': expires_at
-            }
-        )
+        otp = await get_otp_store().aissue(user, email, replace=self.replace_otp)
         
-        # Send email
-        email_sent, error_message = send_otp_email(
+        # Queue email (delivered by the outbox worker)
+        await aqueue_otp_email(
             email=email,
             otp=otp,
             user_name=user.first_name or user.username
         )
         
-        if email_sent:
-            return json_response_cors({
-                'success': True,
-                'message': 'OTP sent to your email address'
-            }, status=200)
-        else:
-            # Provide helpful error message
-            if 'not configured' in error_message.lower() or 'not installed' in error_message.lower():
-                return json_response_cors({
-                    'success': False,
-                    'message': error_message or 'Mailjet is not configured. Please contact administrator.'
-                }, status=500)
-            else:
-                return json_response_cors({
-                    'success': False,
-                    'message': error_message or 'Failed to send email. Please try again later.'
-                }, status=500)
-        
-    except json.JSONDecodeError:
-        return json_response_cors({
-            'success': False,
-            'message': 'Invalid JSON data'
-        }, status=400)
-    except Exception as e:
-        return json_response_cors({
-            'success': False,
-            'message': str(e)
-        }, status=500)
+        return json_response({
+            'success': True,
+            'message': self.sent_message
+        }, status=200)
 
 
-@csrf_exempt
-def forgot_password_verify_otp(request):
+class ResendOtpApi(SendOtpApi):
+    """
+    API endpoint to resend OTP
+    """
+    # Earlier OTPs stay valid
+    replace_otp = False
+    sent_message = 'New OTP sent to your email address'
+
+
+def _otp_error(outcome, expired_message, invalid_message):
+    """ApiError for a failed otp_store outcome"""
+    if outcome == otp_store.LOCKED:
+        return ApiError(429, 'Too many incorrect attempts. Please try again later.')
+    if outcome == otp_store.EXPIRED:
+        return ApiError(400, expired_message)
+    return ApiError(400, invalid_message)
+
+
+class VerifyOtpApi(ApiView):
     """
     API endpoint to verify OTP
     """
-    # Handle CORS preflight
-    if request.method == 'OPTIONS':
-        response = JsonResponse({})
-        response["Access-Control-Allow-Origin"] = "*"
-        response["Access-Control-Allow-Methods"] = "GET, POST, PUT, DELETE, OPTIONS"
-        response["Access-Control-Allow-Headers"] = "Content-Type, Authorization"
-        return response
-    
-    if request.method != 'POST':
-        return json_response_cors({
-            'success': False,
-            'message': 'Method not allowed'
-        }, status=405)
+    schema = Schema(
+        String('email', required=True, lower=True),
+        String('otp', required=True, length=6, message='OTP must be 6 digits'),
+        required_message='Email and OTP are required',
+    )
     
-    try:
-        data = json.loads(request.body)
-        email = data.get('email', '').strip().lower()
-        otp = data.get('otp', '').strip()
-        
-        # Validation
-        if not email or not otp:
-            return json_response_cors({
-                'success': False,
-                'message': 'Email and OTP are required'
-            }, status=400)
-        
-        if len(otp) != 6:
-            return json_response_cors({
-                'success': False,
-                'message': 'OTP must be 6 digits'
-            }, status=400)
-        
-        # Get OTP record
-        try:
-            otp_record = PasswordResetOTP.objects.filter(
-                email=email,
-                otp=otp,
-                is_verified=False
-            ).order_by('-created_at').first()
-        except PasswordResetOTP.DoesNotExist:
-            otp_record = None
-        
-        if not otp_record:
-            return json_response_cors({
-                'success': False,
-                'message': 'Invalid or expired OTP'
-            }, status=400)
-        
-        # Check if expired
-        if otp_record.is_expired():
-            return json_response_cors({
-                'success': False,
-                'message': 'OTP has expired. Please request a new one.'
-            }, status=400)
+    async def post(self, request, data):
+        # Check the OTP and mark it verified
+        outcome, token = await get_otp_store().averify(data['email'], data['otp'])
+        if outcome != otp_store.VERIFIED:
+            raise _otp_error(outcome, 'OTP has expired. Please request a new one.', 'Invalid or expired OTP')
         
-        # Mark as verified
-        otp_record.is_verified = True
-        otp_record.save()
-        
-        return json_response_cors({
+        return json_response({
             'success': True,
             'message': 'OTP verified successfully',
-            'token': str(otp_record.id)  # Simple token for next step
+            'token': token  # Simple token for next step
         }, status=200)
-        
-    except json.JSONDecodeError:
-        return json_response_cors({
-            'success': False,
-            'message': 'Invalid JSON data'
-        }, status=400)
-    except Exception as e:
-        return json_response_cors({
-            'success': False,
-            'message': str(e)
-        }, status=500)
 
 
-@csrf_exempt
-def forgot_password_reset(request):
+class ResetPasswordApi(ApiView):
     """
     API endpoint to reset password after OTP verification
     """
-    # Handle CORS preflight
-    if request.method == 'OPTIONS':
-        response = JsonResponse({})
-        response["Access-Control-Allow-Origin"] = "*"
-        response["Access-Control-Allow-Methods"] = "GET, POST, PUT, DELETE, OPTIONS"
-        response["Access-Control-Allow-Headers"] = "Content-Type, Authorization"
-        return response
-    
-    if request.method != 'POST':
-        return json_response_cors({
-            'success': False,
-            'message': 'Method not allowed'
-        }, status=405)
+    schema = Schema(
+        String('email', required=True, lower=True),
+        String('otp', required=True),
+        String('password', required=True, strip=False, min_length=8, message='Password must be at least 8 characters long'),
+        String('confirmPassword', required=True, strip=False, attr='confirm_password'),
+        checks=[Same('password', 'confirm_password', 'Passwords do not match')],
+    )
     
-    try:
-        data = json.loads(request.body)
-        email = data.get('email', '').strip().lower()
-        otp = data.get('otp', '').strip()
-        password = data.get('password', '')
-        confirm_password = data.get('confirmPassword', '')
-        
-        # Validation
-        if not email or not otp or not password or not confirm_password:
-            return json_response_cors({
-                'success': False,
-                'message': 'All fields are required'
-            }, status=400)
-        
-        if password != confirm_password:
-            return json_response_cors({
-                'success': False,
-                'message': 'Passwords do not match'
-            }, status=400)
-        
-        if len(password) < 8:
-            return json_response_cors({
-                'success': False,
-                'message': 'Password must be at least 8 characters long'
-            }, status=400)
-        
-        # Verify OTP
-        try:
-            otp_record = PasswordResetOTP.objects.get(
-                email=email,
-                otp=otp,
-                is_verified=True
-            )
-        except PasswordResetOTP.DoesNotExist:
-            return json_response_cors({
-                'success': False,
-                'message': 'Invalid OTP or OTP not verified'
-            }, status=400)
-        
-        # Check if expired (even if verified, check expiration)
-        if otp_record.is_expired():
-            return json_response_cors({
-                'success': False,
-                'message': 'OTP has expired. Please start the process again.'
-            }, status=400)
+    async def post(self, request, data):
+        # Use up the verified OTP (OTPs are single use)
+        outcome, user_id = await get_otp_store().aconsume(data['email'], data['otp'])
+        if outcome != otp_store.VERIFIED:
+            raise _otp_error(outcome, 'OTP has expired. Please start the process again.', 'Invalid OTP or OTP not verified')
         
         # Reset password
-        user = otp_record.user
-        user.set_password(password)
-        user.save()
+        user = await User.objects.filter(id=user_id).afirst()
+        if user is None:
+            raise ApiError(400, 'Invalid OTP or OTP not verified')
+        user.password = await amake_password(data['password'])
+        await user.asave(update_fields=['password'])
         
-        # Mark all OTPs for this user as used
-        PasswordResetOTP.objects.filter(user=user, email=email).update(is_verified=True)
-        
-        return json_response_cors({
+        return json_response({
             'success': True,
             'message': 'Password reset successfully'
         }, status=200)
-        
-    except json.JSONDecodeError:
-        return json_response_cors({
-            'success': False,
-            'message': 'Invalid JSON data'
-        }, status=400)
-    except Exception as e:
-        return json_response_cors({
-            'success': False,
-            'message': str(e)
-        }, status=500)
 
 
-@csrf_exempt
-def forgot_password_resend_otp(request):
-    """
-    API endpoint to resend OTP
-    """
-    # Handle CORS preflight
-    if request.method == 'OPTIONS':
-        response = JsonResponse({})
-        response["Access-Control-Allow-Origin"] = "*"
-        response["Access-Control-Allow-Methods"] = "GET, POST, PUT, DELETE, OPTIONS"
-        response["Access-Control-Allow-Headers"] = "Content-Type, Authorization"
-        return response
-    
-    if request.method != 'POST':
-        return json_response_cors({
-            'success': False,
-            'message': 'Method not allowed'
-        }, status=405)
-    
-    try:
-        data = json.loads(request.body)
-        email = data.get('email', '').strip().lower()
-        
-        if not email:
-            return json_response_cors({
-                'success': False,
-                'message': 'Email is required'
-            }, status=400)
-        
-        # Check if user exists
-        try:
-            user = User.objects.get(email=email)
-        except User.DoesNotExist:
-            return json_response_cors({
-                'success': True,
-                'message': 'If the email exists, an OTP has been sent.'
-            }, status=200)
-        
-        # Generate new OTP
-        otp = PasswordResetOTP.generate_otp()
-        expires_at = timezone.now() + timedelta(minutes=15)
-        
-        # Create new OTP record (don't update, create new one)
-        otp_record = PasswordResetOTP.objects.create(
-            user=user,
-            email=email,
-            otp=otp,
-            is_verified=False,
-            expires_at=expires_at
-        )
-        
-        # Send email
-        email_sent, error_message = send_otp_email(
-            email=email,
-            otp=otp,
-            user_name=user.first_name or user.username
-        )
-        
-        if email_sent:
-            return json_response_cors({
-                'success': True,
-                'message': 'New OTP sent to your email address'
-            }, status=200)
-        else:
-            # Provide helpful error message
-            if 'not configured' in error_message.lower() or 'not installed' in error_message.lower():
-                return json_response_cors({
-                    'success': False,
-                    'message': error_message or 'Mailjet is not configured. Please contact administrator.'
-                }, status=500)
-            else:
-                return json_response_cors({
-                    'success': False,
-                    'message': error_message or 'Failed to send email. Please try again later.'
-                }, status=500)
-        
-    except json.JSONDecodeError:
-        return json_response_cors({
-            'success': False,
-            'message': 'Invalid JSON data'
-        }, status=400)
-    except Exception as e:
-        return json_response_cors({
-            'success': False,
-            'message': str(e)
-        }, status=500)
+signup_api = SignupApi.as_view()
+login_api = LoginApi.as_view()
+token_refresh_api = TokenRefreshApi.as_view()
+forgot_password_send_otp = SendOtpApi.as_view()
+forgot_password_verify_otp = VerifyOtpApi.as_view()
+forgot_password_reset = ResetPasswordApi.as_view()
+forgot_password_resend_otp = ResendOtpApi.as_view()
 
 
 def mailjet_setup(request):
@@ -571,6 +266,10 @@ def mailjet_setup(request):
     from .models import MailjetSettings
     from django.contrib import messages
     
+    if request.method == 'POST':
+        # Always edit the current row, not a cached copy
+        MailjetSettings.clear_cache()
+    
     settings = MailjetSettings.get_active_settings()
     
     if request.method == 'POST':
@@ -607,7 +306,9 @@ def mailjet_setup(request):
                 )
                 messages.success(request, 'Mailjet settings saved successfully!')
             
-            # Refresh settings
+            # Refresh settings (update() above bypasses the cache-clearing signals)
+            MailjetSettings.clear_cache()
+            reset_mailjet_clients()
             settings = MailjetSettings.get_active_settings()
     
     context = {
@@ -616,17 +317,92 @@ def mailjet_setup(request):
     return render(request, 'account/mailjet_setup.html', context)
 
 
+@read_from_replica
 def user_list(request):
     """
-    Template view to display list of all users
+    Template view to display a page of users, newest first
     """
-    users = User.objects.all().order_by('-date_joined')
+    query = request.GET.get('q', '').strip()
+    users = search_users(User.objects.select_related('profile'), query)
+    users, next_cursor, previous_cursor = keyset_page(
+        users,
+        after=request.GET.get('after'),
+        before=request.GET.get('before'),
+    )
+    total_users, total_is_estimate = user_count()
+    
     context = {
-        'users': users
+        'users': users,
+        'query': query,
+        'next_cursor': next_cursor,
+        'previous_cursor': previous_cursor,
+        'total_users': total_users,
+        'total_is_estimate': total_is_estimate,
     }
     return render(request, 'account/user_list.html', context)
 
 
+@staff_member_required
+def export_users(request):
+    """
+    Streaming export of all users and profiles (staff only)
+    Query parameters: format=csv|jsonl, gzip=1
+    """
+    export_format = request.GET.get('format', 'csv')
+    if export_format not in EXPORT_FORMATS:
+        return json_response({
+            'success': False,
+            'message': f"Unsupported format. Use one of: {', '.join(EXPORT_FORMATS)}"
+        }, status=400)
+    compress = request.GET.get('gzip') in ('1', 'true', 'yes')
+    
+    filename = f"users-{timezone.now():%Y%m%d-%H%M%S}.{export_format}" + ('.gz' if compress else '')
+    response = StreamingHttpResponse(
+        iter_export(export_format, compress=compress),
+        content_type='application/gzip' if compress else CONTENT_TYPES[export_format],
+    )
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+class ImportUsersApi(ApiView):
+    """
+    API endpoint to bulk-create users from a CSV or JSON Lines upload (staff only)
+    Send the file as multipart field "file" or as the raw request body.
+    Query parameters: format=csv|jsonl, welcome_email=0
+    Reads at most USER_IMPORT_API_MAX_ROWS records; use `manage.py import_users` for more.
+    """
+    auth = 'staff'
+    # The upload is streamed by import_users, not parsed up front
+    parse_body = False
+    error_message = 'An error occurred: '
+    
+    def post(self, request):
+        import_format = request.GET.get('format', 'csv')
+        if import_format not in IMPORT_FORMATS:
+            raise ApiError(400, f"Unsupported format. Use one of: {', '.join(IMPORT_FORMATS)}")
+        send_welcome = request.GET.get('welcome_email') not in ('0', 'false', 'no')
+        
+        # Passwords are hashed inline, in this worker: the number of records is
+        # bounded, and larger files go through `manage.py import_users`
+        stream = request.FILES['file'] if 'file' in request.FILES else request
+        result = import_users(
+            iter_records(stream, import_format),
+            send_welcome=send_welcome,
+            max_rows=settings.USER_IMPORT_API_MAX_ROWS,
+        )
+        
+        return json_response({
+            'success': True,
+            'message': f'Imported {result.created} users',
+            **result.as_dict()
+        })
+
+
+import_users_api = ImportUsersApi.as_view()
+
+
+@read_from_replica
 def user_details(request, user_id):
     """
     Template view to display user details
@@ -649,371 +425,119 @@ def user_details(request, user_id):
         raise Http404("User not found")
 
 
-@csrf_exempt
-def get_profile_api(request):
+class GetProfileApi(ApiView):
     """
     API endpoint to get user profile
-    Requires user to be authenticated (email in request)
+    Requires a valid access token (Authorization: Bearer <token>)
     """
-    # Handle CORS preflight
-    if request.method == 'OPTIONS':
-        response = JsonResponse({})
-        response["Access-Control-Allow-Origin"] = "*"
-        response["Access-Control-Allow-Methods"] = "GET, POST, PUT, DELETE, OPTIONS"
-        response["Access-Control-Allow-Headers"] = "Content-Type, Authorization"
-        return response
-    
-    if request.method != 'GET':
-        return json_response_cors({
-            'success': False,
-            'message': 'Method not allowed'
-        }, status=405)
+    methods = ('GET',)
+    auth = 'token'
+    parse_body = False
     
-    try:
-        # Get user_id from query parameters
-        user_id = request.GET.get('user_id', '').strip()
+    async def get(self, request):
+        # Serialized profile from the read-through cache
+        entry = await aget_profile_entry(request.token_user_id)
+        if entry is None:
+            raise ApiError(404, 'User not found')
         
-        if not user_id:
-            return json_response_cors({
-                'success': False,
-                'message': 'User ID is required'
-            }, status=400)
-        
-        try:
-            user_id = int(user_id)
-        except ValueError:
-            return json_response_cors({
-                'success': False,
-                'message': 'Invalid user ID'
-            }, status=400)
-        
-        # Get user
-        try:
-            user = User.objects.get(id=user_id)
-        except User.DoesNotExist:
-            return json_response_cors({
-                'success': False,
-                'message': 'User not found'
-            }, status=404)
-        
-        # Get or create profile
-        profile, created = UserProfile.objects.get_or_create(user=user)
+        # Client already has the current version
+        if is_not_modified(request, entry):
+            return set_validators(HttpResponseNotModified(), entry)
         
         # Get image URL
-        image_url = None
-        if profile.profile_image:
-            image_url = request.build_absolute_uri(profile.profile_image.url)
+        profile_data = dict(entry['profile'])
+        if profile_data['profile_image']:
+            profile_data['profile_image'] = request.build_absolute_uri(profile_data['profile_image'])
         
-        # Return profile data
-        profile_data = {
-            'full_name': profile.full_name or user.first_name or '',
-            'email': user.email,
-            'date_of_birth': profile.date_of_birth.strftime('%Y-%m-%d') if profile.date_of_birth else '',
-            'gender': profile.gender or '',
-            'city': profile.city or '',
-            'area': profile.area or '',
-            'street_address': profile.street_address or '',
-            'phone': profile.phone or '',
-            'alternate_phone': profile.alternate_phone or '',
-            'instructions': profile.delivery_instructions or '',
-            'profile_image': image_url,
-        }
-        
-        return json_response_cors({
+        response = json_response({
             'success': True,
             'profile': profile_data
         })
-        
-    except Exception as e:
-        return json_response_cors({
-            'success': False,
-            'message': str(e)
-        }, status=500)
+        return set_validators(response, entry)
 
 
-@csrf_exempt
-def update_profile_api(request):
+class UpdateProfileApi(ApiView):
     """
     API endpoint to update user profile
-    Requires user to be authenticated and can only update their own profile
+    Requires a valid access token; users can only update their own profile.
+    Accepts JSON or multipart form data (with an optional profile_image file).
     """
-    # Handle CORS preflight
-    if request.method == 'OPTIONS':
-        response = JsonResponse({})
-        response["Access-Control-Allow-Origin"] = "*"
-        response["Access-Control-Allow-Methods"] = "GET, POST, PUT, DELETE, OPTIONS"
-        response["Access-Control-Allow-Headers"] = "Content-Type, Authorization"
-        return response
-    
-    if request.method != 'POST':
-        return json_response_cors({
-            'success': False,
-            'message': 'Method not allowed'
-        }, status=405)
+    auth = 'token'
+    schema = Schema(
+        String('user_id'),
+        String('full_name'),
+        Date('date_of_birth'),
+        String('gender'),
+        String('city'),
+        String('area'),
+        String('street_address'),
+        String('phone'),
+        String('alternate_phone'),
+        String('instructions', attr='delivery_instructions'),
+    )
+    # Streams profile_image to disk and stops reading at the size limit
+    upload_handlers = (ProfileImageUploadHandler,)
+    # Fields copied onto UserProfile when present in the request
+    profile_fields = ('full_name', 'date_of_birth', 'gender', 'city', 'area', 'street_address', 'phone', 'alternate_phone', 'delivery_instructions')
+    error_message = 'An error occurred while updating profile: '
     
-    try:
-        # Handle both JSON and FormData (multipart/form-data)
-        if request.content_type and 'multipart/form-data' in request.content_type:
-            # FormData (file upload)
-            data = request.POST
-            
-            # Get user_id - handle both string and int (FormData usually sends strings)
-            user_id_raw = data.get('user_id', '')
-            if isinstance(user_id_raw, str):
-                user_id = user_id_raw.strip()
-            elif isinstance(user_id_raw, int):
-                user_id = str(user_id_raw)
-            else:
-                user_id = ''
-            
-            # Get email
-            email_raw = data.get('email', '')
-            if isinstance(email_raw, str):
-                email = email_raw.strip()
-            else:
-                email = ''
-            
-            # Get authenticated_user_id - handle both string and int
-            authenticated_user_id_raw = data.get('authenticated_user_id', '')
-            if isinstance(authenticated_user_id_raw, str):
-                authenticated_user_id = authenticated_user_id_raw.strip()
-            elif isinstance(authenticated_user_id_raw, int):
-                authenticated_user_id = str(authenticated_user_id_raw)
-            else:
-                authenticated_user_id = ''
-            
-            # SECURITY CHECK: Verify authenticated user ID is provided
-            if not authenticated_user_id or authenticated_user_id == '':
-                return json_response_cors({
-                    'success': False,
-                    'message': 'Authentication required. Please login again.'
-                }, status=401)
-            
-            try:
-                authenticated_user_id = int(authenticated_user_id)
-            except (ValueError, TypeError):
-                return json_response_cors({
-                    'success': False,
-                    'message': 'Invalid authentication data'
-                }, status=401)
-            
-            # Get user by user_id (preferred) or email
-            try:
-                if user_id:
-                    try:
-                        user_id = int(user_id)
-                        user = User.objects.get(id=user_id)
-                    except (ValueError, User.DoesNotExist):
-                        return json_response_cors({
-                            'success': False,
-                            'message': 'Invalid user ID'
-                        }, status=400)
-                elif email:
-                    user = User.objects.get(email=email)
-                else:
-                    return json_response_cors({
-                        'success': False,
-                        'message': 'User ID or email is required'
-                    }, status=400)
-            except User.DoesNotExist:
-                return json_response_cors({
-                    'success': False,
-                    'message': 'User not found'
-                }, status=404)
-            
-            # SECURITY CHECK: Verify that authenticated user can only update their own profile
-            if authenticated_user_id != user.id:
-                return json_response_cors({
-                    'success': False,
-                    'message': 'You are not authorized to update this profile'
-                }, status=403)
-            
-            # Get or create profile
-            profile, created = UserProfile.objects.get_or_create(user=user)
-            
-            # Handle image upload
-            if 'profile_image' in request.FILES:
-                profile.profile_image = request.FILES['profile_image']
-            
-            # Update profile fields
-            if 'full_name' in data:
-                full_name = data.get('full_name', '').strip()
-                profile.full_name = full_name
-                if full_name:
-                    user.first_name = full_name
-                    user.save()
-            
-            if 'date_of_birth' in data:
-                dob = data.get('date_of_birth', '').strip()
-                if dob:
-                    try:
-                        from datetime import datetime
-                        profile.date_of_birth = datetime.strptime(dob, '%Y-%m-%d').date()
-                    except ValueError:
-                        pass
-            
-            if 'gender' in data:
-                profile.gender = data.get('gender', '').strip()
-            
-            if 'city' in data:
-                profile.city = data.get('city', '').strip()
-            
-            if 'area' in data:
-                profile.area = data.get('area', '').strip()
-            
-            if 'street_address' in data:
-                profile.street_address = data.get('street_address', '').strip()
-            
-            if 'phone' in data:
-                profile.phone = data.get('phone', '').strip()
-            
-            if 'alternate_phone' in data:
-                profile.alternate_phone = data.get('alternate_phone', '').strip()
-            
-            if 'instructions' in data:
-                profile.delivery_instructions = data.get('instructions', '').strip()
-            
-            profile.save()
-        else:
-            # JSON data (no file upload)
-            data = json.loads(request.body)
-            
-            # Get user_id - handle both string and int
-            user_id_raw = data.get('user_id', '')
-            if isinstance(user_id_raw, str):
-                user_id = user_id_raw.strip()
-            elif isinstance(user_id_raw, int):
-                user_id = str(user_id_raw)
-            else:
-                user_id = ''
-            
-            # Get authenticated_user_id - handle both string and int
-            authenticated_user_id_raw = data.get('authenticated_user_id', '')
-            if isinstance(authenticated_user_id_raw, str):
-                authenticated_user_id = authenticated_user_id_raw.strip()
-            elif isinstance(authenticated_user_id_raw, int):
-                authenticated_user_id = str(authenticated_user_id_raw)
-            else:
-                authenticated_user_id = ''
-            
-            if not user_id:
-                return json_response_cors({
-                    'success': False,
-                    'message': 'User ID is required'
-                }, status=400)
-            
-            # SECURITY CHECK: Verify authenticated user ID is provided
-            if not authenticated_user_id:
-                return json_response_cors({
-                    'success': False,
-                    'message': 'Authentication required. Please login again.'
-                }, status=401)
-            
-            try:
-                user_id = int(user_id)
-                authenticated_user_id = int(authenticated_user_id)
-            except (ValueError, TypeError):
-                return json_response_cors({
-                    'success': False,
-                    'message': 'Invalid user ID or authentication data'
-                }, status=400)
-            
-            # Get user
-            try:
-                user = User.objects.get(id=user_id)
-            except User.DoesNotExist:
-                return json_response_cors({
-                    'success': False,
-                    'message': 'User not found'
-                }, status=404)
-            
-            # SECURITY CHECK: Verify that authenticated user can only update their own profile
-            if authenticated_user_id != user.id:
-                return json_response_cors({
-                    'success': False,
-                    'message': 'You are not authorized to update this profile'
-                }, status=403)
-            
-            # Get or create profile
-            profile, created = UserProfile.objects.get_or_create(user=user)
-            
-            # Update profile fields
-            if 'full_name' in data:
-                full_name = data.get('full_name', '').strip()
-                profile.full_name = full_name
-                # Also update user's first_name
-                if full_name:
-                    user.first_name = full_name
-                    user.save()
-            
-            if 'date_of_birth' in data:
-                dob = data.get('date_of_birth', '').strip()
-                if dob:
-                    try:
-                        from datetime import datetime
-                        profile.date_of_birth = datetime.strptime(dob, '%Y-%m-%d').date()
-                    except ValueError:
-                        pass
-            
-            if 'gender' in data:
-                profile.gender = data.get('gender', '').strip()
-            
-            if 'city' in data:
-                profile.city = data.get('city', '').strip()
-            
-            if 'area' in data:
-                profile.area = data.get('area', '').strip()
-            
-            if 'street_address' in data:
-                profile.street_address = data.get('street_address', '').strip()
-            
-            if 'phone' in data:
-                profile.phone = data.get('phone', '').strip()
-            
-            if 'alternate_phone' in data:
-                profile.alternate_phone = data.get('alternate_phone', '').strip()
-            
-            if 'instructions' in data:
-                profile.delivery_instructions = data.get('instructions', '').strip()
-            
-            profile.save()
+    async def post(self, request, data):
+        authenticated_user_id = request.token_user_id
         
-        # Get image URL
-        image_url = None
-        if profile.profile_image:
-            image_url = request.build_absolute_uri(profile.profile_image.url)
+        # Optional user_id in the body must be the caller's own id
+        user_id = data.get('user_id')
+        if user_id and user_id != str(authenticated_user_id):
+            raise ApiError(403, 'You are not authorized to update this profile')
+        
+        # Get user
+        user = await User.objects.filter(id=authenticated_user_id).afirst()
+        if user is None:
+            raise ApiError(404, 'User not found')
+        
+        # Get or create profile
+        profile, created = await UserProfile.objects.aget_or_create(user=user)
+        
+        # Handle image upload (thumbnails are made later by process_profile_images)
+        replaced_images = []
+        if 'profile_image' in request.FILES:
+            upload = request.FILES['profile_image']
+            try:
+                await sync_to_async(validate_image, thread_sensitive=False)(upload)
+            except ValueError as e:
+                raise ApiError(400, str(e))
+            replaced_images = image_files(profile)
+            profile.profile_image = upload
+            profile.image_status = UserProfile.IMAGE_PENDING
+            profile.image_variants = {}
+        
+        # Update profile fields
+        for field in self.profile_fields:
+            if field in data:
+                setattr(profile, field, data[field])
+        
+        # Also update user's first_name
+        if data.get('full_name'):
+            user.first_name = data['full_name']
+            await user.asave()
+        
+        # Also writes an uploaded image to storage (in a worker thread)
+        await profile.asave()
+        if replaced_images:
+            await sync_to_async(delete_files)(profile.profile_image.storage, replaced_images)
+        # get_profile_api reads from replicas; cache what was just written
+        await acache_profile(user, profile)
         
         # Return updated profile data
-        profile_data = {
-            'full_name': profile.full_name or user.first_name or '',
-            'email': user.email,
-            'date_of_birth': profile.date_of_birth.strftime('%Y-%m-%d') if profile.date_of_birth else '',
-            'gender': profile.gender or '',
-            'city': profile.city or '',
-            'area': profile.area or '',
-            'street_address': profile.street_address or '',
-            'phone': profile.phone or '',
-            'alternate_phone': profile.alternate_phone or '',
-            'instructions': profile.delivery_instructions or '',
-            'profile_image': image_url,
-        }
+        profile_data = serialize_profile(user, profile)
+        if profile_data['profile_image']:
+            profile_data['profile_image'] = request.build_absolute_uri(profile_data['profile_image'])
         
-        return json_response_cors({
+        return json_response({
             'success': True,
             'message': 'Profile updated successfully',
             'profile': profile_data
         })
-        
-    except json.JSONDecodeError:
-        return json_response_cors({
-            'success': False,
-            'message': 'Invalid JSON data'
-        }, status=400)
-    except Exception as e:
-        # Log the full error for debugging
-        import traceback
-        logger.error(f'Error in update_profile_api: {str(e)}\n{traceback.format_exc()}')
-        return json_response_cors({
-            'success': False,
-            'message': f'An error occurred while updating profile: {str(e)}'
-        }, status=500)
+
+
+get_profile_api = read_from_replica(GetProfileApi.as_view())
+update_profile_api = UpdateProfileApi.as_view()
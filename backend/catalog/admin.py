@@ -0,0 +1,43 @@
+from django.contrib import admin
+from .models import Category, FlashSale, HomeSlide, Product, Reservation
+
+# Register your models here.
+
+@admin.register(Category)
+class CategoryAdmin(admin.ModelAdmin):
+    list_display = ('name', 'slug', 'position', 'is_active')
+    list_editable = ('position', 'is_active')
+    prepopulated_fields = {'slug': ('name',)}
+
+
+@admin.register(Product)
+class ProductAdmin(admin.ModelAdmin):
+    list_display = ('name', 'category', 'price', 'old_price', 'rating', 'is_new', 'is_featured', 'is_active', 'updated_at')
+    list_filter = ('category', 'is_active', 'is_new', 'is_featured')
+    search_fields = ('name', 'slug')
+    prepopulated_fields = {'slug': ('name',)}
+    list_select_related = ('category',)
+
+
+@admin.register(HomeSlide)
+class HomeSlideAdmin(admin.ModelAdmin):
+    list_display = ('alt', 'link', 'position', 'is_active')
+    list_editable = ('position', 'is_active')
+
+
+@admin.register(FlashSale)
+class FlashSaleAdmin(admin.ModelAdmin):
+    list_display = ('product', 'price', 'quantity', 'shards', 'starts_at', 'ends_at', 'position')
+    list_filter = ('starts_at',)
+    raw_id_fields = ('product',)
+
+    def get_readonly_fields(self, request, obj=None):
+        # Stock is split into shards when the sale is created
+        return ('quantity', 'shards') if obj else ()
+
+
+@admin.register(Reservation)
+class ReservationAdmin(admin.ModelAdmin):
+    list_display = ('sale', 'user', 'quantity', 'status', 'expires_at', 'created_at')
+    list_filter = ('status',)
+    raw_id_fields = ('sale', 'user')
@@ -0,0 +1,119 @@
+"""
+In-memory prefix index behind autocomplete_api.
+
+Each process keeps a sorted list of keys, one per word of every listed
+product name ("blue cotton shirt", "cotton shirt", "shirt"), so the
+suggestions for a prefix are one bisect plus a short scan, without touching
+the database. It is a ListingMirror: built on first use and kept current
+incrementally (see catalog.mirrors).
+"""
+from bisect import bisect_left, insort
+import threading
+from .mirrors import ListingMirror, get_mirror
+
+# Separates the key from the product id; cannot appear in a prefix
+SEPARATOR = '\x00'
+
+# Entries scanned per lookup before ranking; bounds the work for short prefixes
+MAX_CANDIDATES = 200
+
+
+def normalize(text):
+    return ' '.join(text.lower().split())
+
+
+def name_keys(name):
+    """Index keys of a product name: the name from each of its words on"""
+    words = normalize(name).split(' ')
+    return [' '.join(words[i:]) for i in range(len(words)) if words[i]]
+
+
+class PrefixIndex:
+    """
+    Sorted "key<NUL>product_id" strings plus the name and weight of each product
+
+    Suggestions rank names starting with the prefix first, then by weight
+    (number of ratings), then alphabetically.
+    """
+
+    def __init__(self):
+        self.keys = []
+        self.products = {}
+        self.lock = threading.Lock()
+
+    def add(self, product_id, name, weight=0):
+        """Add or replace a product"""
+        with self.lock:
+            self._remove(product_id)
+            self.products[product_id] = (name, weight)
+            for key in name_keys(name):
+                insort(self.keys, f"{key}{SEPARATOR}{product_id}")
+
+    def remove(self, product_id):
+        with self.lock:
+            self._remove(product_id)
+
+    def _remove(self, product_id):
+        entry = self.products.pop(product_id, None)
+        if entry is None:
+            return
+        for key in name_keys(entry[0]):
+            item = f"{key}{SEPARATOR}{product_id}"
+            i = bisect_left(self.keys, item)
+            if i < len(self.keys) and self.keys[i] == item:
+                del self.keys[i]
+
+    def load(self, rows):
+        """Replace the contents with (product_id, name, weight) rows in one sort"""
+        keys, products = [], {}
+        for product_id, name, weight in rows:
+            products[product_id] = (name, weight)
+            keys.extend(f"{key}{SEPARATOR}{product_id}" for key in name_keys(name))
+        keys.sort()
+        with self.lock:
+            self.keys, self.products = keys, products
+
+    def suggest(self, prefix, limit):
+        """Up to limit {'id', 'name'} dicts for products with a word starting with prefix"""
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+        # add() and remove() change the list and dict in place; the scan is
+        # bounded by MAX_CANDIDATES, so holding the lock for it is cheap
+        found = {}
+        with self.lock:
+            keys, products = self.keys, self.products
+            i = bisect_left(keys, prefix)
+            while i < len(keys) and len(found) < MAX_CANDIDATES:
+                key, _, product_id = keys[i].partition(SEPARATOR)
+                if not key.startswith(prefix):
+                    break
+                product_id = int(product_id)
+                entry = products.get(product_id)
+                if entry is not None and product_id not in found:
+                    name, weight = entry
+                    found[product_id] = (normalize(name).startswith(prefix), name, weight)
+                i += 1
+        ranked = sorted(found.items(), key=lambda item: (not item[1][0], -item[1][2], item[1][1].lower()))
+        return [{'id': pk, 'name': name} for pk, (_, name, _) in ranked[:limit]]
+
+
+class AutocompleteIndex(PrefixIndex, ListingMirror):
+    """PrefixIndex of the listed products"""
+
+    def __init__(self):
+        PrefixIndex.__init__(self)
+        ListingMirror.__init__(self)
+
+    def load(self, rows):
+        super().load((row['product_id'], row['name'], row['rating_count']) for row in rows)
+
+    def apply(self, product_id, row):
+        if row is None:
+            self.remove(product_id)
+        else:
+            self.add(product_id, row['name'], row['rating_count'])
+
+
+def suggest(prefix, limit):
+    return get_mirror(AutocompleteIndex).suggest(prefix, limit)
@@ -0,0 +1,161 @@
+"""
+Facet counts for the shop sidebar (facet_counts_api).
+
+FacetCounts is a ListingMirror (see catalog.mirrors): every listed product
+gets a slot, and each facet value has a bitmap of the slots it covers, held
+as a Python int:
+- category: one bitmap per category slug;
+- price: one per bucket between CATALOG_FACET_PRICE_EDGES ("0-500", ..., "5000+");
+- rating: one per CATALOG_FACET_RATINGS threshold, of the products rated at
+  least that much.
+
+Counts for any filter combination are ANDs and ORs of bitmaps plus
+int.bit_count(), with no query. Each facet is counted with the filters on
+the other facets applied, so the sidebar shows how many products each
+choice would leave. Saves update the bitmaps in place.
+"""
+from decimal import Decimal
+from django.conf import settings
+import threading
+from .mirrors import ListingMirror, get_mirror
+
+FACETS = ('category', 'price', 'rating')
+
+
+def price_buckets():
+    """(key, low, high) of each price bucket; high is None for the last"""
+    edges = [Decimal(edge) for edge in settings.CATALOG_FACET_PRICE_EDGES]
+    buckets, low = [], Decimal(0)
+    for edge in edges:
+        buckets.append((f"{low:f}-{edge:f}", low, edge))
+        low = edge
+    buckets.append((f"{low:f}+", low, None))
+    return buckets
+
+
+def price_bucket(price, buckets):
+    for key, low, high in buckets:
+        if high is None or price < high:
+            return key
+
+
+def _bitmap(slots, size):
+    """int with the given bit positions set"""
+    bits = bytearray((size + 7) // 8)
+    for slot in slots:
+        bits[slot >> 3] |= 1 << (slot & 7)
+    return int.from_bytes(bits, 'little')
+
+
+class FacetCounts(ListingMirror):
+
+    def __init__(self):
+        super().__init__()
+        self.lock = threading.Lock()
+        self.buckets = price_buckets()
+        self.ratings = [Decimal(rating) for rating in settings.CATALOG_FACET_RATINGS]
+        # product id -> slot
+        self.slots = {}
+        self.free = []
+        self.size = 0
+        self.all = 0
+        self.bitmaps = {facet: {} for facet in FACETS}
+
+    def _facet_values(self, row):
+        """(facet, value) pairs a listing row belongs to"""
+        pairs = [('category', row['category_slug']), ('price', price_bucket(row['price'], self.buckets))]
+        pairs.extend(('rating', f"{rating:f}") for rating in self.ratings if row['rating'] >= rating)
+        return pairs
+
+    def load(self, rows):
+        slots, members = {}, {facet: {} for facet in FACETS}
+        for slot, row in enumerate(rows):
+            slots[row['product_id']] = slot
+            for facet, value in self._facet_values(row):
+                members[facet].setdefault(value, []).append(slot)
+        size = len(slots)
+        bitmaps = {facet: {value: _bitmap(positions, size) for value, positions in by_value.items()} for facet, by_value in members.items()}
+        with self.lock:
+            self.slots, self.free, self.size = slots, [], size
+            self.all = (1 << size) - 1
+            self.bitmaps = bitmaps
+
+    def apply(self, product_id, row):
+        with self.lock:
+            slot = self.slots.get(product_id)
+            if slot is not None:
+                bit = 1 << slot
+                # A few dozen bitmaps: cheaper to test them all than to keep each product's values
+                for bitmaps in self.bitmaps.values():
+                    for value, bitmap in bitmaps.items():
+                        if bitmap & bit:
+                            bitmaps[value] = bitmap & ~bit
+                if row is None:
+                    del self.slots[product_id]
+                    self.all &= ~bit
+                    self.free.append(slot)
+                    return
+            elif row is None:
+                return
+            else:
+                # Slots of removed products are reused, so the bitmaps stay dense
+                if self.free:
+                    slot = self.free.pop()
+                else:
+                    slot, self.size = self.size, self.size + 1
+                self.slots[product_id] = slot
+            bit = 1 << slot
+            self.all |= bit
+            for facet, value in self._facet_values(row):
+                bitmaps = self.bitmaps[facet]
+                bitmaps[value] = bitmaps.get(value, 0) | bit
+
+    def counts(self, category=None, prices=(), min_rating=None):
+        """
+        Product counts for a combination of sidebar filters
+
+        Args:
+            category: category slug
+            prices: price bucket keys (products in any of them)
+            min_rating: one of CATALOG_FACET_RATINGS
+
+        Returns:
+            dict: total (all filters applied) and, per facet, a count for every
+            value with the other facets' filters applied
+        """
+        with self.lock:
+            bitmaps, everything = self.bitmaps, self.all
+            filters = {facet: everything for facet in FACETS}
+            if category:
+                filters['category'] = bitmaps['category'].get(category, 0)
+            if prices:
+                selected = 0
+                for key in prices:
+                    selected |= bitmaps['price'].get(key, 0)
+                filters['price'] = selected
+            if min_rating is not None:
+                # The configured threshold equal to min_rating: "4.0" and "4.50" are keyed "4" and "4.5"
+                rating = Decimal(str(min_rating))
+                if rating in self.ratings:
+                    rating = self.ratings[self.ratings.index(rating)]
+                filters['rating'] = bitmaps['rating'].get(f"{rating:f}", 0)
+
+            def others(facet):
+                mask = everything
+                for other in FACETS:
+                    if other != facet:
+                        mask &= filters[other]
+                return mask
+
+            result = {'total': (others('category') & filters['category']).bit_count()}
+            for facet in FACETS:
+                mask = others(facet)
+                result[facet] = {value: (bitmap & mask).bit_count() for value, bitmap in bitmaps[facet].items()}
+            # Buckets and thresholds in their configured order, including empty ones
+            result['price'] = {key: result['price'].get(key, 0) for key, _, _ in self.buckets}
+            result['rating'] = {f"{rating:f}": result['rating'].get(f"{rating:f}", 0) for rating in self.ratings}
+            return result
+
+
+def facet_counts(**filters):
+    return get_mirror(FacetCounts).counts(**filters)
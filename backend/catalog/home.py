@@ -0,0 +1,242 @@
+"""
+Cached payload of home_api: every Home page section in one response.
+
+Each section (SECTIONS) is built on its own, serialized once and cached as
+JSON bytes with its own freshness (CATALOG_HOME_TTLS, and for flash sales
+no later than the next sale starting or ending). The response body is the
+sections' bytes joined together, cached with its ETag, so a request for a
+fresh payload is one cache get and no serialization.
+
+Saves of the models a section shows mark it stale (invalidate(), called by
+catalog.signals). A stale payload is still served, for up to
+CATALOG_HOME_STALE_SECONDS, while a single worker holding a cache lock
+rebuilds the stale sections in a background thread.
+"""
+from decimal import Decimal, ROUND_HALF_UP
+from django.conf import settings
+from django.core.cache import caches
+from django.core.files.storage import default_storage
+from django.db import connections
+from django.db.models import Min, Q
+from django.utils import timezone
+from django.utils.http import quote_etag
+import hashlib
+import logging
+import threading
+import time
+from account.responses import dumps
+from .listing import plain_number
+from .models import Category, FlashSale, HomeSlide, Product
+
+logger = logging.getLogger(__name__)
+
+PAYLOAD_KEY = 'catalog:home:payload'
+LOCK_KEY = 'catalog:home:lock'
+# Bumped by invalidate(), so a build that overlaps it is not kept as fresh
+VERSION_KEY = 'catalog:home:version'
+
+# Longest a rebuild may hold the lock
+LOCK_SECONDS = 30
+
+# How long a request without any cached payload waits for another worker's build
+WAIT_SECONDS = 2.0
+
+
+def _cache():
+    return caches[settings.CATALOG_HOME_CACHE_ALIAS]
+
+
+def _section_key(name):
+    return f"catalog:home:section:{name}"
+
+
+def _image_url(image):
+    return default_storage.url(image.name) if image else None
+
+
+def build_slides(now):
+    slides = [{
+        'src': _image_url(slide.image),
+        'alt': slide.alt,
+        'link': slide.link,
+    } for slide in HomeSlide.objects.filter(is_active=True)]
+    return slides, None
+
+
+def build_flash_sales(now):
+    running = (FlashSale.objects
+               .filter(starts_at__lte=now, ends_at__gt=now, product__is_active=True, product__category__is_active=True)
+               .select_related('product')[:settings.CATALOG_HOME_FLASH_SALES])
+    sales = []
+    for sale in running:
+        product = sale.product
+        discount = 0
+        if product.price > sale.price:
+            discount = int(((product.price - sale.price) * 100 / product.price).quantize(Decimal('1'), rounding=ROUND_HALF_UP))
+        sales.append({
+            'id': sale.pk,
+            'productId': product.pk,
+            'title': product.name,
+            'price': plain_number(sale.price),
+            'oldPrice': plain_number(product.price),
+            'discount': discount,
+            'rating': float(product.rating),
+            'reviews': product.rating_count,
+            'img': _image_url(product.image),
+            'endsAt': sale.ends_at.isoformat(),
+        })
+    # The section changes when the next sale starts or a running one ends
+    changes = FlashSale.objects.aggregate(
+        next_start=Min('starts_at', filter=Q(starts_at__gt=now)),
+        next_end=Min('ends_at', filter=Q(ends_at__gt=now)),
+    )
+    changes = [moment.timestamp() for moment in changes.values() if moment is not None]
+    return sales, min(changes) if changes else None
+
+
+def build_categories(now):
+    categories = [{
+        'id': category.slug,
+        'name': category.name,
+    } for category in Category.objects.filter(is_active=True)]
+    return categories, None
+
+
+def build_featured_products(now):
+    featured = (Product.objects
+                .filter(is_featured=True, is_active=True, category__is_active=True)
+                .order_by('-updated_at')[:settings.CATALOG_HOME_FEATURED_PRODUCTS])
+    products = []
+    for product in featured:
+        item = {
+            'id': product.pk,
+            'title': product.name,
+            'price': plain_number(product.price),
+            'rating': float(product.rating),
+            'reviews': product.rating_count,
+            'img': _image_url(product.image),
+        }
+        if product.is_new:
+            item['tag'] = 'New'
+        products.append(item)
+    return products, None
+
+
+# Payload key -> builder(now) returning (data, timestamp the data stops being valid or None)
+SECTIONS = {
+    'slides': build_slides,
+    'flashSales': build_flash_sales,
+    'categories': build_categories,
+    'featuredProducts': build_featured_products,
+}
+
+
+def _build_section(name, now):
+    data, valid_until = SECTIONS[name](timezone.now())
+    fresh_until = now + settings.CATALOG_HOME_TTLS[name]
+    if valid_until is not None:
+        fresh_until = min(fresh_until, valid_until)
+    return {'body': dumps(data), 'fresh_until': fresh_until}
+
+
+def _timeout(entry, now):
+    return max(entry['fresh_until'] - now, 0) + settings.CATALOG_HOME_STALE_SECONDS
+
+
+def build_payload():
+    """Rebuild the stale sections and cache them with the joined payload"""
+    now = time.time()
+    cache = _cache()
+    version = cache.get(VERSION_KEY, 0)
+    cached = cache.get_many([_section_key(name) for name in SECTIONS])
+    built = {}
+    parts, fresh_until = [b'{"success":true'], None
+    for name in SECTIONS:
+        entry = cached.get(_section_key(name))
+        if entry is None or entry['fresh_until'] <= now:
+            entry = built[name] = _build_section(name, now)
+        parts.append(b',"' + name.encode() + b'":' + entry['body'])
+        fresh_until = entry['fresh_until'] if fresh_until is None else min(fresh_until, entry['fresh_until'])
+    parts.append(b'}')
+    body = b''.join(parts)
+    payload = {
+        'body': body,
+        'etag': quote_etag(hashlib.md5(body).hexdigest()),
+        'last_modified': int(now),
+        'fresh_until': fresh_until,
+    }
+
+    if cache.get(VERSION_KEY, 0) != version:
+        # Invalidated while building: serve it, but as stale
+        payload['fresh_until'] = 0
+        for entry in built.values():
+            entry['fresh_until'] = 0
+    # Kept for CATALOG_HOME_STALE_SECONDS past freshness, to be served while rebuilding
+    for name, entry in built.items():
+        cache.set(_section_key(name), entry, _timeout(entry, now))
+    cache.set(PAYLOAD_KEY, payload, _timeout(payload, now))
+    return payload
+
+
+def _rebuild_in_background():
+    try:
+        build_payload()
+    except Exception as e:
+        logger.error(f"Error rebuilding the home payload: {str(e)}")
+    finally:
+        _cache().delete(LOCK_KEY)
+        # The thread's own database connections
+        connections.close_all()
+
+
+def get_payload():
+    """
+    The home payload: dict with body (JSON bytes), etag and last_modified
+
+    Fresh payloads come straight from the cache. A stale one is returned as
+    is while the worker that takes the lock rebuilds it in the background.
+    Without any payload the caller builds it, waiting briefly first if
+    another worker is already doing so.
+    """
+    cache = _cache()
+    payload = cache.get(PAYLOAD_KEY)
+    if payload is not None:
+        if payload['fresh_until'] > time.time():
+            return payload
+        if cache.add(LOCK_KEY, 1, LOCK_SECONDS):
+            threading.Thread(target=_rebuild_in_background, daemon=True).start()
+        return payload
+
+    if not cache.add(LOCK_KEY, 1, LOCK_SECONDS):
+        deadline = time.monotonic() + WAIT_SECONDS
+        while time.monotonic() < deadline:
+            time.sleep(0.05)
+            payload = cache.get(PAYLOAD_KEY)
+            if payload is not None:
+                return payload
+        # The other build is taking too long; do not leave this request waiting
+        return build_payload()
+    try:
+        return build_payload()
+    finally:
+        cache.delete(LOCK_KEY)
+
+
+def invalidate(*names):
+    """Mark sections (and the payload) stale; the next request triggers a rebuild"""
+    cache = _cache()
+    cache.add(VERSION_KEY, 0, timeout=None)
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        # Evicted between add() and incr()
+        cache.set(VERSION_KEY, 1, timeout=None)
+    for name in names:
+        entry = cache.get(_section_key(name))
+        if entry is not None:
+            entry['fresh_until'] = 0
+            cache.set(_section_key(name), entry, settings.CATALOG_HOME_STALE_SECONDS)
+    payload = cache.get(PAYLOAD_KEY)
+    if payload is not None:
+        payload['fresh_until'] = 0
+        cache.set(PAYLOAD_KEY, payload, settings.CATALOG_HOME_STALE_SECONDS)
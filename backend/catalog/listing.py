@@ -0,0 +1,200 @@
+"""
+The shop grid read model (ProductListing).
+
+Rows are written by the Product/Category signals (sync_product,
+sync_category) or all at once by rebuild_listing() after bulk loads. Pages are
+read with a keyset on (sort column, product id): each sort order has a
+matching composite index, with and without a leading category_slug, so any
+combination of filters is one range scan on one index. Filters on the
+other columns (e.g. min_rating when sorting by price) are checked on the
+scanned rows.
+"""
+from decimal import Decimal, InvalidOperation
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from django.db.models import Q
+from .models import Category, Product, ProductListing
+
+# sort name -> (column, descending); every sort ends with product_id in the same direction
+SORTS = {
+    'newest': ('product_id', True),
+    'price_asc': ('price', False),
+    'price_desc': ('price', True),
+    'rating': ('rating', True),
+}
+
+COLUMNS = ('product_id', 'category_slug', 'name', 'price', 'old_price', 'rating', 'discount', 'thumbnail', 'is_new')
+
+
+def listing_values(product):
+    return {
+        'category_slug': product.category.slug,
+        'name': product.name,
+        'price': product.price,
+        'old_price': product.old_price,
+        'rating': product.rating,
+        'discount': product.discount,
+        'thumbnail': product.image.name or '',
+        'is_new': product.is_new,
+    }
+
+
+def sync_product(product):
+    """
+    Insert, update or drop the listing row of product
+
+    Returns:
+        bool: whether the product is listed
+    """
+    if product.is_active and product.category.is_active:
+        ProductListing.objects.update_or_create(product=product, defaults=listing_values(product))
+        return True
+    ProductListing.objects.filter(product=product).delete()
+    return False
+
+
+def sync_category(category):
+    """Follow a category's slug and active flag in its products' listing rows"""
+    rows = ProductListing.objects.filter(product__category=category)
+    if not category.is_active:
+        rows.delete()
+        return
+    rows.exclude(category_slug=category.slug).update(category_slug=category.slug)
+    # Products hidden while the category was inactive
+    missing = Product.objects.filter(category=category, is_active=True, listing__isnull=True).select_related('category')
+    for product in missing.iterator():
+        sync_product(product)
+
+
+def rebuild_listing():
+    """
+    Recreate every listing row from Product and Category with one INSERT ... SELECT
+
+    Returns:
+        int: rows written
+    """
+    quote = connection.ops.quote_name
+    listing, product, category = ProductListing._meta.db_table, Product._meta.db_table, Category._meta.db_table
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {quote(listing)}")
+        # Same rounding as Product.discount (half up)
+        cursor.execute(f"""
+            INSERT INTO {quote(listing)} (product_id, category_slug, name, price, old_price, rating, discount, thumbnail, is_new)
+            SELECT p.id, c.slug, p.name, p.price, p.old_price, p.rating,
+                   CASE WHEN p.old_price > p.price THEN CAST(ROUND((p.old_price - p.price) * 100.0 / p.old_price) AS INTEGER) ELSE 0 END,
+                   COALESCE(p.image, ''), p.is_new
+            FROM {quote(product)} p JOIN {quote(category)} c ON c.id = p.category_id
+            WHERE p.is_active AND c.is_active
+        """)
+        rows = cursor.rowcount
+        # Fresh statistics let the planner pick between the sort index and a
+        # filter index (SQLite keeps none until ANALYZE runs)
+        cursor.execute(f"ANALYZE {quote(listing)}")
+    return rows
+
+
+def encode_cursor(row, sort):
+    column = SORTS[sort][0]
+    if column == 'product_id':
+        return str(row['product_id'])
+    return f"{row[column]}|{row['product_id']}"
+
+
+def decode_cursor(cursor, sort):
+    """(value, product_id) for the sort, or None if the cursor is malformed"""
+    try:
+        if SORTS[sort][0] == 'product_id':
+            return None, int(cursor)
+        value, product_id = cursor.rsplit('|', 1)
+        value = Decimal(value)
+        if not value.is_finite():
+            return None
+        return value, int(product_id)
+    except (AttributeError, ValueError, InvalidOperation):
+        return None
+
+
+def plain_number(value):
+    """Decimal as int when whole, else float (the shop shows plain numbers)"""
+    return int(value) if value == value.to_integral_value() else float(value)
+
+
+def serialize_listing(row):
+    """Grid card in the shape of the Shop page's product objects"""
+    item = {
+        'id': row['product_id'],
+        'name': row['name'],
+        'price': plain_number(row['price']),
+        'rating': float(row['rating']),
+        'category': row['category_slug'],
+        'img': default_storage.url(row['thumbnail']) if row['thumbnail'] else None,
+    }
+    if row['old_price'] is not None:
+        item['oldPrice'] = plain_number(row['old_price'])
+    if row['discount']:
+        item['discount'] = f"{row['discount']}%"
+    if row['is_new']:
+        item['new'] = True
+    return item
+
+
+def filter_listing(queryset, category=None, min_price=None, max_price=None, min_rating=None, max_rating=None):
+    if category:
+        queryset = queryset.filter(category_slug=category)
+    if min_price is not None:
+        queryset = queryset.filter(price__gte=min_price)
+    if max_price is not None:
+        queryset = queryset.filter(price__lte=max_price)
+    if min_rating is not None:
+        queryset = queryset.filter(rating__gte=min_rating)
+    if max_rating is not None:
+        queryset = queryset.filter(rating__lte=max_rating)
+    return queryset
+
+
+def listing_queryset(sort='newest', after=None, **filters):
+    """Listing rows in sort order, starting after the decoded cursor after"""
+    column, descending = SORTS[sort]
+    condition = None
+
+    if after is not None:
+        value, product_id = after
+        if column == 'product_id':
+            condition = Q(**{'product_id__lt' if descending else 'product_id__gt': product_id})
+        else:
+            # "col <= x AND (col < x OR id < y)": the leading condition stays a
+            # plain range on the (col, product_id) index
+            op = 'lt' if descending else 'gt'
+            condition = Q(**{f'{column}__{op}': value}) | Q(**{f'product_id__{op}': product_id})
+            # Merged into the price/rating filter on that side, so the index range
+            # starts at the cursor rather than at the filter bound
+            bound = f"{'max' if descending else 'min'}_{column}"
+            if filters.get(bound) is None:
+                filters[bound] = value
+            else:
+                filters[bound] = (min if descending else max)(filters[bound], value)
+
+    queryset = filter_listing(ProductListing.objects.all(), **filters)
+    if condition is not None:
+        queryset = queryset.filter(condition)
+
+    prefix = '-' if descending else ''
+    order = [f'{prefix}product_id'] if column == 'product_id' else [f'{prefix}{column}', f'{prefix}product_id']
+    return queryset.order_by(*order)
+
+
+def listing_page(sort='newest', after=None, limit=24, **filters):
+    """
+    One page of listing rows
+
+    Args:
+        sort: key of SORTS
+        after: decoded cursor of the last row of the previous page
+        filters: category, min_price, max_price, min_rating
+
+    Returns:
+        tuple: (list of serialized products, next cursor or None)
+    """
+    rows = list(listing_queryset(sort, after, **filters).values(*COLUMNS)[:limit + 1])
+    next_cursor = encode_cursor(rows[limit - 1], sort) if len(rows) > limit else None
+    return [serialize_listing(row) for row in rows[:limit]], next_cursor
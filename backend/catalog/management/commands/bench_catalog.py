@@ -0,0 +1,178 @@
+import random
+import time
+from decimal import Decimal
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Count
+from catalog import autocomplete, mirrors
+from catalog.facets import FacetCounts
+from catalog.listing import COLUMNS, SORTS, decode_cursor, encode_cursor, listing_page, listing_queryset, rebuild_listing
+from catalog.models import Category, Product, ProductListing
+from catalog.search import get_search_backend
+from catalog.views import search_products
+
+SLUG_PREFIX = 'bench-catalog-'
+CATEGORIES = 20
+
+ADJECTIVES = ['Classic', 'Slim', 'Soft', 'Wireless', 'Smart', 'Vintage', 'Premium', 'Casual', 'Compact', 'Waterproof']
+COLOURS = ['Black', 'White', 'Navy', 'Red', 'Olive', 'Grey', 'Beige', 'Maroon', 'Teal', 'Mustard']
+NOUNS = ['Shirt', 'Panjabi', 'Saree', 'Sneakers', 'Backpack', 'Headphones', 'Watch', 'Kettle', 'Lamp', 'Wallet',
+         'Jacket', 'Charger', 'Blender', 'Sandals', 'Scarf', 'Speaker', 'Mug', 'Cushion', 'Trimmer', 'Bottle']
+
+SEARCHES = ['shirt', 'navy panjabi', 'waterproof backpack', 'head', 'mustard wa', 'no such thing']
+PREFIXES = ['s', 'sh', 'sma', 'navy p', 'waterproof b', 'zz']
+
+# (label, filters) combined with every sort
+SCENARIOS = [
+    ('all products', {}),
+    ('one category', {'category': f'{SLUG_PREFIX}3'}),
+    ('price range', {'min_price': Decimal('500'), 'max_price': Decimal('1500')}),
+    ('category + price range', {'category': f'{SLUG_PREFIX}3', 'min_price': Decimal('500'), 'max_price': Decimal('1500')}),
+    ('category + min rating', {'category': f'{SLUG_PREFIX}3', 'min_rating': Decimal('4')}),
+]
+
+
+def _best_ms(function, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        elapsed = (time.perf_counter() - start) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+class Command(BaseCommand):
+    help = 'Seed a large temporary catalog and time listing pages (first page, deep keyset page, deep OFFSET page)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=1000000, help='Temporary products to create (default: 1000000)')
+        parser.add_argument('--limit', type=int, default=24, help='Page size (default: 24)')
+        parser.add_argument('--depth', type=int, default=2000, help='Page number of the deep page (default: 2000)')
+        parser.add_argument('--repeat', type=int, default=5, help='Runs per query, the best is reported (default: 5)')
+        parser.add_argument('--batch-size', type=int, default=10000, help='Products inserted per batch (default: 10000)')
+        parser.add_argument('--explain', action='store_true', help='Print the query plan of every first page')
+        parser.add_argument('--keep', action='store_true', help='Keep the seeded products')
+
+    def handle(self, *args, **options):
+        limit, depth, repeat = options['limit'], options['depth'], options['repeat']
+
+        self.cleanup()
+        start = time.perf_counter()
+        self.seed(options['products'], options['batch_size'])
+        self.stdout.write(f"Seeded {options['products']} products in {time.perf_counter() - start:.1f}s")
+        start = time.perf_counter()
+        rows = rebuild_listing()
+        self.stdout.write(f"Rebuilt listing ({rows} rows) in {time.perf_counter() - start:.1f}s")
+
+        try:
+            self.stdout.write(f"{'filters':<24} {'sort':<11} {'first':>9} {f'page {depth}':>11} {'OFFSET':>10}")
+            for label, filters in SCENARIOS:
+                for sort in SORTS:
+                    self.run_scenario(label, filters, sort, limit, depth, repeat, options['explain'])
+            self.run_search(limit, repeat)
+            self.run_facets(repeat)
+        finally:
+            if not options['keep']:
+                self.cleanup()
+
+    def seed(self, count, batch_size):
+        rng = random.Random(42)
+        categories = Category.objects.bulk_create(
+            Category(name=f'Bench {i}', slug=f'{SLUG_PREFIX}{i}', position=1000 + i) for i in range(CATEGORIES)
+        )
+        # bulk_create skips the post_save signals; rebuild_listing() fills the listing afterwards
+        for offset in range(0, count, batch_size):
+            batch = []
+            for i in range(offset, min(offset + batch_size, count)):
+                price = Decimal(rng.randint(100, 300000)) / 100
+                old_price = (price * Decimal(rng.choice((110, 125, 150))) / 100).quantize(Decimal('0.01')) if rng.random() < 0.3 else None
+                batch.append(Product(
+                    category=categories[rng.randrange(CATEGORIES)],
+                    name=f'{rng.choice(ADJECTIVES)} {rng.choice(COLOURS)} {rng.choice(NOUNS)} {i}',
+                    slug=f'{SLUG_PREFIX}{i}',
+                    price=price,
+                    old_price=old_price,
+                    rating=Decimal(rng.randint(0, 50)) / 10,
+                    rating_count=rng.randint(0, 500),
+                    is_new=rng.random() < 0.05,
+                ))
+            with transaction.atomic():
+                Product.objects.bulk_create(batch)
+
+    def run_scenario(self, label, filters, sort, limit, depth, repeat, explain):
+        queryset = listing_queryset(sort, **filters)
+        first = _best_ms(lambda: listing_page(sort, limit=limit, **filters), repeat)
+
+        # Cursor of the page before the deep one, as a client paging through would hold it
+        offset = (depth - 1) * limit
+        row = queryset.values('product_id', SORTS[sort][0])[offset - 1:offset].first() if offset else None
+        if row is None:
+            deep = offset_ms = None
+        else:
+            after = decode_cursor(encode_cursor(row, sort), sort)
+            deep = _best_ms(lambda: listing_page(sort, after=after, limit=limit, **filters), repeat)
+            offset_ms = _best_ms(lambda: list(queryset.values(*COLUMNS)[offset:offset + limit]), repeat)
+
+        def ms(value):
+            return '-' if value is None else f'{value:.2f}ms'
+
+        self.stdout.write(f"{label:<24} {sort:<11} {ms(first):>9} {ms(deep):>11} {ms(offset_ms):>10}")
+        if explain:
+            self.stdout.write(queryset.values(*COLUMNS)[:limit + 1].explain())
+
+    def run_search(self, limit, repeat):
+        start = time.perf_counter()
+        rows = get_search_backend().rebuild()
+        self.stdout.write(f"Reindexed search ({rows} products) in {time.perf_counter() - start:.1f}s")
+        for query in SEARCHES:
+            found = len(search_products(query, limit))
+            self.stdout.write(f"search {query!r:<24} {found:>3} results {_best_ms(lambda: search_products(query, limit), repeat):>9.2f}ms")
+
+        index = autocomplete.PrefixIndex()
+        start = time.perf_counter()
+        index.load(ProductListing.objects.values_list('product_id', 'name', 'product__rating_count').iterator())
+        self.stdout.write(f"Built autocomplete index ({len(index.keys)} keys) in {time.perf_counter() - start:.1f}s")
+        for prefix in PREFIXES:
+            found = len(index.suggest(prefix, 8))
+            self.stdout.write(f"suggest {prefix!r:<23} {found:>3} results {_best_ms(lambda: index.suggest(prefix, 8), repeat):>9.3f}ms")
+        product_id, name, weight = ProductListing.objects.values_list('product_id', 'name', 'product__rating_count').first()
+        self.stdout.write(f"autocomplete update of one product {_best_ms(lambda: index.add(product_id, name, weight), repeat):.3f}ms")
+
+    def run_facets(self, repeat):
+        facets = FacetCounts()
+        start = time.perf_counter()
+        facets.rebuild()
+        self.stdout.write(f"Built facet bitmaps ({len(facets.slots)} products) in {time.perf_counter() - start:.1f}s")
+        combinations = [
+            ('no filters', {}),
+            ('category', {'category': f'{SLUG_PREFIX}3'}),
+            ('category + 2 price buckets + rating', {'category': f'{SLUG_PREFIX}3', 'prices': ['500-1000', '1000-2000'], 'min_rating': Decimal('4')}),
+        ]
+        for label, filters in combinations:
+            self.stdout.write(f"facets {label:<36} {_best_ms(lambda: facets.counts(**filters), repeat):>9.2f}ms")
+        # What the counts would cost per page view as queries
+        group_by = _best_ms(lambda: list(ProductListing.objects.values('category_slug').annotate(n=Count('pk'))), repeat)
+        self.stdout.write(f"facets {'category GROUP BY query (for comparison)':<36} {group_by:>9.2f}ms")
+        product_id = next(iter(facets.slots))
+        row = next(iter(mirrors.listing_rows(ProductListing.objects.filter(product_id=product_id))))
+        self.stdout.write(f"facet update of one product {_best_ms(lambda: facets.apply(product_id, row), repeat):.3f}ms")
+
+    def cleanup(self):
+        """Raw deletes: the ORM would collect a million objects for the cascade"""
+        quote = connection.ops.quote_name
+        categories = list(Category.objects.filter(slug__startswith=SLUG_PREFIX).values_list('id', flat=True))
+        if not categories:
+            return
+        placeholders = ', '.join(['%s'] * len(categories))
+        listing, product = quote(ProductListing._meta.db_table), quote(Product._meta.db_table)
+        search = get_search_backend()
+        with transaction.atomic(), connection.cursor() as cursor:
+            for table, column in ((listing, 'product_id'), (search.table, search.key)):
+                cursor.execute(
+                    f"DELETE FROM {table} WHERE {column} IN (SELECT id FROM {product} WHERE category_id IN ({placeholders}))",
+                    categories,
+                )
+            cursor.execute(f"DELETE FROM {product} WHERE category_id IN ({placeholders})", categories)
+        Category.objects.filter(id__in=categories).delete()
+        mirrors.invalidate()
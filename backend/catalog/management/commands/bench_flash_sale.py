@@ -0,0 +1,132 @@
+import os
+import time
+from datetime import timedelta
+from decimal import Decimal
+from multiprocessing import get_context
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.conf import settings
+from django.db import connections
+from django.db.models import Sum
+from django.utils import timezone
+from catalog.models import Category, FlashSale, Product, Reservation, StockShard
+from catalog.reservations import ReservationError, release_expired, remaining, reserve
+
+SLUG = 'bench-flash-sale'
+EMAIL_DOMAIN = 'bench-flash-sale.invalid'
+
+
+def _naive_reserve(sale, user_id, quantity):
+    """SELECT then UPDATE: what reserve() replaces, for comparison"""
+    shard = StockShard.objects.get(sale=sale, shard=0)
+    if shard.stock < quantity:
+        raise ReservationError(409, 'Sold out')
+    StockShard.objects.filter(pk=shard.pk).update(stock=shard.stock - quantity)
+    return Reservation.objects.create(sale=sale, user_id=user_id, shard=0, quantity=quantity, expires_at=sale.ends_at)
+
+
+def _run_buyer(args):
+    """Worker process: reserve until the sale is sold out; returns (units, attempts, errors, elapsed)"""
+    sale_id, user_ids, quantity, naive, max_attempts = args
+    connections.close_all()
+    sale = FlashSale.objects.get(pk=sale_id)
+    attempt = _naive_reserve if naive else reserve
+    users = iter(user_ids)
+    user_id = next(users)
+    units = attempts = errors = 0
+    start = time.perf_counter()
+    while attempts < max_attempts:
+        attempts += 1
+        try:
+            units += attempt(sale, user_id, quantity).quantity
+        except ReservationError:
+            # This account's hold limit, sold out, or too few units left for
+            # this quantity: carry on as the next account until there is none
+            user_id = next(users, None)
+            if user_id is None:
+                break
+        except Exception:
+            # e.g. "database is locked" once SQLite's busy timeout runs out
+            errors += 1
+    return units, attempts, errors, time.perf_counter() - start
+
+
+class Command(BaseCommand):
+    help = 'Stress-test flash sale reservations with concurrent buyer processes and check nothing is oversold'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--stock', type=int, default=2000, help='Units on sale (default: 2000)')
+        parser.add_argument('--shards', type=int, default=8, help='Stock shards (default: 8)')
+        parser.add_argument('--buyers', type=int, default=(os.cpu_count() or 1) * 4, help='Concurrent buyer processes (default: 4 per CPU)')
+        parser.add_argument('--quantity', type=int, default=1, help='Units per reservation (default: 1)')
+        parser.add_argument('--naive', action='store_true', help='Use SELECT-then-UPDATE instead of the engine, to show the oversell it prevents')
+
+    def handle(self, *args, **options):
+        stock, shards, buyers, quantity = options['stock'], options['shards'], options['buyers'], options['quantity']
+        if options['naive']:
+            shards = 1
+        if quantity > settings.CATALOG_FLASH_SALE_MAX_QUANTITY:
+            raise CommandError(f"--quantity must be at most CATALOG_FLASH_SALE_MAX_QUANTITY ({settings.CATALOG_FLASH_SALE_MAX_QUANTITY})")
+
+        self.cleanup()
+        now = timezone.now()
+        category = Category.objects.create(name='Bench flash sale', slug=SLUG, is_active=False)
+        product = Product.objects.create(category=category, name='Bench flash sale product', slug=SLUG, price=Decimal('1000'), is_active=False)
+        sale = FlashSale.objects.create(
+            product=product, price=Decimal('500'), quantity=stock, shards=shards,
+            starts_at=now - timedelta(minutes=1), ends_at=now + timedelta(hours=1),
+        )
+        # Enough accounts per buyer to take twice its share of the stock
+        # without reaching CATALOG_FLASH_SALE_MAX_HOLDS_PER_USER
+        holds = settings.CATALOG_FLASH_SALE_MAX_HOLDS_PER_USER * quantity
+        accounts = -(-2 * stock // (buyers * holds))
+        users = User.objects.bulk_create(
+            User(username=f'buyer{i}@{EMAIL_DOMAIN}', email=f'buyer{i}@{EMAIL_DOMAIN}') for i in range(buyers * accounts)
+        )
+        connections.close_all()
+
+        try:
+            # Enough attempts for every buyer to see the sale sell out
+            max_attempts = stock * 10 // quantity + 100
+            with get_context('fork').Pool(buyers) as pool:
+                start = time.perf_counter()
+                results = pool.map(_run_buyer, [
+                    (sale.pk, [user.pk for user in users[i::buyers]], quantity, options['naive'], max_attempts) for i in range(buyers)
+                ])
+                wall = time.perf_counter() - start
+
+            units = sum(result[0] for result in results)
+            attempts = sum(result[1] for result in results)
+            errors = sum(result[2] for result in results)
+            held = Reservation.objects.filter(sale=sale).aggregate(units=Sum('quantity'))['units'] or 0
+            left = remaining(sale)
+            mode = 'SELECT then UPDATE' if options['naive'] else f'{shards} shard(s)'
+            self.stdout.write(f"{buyers} buyers, {stock} units, {mode}, {quantity} per reservation")
+            self.stdout.write(f"Reserved {held} units ({held // quantity} reservations) in {wall:.2f}s: "
+                              f"{held // quantity / wall:.0f} reservations/s, {attempts} attempts, {errors} errors")
+            self.stdout.write(f"Stock left {left}; reserved + left = {held + left} of {stock}")
+            if units != held:
+                self.stdout.write(self.style.ERROR(f"Buyers were told {units} units, {held} are recorded"))
+            if held > stock or left < 0 or held + left != stock:
+                self.stdout.write(self.style.ERROR(f"OVERSOLD by {held - stock} units" if held > stock else "Stock does not add up"))
+            else:
+                self.stdout.write(self.style.SUCCESS("No oversell"))
+
+            if not options['naive']:
+                # Let every hold expire and check the sweeper puts the stock back
+                Reservation.objects.filter(sale=sale).update(expires_at=timezone.now() - timedelta(seconds=1))
+                start = time.perf_counter()
+                released = 0
+                while True:
+                    batch = release_expired()
+                    if not batch:
+                        break
+                    released += batch
+                self.stdout.write(f"Sweeper released {released} holds in {time.perf_counter() - start:.2f}s; stock back to {remaining(sale)}")
+        finally:
+            self.cleanup()
+
+    def cleanup(self):
+        User.objects.filter(email__endswith=f'@{EMAIL_DOMAIN}').delete()
+        Product.objects.filter(slug=SLUG).delete()
+        Category.objects.filter(slug=SLUG).delete()
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from catalog import mirrors
+from catalog.listing import rebuild_listing
+
+
+class Command(BaseCommand):
+    help = 'Recreate the shop grid listing rows from products and categories (after bulk loads or raw SQL edits)'
+
+    def handle(self, *args, **options):
+        rows = rebuild_listing()
+        mirrors.invalidate()
+        self.stdout.write(f"Rebuilt product listing: {rows} rows")
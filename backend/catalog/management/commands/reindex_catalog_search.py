@@ -0,0 +1,13 @@
+import time
+from django.core.management.base import BaseCommand
+from catalog.search import get_search_backend
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the product full-text search index (after bulk loads or raw SQL edits)'
+
+    def handle(self, *args, **options):
+        backend = get_search_backend()
+        start = time.perf_counter()
+        rows = backend.rebuild()
+        self.stdout.write(f"Reindexed {rows} products with {type(backend).__name__} in {time.perf_counter() - start:.1f}s")
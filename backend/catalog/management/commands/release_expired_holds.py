@@ -0,0 +1,31 @@
+import time
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from catalog.reservations import release_expired
+
+
+class Command(BaseCommand):
+    help = 'Return the units of expired flash sale holds to their stock'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Holds released per batch (default: 500)')
+        parser.add_argument('--interval', type=float, default=5.0, help='Seconds to sleep when no hold has expired (default: 5)')
+        parser.add_argument('--once', action='store_true', help='Release expired holds once and exit')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        interval = options['interval']
+
+        self.stdout.write(f"Releasing expired holds (batch size {batch_size})")
+        try:
+            while True:
+                close_old_connections()
+                released = release_expired(batch_size)
+                if released:
+                    self.stdout.write(f"Released {released} holds")
+                    continue
+                if options['once']:
+                    break
+                time.sleep(interval)
+        except KeyboardInterrupt:
+            self.stdout.write("Stopping hold sweeper")
@@ -0,0 +1,65 @@
+# Generated by Django 6.0.1 on 2026-10-18 11:09
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Category',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('slug', models.SlugField(max_length=100, unique=True)),
+                ('position', models.PositiveIntegerField(default=0)),
+                ('is_active', models.BooleanField(default=True)),
+            ],
+            options={
+                'verbose_name_plural': 'Categories',
+                'ordering': ['position', 'name'],
+            },
+        ),
+        migrations.CreateModel(
+            name='Product',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255)),
+                ('slug', models.SlugField(max_length=255, unique=True)),
+                ('description', models.TextField(blank=True)),
+                ('price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('old_price', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('rating', models.DecimalField(decimal_places=1, default=0, max_digits=2)),
+                ('rating_count', models.PositiveIntegerField(default=0)),
+                ('image', models.ImageField(blank=True, null=True, upload_to='products/')),
+                ('is_new', models.BooleanField(default=False)),
+                ('is_active', models.BooleanField(default=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='products', to='catalog.category')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ProductListing',
+            fields=[
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='listing', serialize=False, to='catalog.product')),
+                ('category_slug', models.CharField(max_length=100)),
+                ('name', models.CharField(max_length=255)),
+                ('price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('old_price', models.DecimalField(decimal_places=2, max_digits=10, null=True)),
+                ('rating', models.DecimalField(decimal_places=1, max_digits=2)),
+                ('discount', models.PositiveSmallIntegerField(default=0)),
+                ('thumbnail', models.CharField(blank=True, max_length=255)),
+                ('is_new', models.BooleanField(default=False)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['category_slug', 'price', 'product'], name='catalog_listing_cat_price_idx'), models.Index(fields=['category_slug', 'rating', 'product'], name='catalog_listing_cat_rating_idx'), models.Index(fields=['category_slug', 'product'], name='catalog_listing_cat_new_idx'), models.Index(fields=['price', 'product'], name='catalog_listing_price_idx'), models.Index(fields=['rating', 'product'], name='catalog_listing_rating_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 6.0.1 on 2026-10-18 11:22
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def create_search_index(apps, schema_editor):
+    """Full-text index for catalog.search, filled with the listed products"""
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute(
+            "CREATE VIRTUAL TABLE catalog_product_fts USING fts5("
+            "name, category, description, tokenize = 'porter unicode61 remove_diacritics 2')"
+        )
+        schema_editor.execute(
+            "INSERT INTO catalog_product_fts (rowid, name, category, description) "
+            "SELECT p.id, p.name, c.name, p.description FROM catalog_product p "
+            "JOIN catalog_category c ON c.id = p.category_id WHERE p.is_active AND c.is_active"
+        )
+    elif vendor == 'postgresql':
+        schema_editor.execute(
+            "CREATE TABLE catalog_product_search ("
+            "product_id bigint PRIMARY KEY REFERENCES catalog_product (id) ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED, "
+            "document tsvector NOT NULL)"
+        )
+        schema_editor.execute("CREATE INDEX catalog_product_search_idx ON catalog_product_search USING GIN (document)")
+        schema_editor.execute(
+            "INSERT INTO catalog_product_search (product_id, document) "
+            "SELECT p.id, setweight(to_tsvector(%s::regconfig, p.name), 'A') "
+            "|| setweight(to_tsvector(%s::regconfig, c.name), 'B') "
+            "|| setweight(to_tsvector(%s::regconfig, p.description), 'C') "
+            "FROM catalog_product p JOIN catalog_category c ON c.id = p.category_id WHERE p.is_active AND c.is_active",
+            [settings.CATALOG_SEARCH_CONFIG] * 3,
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute("DROP TABLE IF EXISTS catalog_product_fts")
+    elif vendor == 'postgresql':
+        schema_editor.execute("DROP TABLE IF EXISTS catalog_product_search")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['updated_at'], name='catalog_product_updated_idx'),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 6.0.1 on 2026-10-18 11:48
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0002_product_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HomeSlide',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('image', models.ImageField(upload_to='slides/')),
+                ('alt', models.CharField(max_length=255)),
+                ('link', models.CharField(blank=True, max_length=255)),
+                ('position', models.PositiveIntegerField(default=0)),
+                ('is_active', models.BooleanField(default=True)),
+            ],
+            options={
+                'ordering': ['position', 'id'],
+            },
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='is_featured',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.CreateModel(
+            name='FlashSale',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('quantity', models.PositiveIntegerField()),
+                ('starts_at', models.DateTimeField()),
+                ('ends_at', models.DateTimeField()),
+                ('position', models.PositiveIntegerField(default=0)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='flash_sales', to='catalog.product')),
+            ],
+            options={
+                'ordering': ['position', 'id'],
+                'indexes': [models.Index(fields=['ends_at', 'starts_at'], name='catalog_flashsale_window_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,137 @@
+"""
+Per-process in-memory copies of the product listing.
+
+The autocomplete index (catalog.autocomplete) and the facet counts
+(catalog.facets) answer from memory without touching the database. Each
+process builds its own copy on first use (get_mirror) and keeps it current:
+- product saves in this process are applied at once (catalog.signals);
+- every CATALOG_MIRROR_REFRESH_SECONDS it reloads the products saved since
+  its last refresh (Product.updated_at), so other processes' edits show up too;
+- deletes, category changes and listing rebuilds bump a generation counter in
+  the cache (invalidate()); a process that sees a new generation rebuilds;
+- every CATALOG_MIRROR_REBUILD_SECONDS it rebuilds anyway, dropping any
+  drift from writes that bypassed the signals.
+"""
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import F
+from django.utils import timezone
+from datetime import timedelta
+import threading
+import time
+from .models import Product, ProductListing
+
+GENERATION_KEY = 'catalog:listing:generation'
+
+# Saves committed just before a refresh may carry an earlier updated_at
+REFRESH_OVERLAP = timedelta(seconds=2)
+
+_mirrors = {}
+_mirrors_lock = threading.Lock()
+
+
+def _cache():
+    return caches[settings.CATALOG_MIRROR_CACHE_ALIAS]
+
+
+def listing_rows(queryset=None):
+    """Listing rows as the dicts passed to ListingMirror.load()/apply()"""
+    queryset = ProductListing.objects.all() if queryset is None else queryset
+    return queryset.values('product_id', 'name', 'category_slug', 'price', 'rating', rating_count=F('product__rating_count'))
+
+
+def product_row(product):
+    """The listing_rows() dict of a listed product instance"""
+    return {
+        'product_id': product.pk,
+        'name': product.name,
+        'category_slug': product.category.slug,
+        'price': product.price,
+        'rating': product.rating,
+        'rating_count': product.rating_count,
+    }
+
+
+class ListingMirror:
+    """Base class: subclasses hold the data, this keeps it in step with the listing"""
+
+    def __init__(self):
+        self.generation = None
+        self.refreshed_at = None
+        self.rebuilt = 0.0
+        self.checked = 0.0
+        self.refresh_lock = threading.Lock()
+
+    def load(self, rows):
+        """Replace the contents with every listing row"""
+        raise NotImplementedError
+
+    def apply(self, product_id, row):
+        """Add or replace a product (row is None when it is no longer listed)"""
+        raise NotImplementedError
+
+    def rebuild(self):
+        self.generation = _cache().get(GENERATION_KEY, 0)
+        self.refreshed_at = timezone.now()
+        self.rebuilt = self.checked = time.monotonic()
+        self.load(listing_rows().iterator())
+
+    def refresh(self):
+        """Catch up with other processes, at most once per refresh interval"""
+        now = time.monotonic()
+        if now - self.checked < settings.CATALOG_MIRROR_REFRESH_SECONDS:
+            return
+        # Other threads keep answering from the current data meanwhile
+        if not self.refresh_lock.acquire(blocking=False):
+            return
+        try:
+            self.checked = now
+            if (now - self.rebuilt >= settings.CATALOG_MIRROR_REBUILD_SECONDS
+                    or _cache().get(GENERATION_KEY, 0) != self.generation):
+                self.rebuild()
+                return
+            since, self.refreshed_at = self.refreshed_at - REFRESH_OVERLAP, timezone.now()
+            changed = set(Product.objects.filter(updated_at__gte=since).values_list('id', flat=True))
+            if not changed:
+                return
+            for row in listing_rows(ProductListing.objects.filter(product_id__in=changed)):
+                changed.discard(row['product_id'])
+                self.apply(row['product_id'], row)
+            for product_id in changed:
+                self.apply(product_id, None)
+        finally:
+            self.refresh_lock.release()
+
+
+def get_mirror(cls):
+    """The process's instance of a ListingMirror subclass, built on first use"""
+    mirror = _mirrors.get(cls)
+    if mirror is None:
+        with _mirrors_lock:
+            mirror = _mirrors.get(cls)
+            if mirror is None:
+                mirror = cls()
+                mirror.rebuild()
+                _mirrors[cls] = mirror
+    mirror.refresh()
+    return mirror
+
+
+def product_changed(product, listed):
+    """Apply a product save to this process's mirrors (those already built)"""
+    row = product_row(product) if listed else None
+    for mirror in list(_mirrors.values()):
+        mirror.apply(product.pk, row)
+
+
+def invalidate():
+    """Make every process rebuild its mirrors at their next refresh"""
+    cache = _cache()
+    cache.add(GENERATION_KEY, 0, timeout=None)
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:
+        cache.set(GENERATION_KEY, 1, timeout=None)
+    for mirror in list(_mirrors.values()):
+        # Not waiting for the refresh interval in this process
+        mirror.checked = 0.0
@@ -0,0 +1,168 @@
+from decimal import Decimal, ROUND_HALF_UP
+from django.conf import settings
+from django.db import models
+
+# Create your models here.
+
+
+class Category(models.Model):
+    """Shop category, e.g. Fashion or Electronics"""
+    name = models.CharField(max_length=100)
+    slug = models.SlugField(max_length=100, unique=True)
+    position = models.PositiveIntegerField(default=0)
+    is_active = models.BooleanField(default=True)
+
+    class Meta:
+        verbose_name_plural = "Categories"
+        ordering = ['position', 'name']
+
+    def __str__(self):
+        return self.name
+
+
+class Product(models.Model):
+    """A product as edited by staff; the shop grid reads ProductListing instead"""
+    category = models.ForeignKey(Category, on_delete=models.PROTECT, related_name='products')
+    name = models.CharField(max_length=255)
+    slug = models.SlugField(max_length=255, unique=True)
+    description = models.TextField(blank=True)
+    price = models.DecimalField(max_digits=10, decimal_places=2)
+    old_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    rating = models.DecimalField(max_digits=2, decimal_places=1, default=0)
+    rating_count = models.PositiveIntegerField(default=0)
+    image = models.ImageField(upload_to='products/', null=True, blank=True)
+    is_new = models.BooleanField(default=False)
+    # Shown in the Home page's featured products
+    is_featured = models.BooleanField(default=False)
+    is_active = models.BooleanField(default=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # Autocomplete indexes catch up on recently saved products
+            models.Index(fields=['updated_at'], name='catalog_product_updated_idx'),
+        ]
+
+    def __str__(self):
+        return self.name
+
+    @property
+    def discount(self):
+        """Whole percent off old_price, or 0"""
+        if not self.old_price or self.old_price <= self.price:
+            return 0
+        return int(((self.old_price - self.price) * 100 / self.old_price).quantize(Decimal('1'), rounding=ROUND_HALF_UP))
+
+
+class ProductListing(models.Model):
+    """
+    Read model behind the shop grid: one row per active product in an active
+    category, holding exactly the columns a grid card shows.
+
+    Kept in sync by catalog.signals (see catalog.listing). Each index serves
+    one sort order, with or without a category, as a single range scan.
+    """
+    product = models.OneToOneField(Product, on_delete=models.CASCADE, primary_key=True, related_name='listing')
+    category_slug = models.CharField(max_length=100)
+    name = models.CharField(max_length=255)
+    price = models.DecimalField(max_digits=10, decimal_places=2)
+    old_price = models.DecimalField(max_digits=10, decimal_places=2, null=True)
+    rating = models.DecimalField(max_digits=2, decimal_places=1)
+    discount = models.PositiveSmallIntegerField(default=0)
+    # Storage name of the product image
+    thumbnail = models.CharField(max_length=255, blank=True)
+    is_new = models.BooleanField(default=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['category_slug', 'price', 'product'], name='catalog_listing_cat_price_idx'),
+            models.Index(fields=['category_slug', 'rating', 'product'], name='catalog_listing_cat_rating_idx'),
+            models.Index(fields=['category_slug', 'product'], name='catalog_listing_cat_new_idx'),
+            models.Index(fields=['price', 'product'], name='catalog_listing_price_idx'),
+            models.Index(fields=['rating', 'product'], name='catalog_listing_rating_idx'),
+        ]
+
+    def __str__(self):
+        return self.name
+
+
+class HomeSlide(models.Model):
+    """Banner of the Home page carousel"""
+    image = models.ImageField(upload_to='slides/')
+    alt = models.CharField(max_length=255)
+    link = models.CharField(max_length=255, blank=True)
+    position = models.PositiveIntegerField(default=0)
+    is_active = models.BooleanField(default=True)
+
+    class Meta:
+        ordering = ['position', 'id']
+
+    def __str__(self):
+        return self.alt
+
+
+class FlashSale(models.Model):
+    """A product sold at price between starts_at and ends_at, up to quantity units"""
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='flash_sales')
+    price = models.DecimalField(max_digits=10, decimal_places=2)
+    quantity = models.PositiveIntegerField()
+    # Stock rows the quantity is split over (see catalog.reservations); more for the hottest sales
+    shards = models.PositiveSmallIntegerField(default=1)
+    starts_at = models.DateTimeField()
+    ends_at = models.DateTimeField()
+    position = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ['position', 'id']
+        indexes = [
+            models.Index(fields=['ends_at', 'starts_at'], name='catalog_flashsale_window_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.product} at {self.price}"
+
+
+class StockShard(models.Model):
+    """Part of a flash sale's remaining stock; buyers spread their decrements over the shards"""
+    sale = models.ForeignKey(FlashSale, on_delete=models.CASCADE, related_name='stock_shards')
+    shard = models.PositiveSmallIntegerField()
+    stock = models.PositiveIntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['sale', 'shard'], name='catalog_stockshard_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.sale_id}/{self.shard}: {self.stock}"
+
+
+class Reservation(models.Model):
+    """Units of a flash sale held for a user until expires_at, then confirmed or released"""
+    HELD = 'held'
+    CONFIRMED = 'confirmed'
+    RELEASED = 'released'
+    STATUS_CHOICES = [
+        (HELD, 'Held'),
+        (CONFIRMED, 'Confirmed'),
+        (RELEASED, 'Released'),
+    ]
+
+    sale = models.ForeignKey(FlashSale, on_delete=models.CASCADE, related_name='reservations')
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='reservations')
+    # Shard the units were taken from, and are returned to
+    shard = models.PositiveSmallIntegerField()
+    quantity = models.PositiveIntegerField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=HELD)
+    expires_at = models.DateTimeField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            # The sweeper's scan of expired holds
+            models.Index(fields=['expires_at'], name='catalog_reservation_held_idx', condition=models.Q(status='held')),
+        ]
+
+    def __str__(self):
+        return f"{self.quantity} x {self.sale} for {self.user} ({self.status})"
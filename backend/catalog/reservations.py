@@ -0,0 +1,179 @@
+"""
+Flash sale stock reservations.
+
+A sale's stock lives in StockShard rows, FlashSale.shards of them (open_sale()
+splits quantity evenly when the sale is created). reserve() takes units with
+one conditional UPDATE ... SET stock = stock - n WHERE stock >= n on a
+shard, starting at a random one and moving on when it is short, so
+concurrent buyers can never oversell and their row locks are spread over the
+shards instead of queueing on one row.
+
+Each reservation is a hold that expires after CATALOG_FLASH_SALE_HOLD_SECONDS:
+confirm() keeps it, release() and the sweeper (`manage.py
+release_expired_holds`) give the units back to their shard. A user may have
+at most CATALOG_FLASH_SALE_MAX_HOLDS_PER_USER unexpired holds on a sale, so
+one account cannot hold the whole stock. Once a sale has no stock left, a
+flag in the cache turns buyers away without a query until a release puts
+units back.
+"""
+from collections import defaultdict
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+from datetime import timedelta
+import random
+from .models import Reservation, StockShard
+
+# How long the sold-out flag is trusted without a release clearing it
+SOLD_OUT_SECONDS = 5
+
+
+class ReservationError(Exception):
+    """Raised when units cannot be reserved; carries the API status and message"""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+def _cache():
+    return caches[settings.CATALOG_FLASH_SALE_CACHE_ALIAS]
+
+
+def _sold_out_key(sale_id):
+    return f"catalog:flash_sale:{sale_id}:sold_out"
+
+
+def _shard_count(sale):
+    # A sale saved with shards=0 still has (and is reserved from) one shard
+    return max(sale.shards, 1)
+
+
+def open_sale(sale):
+    """Create the sale's stock shards, unless it already has them"""
+    shards = _shard_count(sale)
+    base, extra = divmod(sale.quantity, shards)
+    StockShard.objects.bulk_create(
+        [StockShard(sale=sale, shard=shard, stock=base + (shard < extra)) for shard in range(shards)],
+        ignore_conflicts=True,
+    )
+
+
+def remaining(sale):
+    """Units not held or sold"""
+    return StockShard.objects.filter(sale=sale).aggregate(stock=Sum('stock'))['stock'] or 0
+
+
+def _check_holds(sale, user_id, now):
+    holds = Reservation.objects.filter(sale_id=sale.pk, user_id=user_id, status=Reservation.HELD, expires_at__gt=now).count()
+    if holds >= settings.CATALOG_FLASH_SALE_MAX_HOLDS_PER_USER:
+        raise ReservationError(409, f"You can hold at most {settings.CATALOG_FLASH_SALE_MAX_HOLDS_PER_USER} reservations for this sale")
+
+
+def reserve(sale, user_id, quantity=1):
+    """
+    Hold quantity units of a running sale for a user
+
+    Returns:
+        Reservation: the hold, expiring after CATALOG_FLASH_SALE_HOLD_SECONDS
+
+    Raises:
+        ReservationError: bad quantity, sale not running, too many holds for
+            the user, or not enough stock
+    """
+    if not 1 <= quantity <= settings.CATALOG_FLASH_SALE_MAX_QUANTITY:
+        raise ReservationError(400, f"Quantity must be between 1 and {settings.CATALOG_FLASH_SALE_MAX_QUANTITY}")
+    now = timezone.now()
+    if not sale.starts_at <= now < sale.ends_at:
+        raise ReservationError(409, 'This flash sale is not running')
+    cache = _cache()
+    if cache.get(_sold_out_key(sale.pk)):
+        raise ReservationError(409, 'Sold out')
+
+    _check_holds(sale, user_id, now)
+
+    expires_at = now + timedelta(seconds=settings.CATALOG_FLASH_SALE_HOLD_SECONDS)
+    shards = _shard_count(sale)
+    first = random.randrange(shards)
+    for offset in range(shards):
+        shard = (first + offset) % shards
+        with transaction.atomic():
+            # The WHERE clause is the stock check: no read, so no window to oversell
+            taken = StockShard.objects.filter(sale_id=sale.pk, shard=shard, stock__gte=quantity).update(stock=F('stock') - quantity)
+            if taken:
+                # Again under a lock on the user's row, so their concurrent
+                # requests cannot all pass; raising here gives the units back
+                User.objects.select_for_update().filter(pk=user_id).values_list('pk', flat=True).first()
+                _check_holds(sale, user_id, now)
+                return Reservation.objects.create(sale_id=sale.pk, user_id=user_id, shard=shard, quantity=quantity, expires_at=expires_at)
+
+    # Every shard is short; units may still be left for smaller quantities
+    if not StockShard.objects.filter(sale_id=sale.pk, stock__gt=0).exists():
+        cache.set(_sold_out_key(sale.pk), True, SOLD_OUT_SECONDS)
+        raise ReservationError(409, 'Sold out')
+    raise ReservationError(409, 'Not enough stock left for that quantity')
+
+
+def confirm(reservation):
+    """
+    Turn a hold into a sale (at checkout)
+
+    Returns:
+        bool: False if the hold had expired or was released
+    """
+    return bool(Reservation.objects.filter(
+        pk=reservation.pk,
+        status=Reservation.HELD,
+        expires_at__gt=timezone.now(),
+    ).update(status=Reservation.CONFIRMED))
+
+
+def release(reservation):
+    """
+    Give a hold's units back to its shard
+
+    Returns:
+        bool: False if it was not held anymore (confirmed, or already released)
+    """
+    with transaction.atomic():
+        released = Reservation.objects.filter(pk=reservation.pk, status=Reservation.HELD).update(status=Reservation.RELEASED)
+        if released:
+            StockShard.objects.filter(sale_id=reservation.sale_id, shard=reservation.shard).update(stock=F('stock') + reservation.quantity)
+    if released:
+        _cache().delete(_sold_out_key(reservation.sale_id))
+    return bool(released)
+
+
+def release_expired(batch_size=500):
+    """
+    Release up to batch_size expired holds
+
+    The batch is marked released with one UPDATE and its units go back with
+    one UPDATE per shard. Safe to run in several processes: the holds are
+    locked with SKIP LOCKED, so each sweeper (and release()) gets different
+    ones. SQLite has no row locks, but serializes the writing transactions.
+
+    Returns:
+        int: holds released
+    """
+    with transaction.atomic():
+        expired = list(Reservation.objects
+                       .select_for_update(skip_locked=True)
+                       .filter(status=Reservation.HELD, expires_at__lte=timezone.now())
+                       .order_by('expires_at')
+                       .values_list('pk', 'sale_id', 'shard', 'quantity')[:batch_size])
+        if not expired:
+            return 0
+        Reservation.objects.filter(pk__in=[pk for pk, _, _, _ in expired]).update(status=Reservation.RELEASED)
+        units = defaultdict(int)
+        for _, sale_id, shard, quantity in expired:
+            units[sale_id, shard] += quantity
+        # In a fixed order, so concurrent sweepers do not deadlock on the shards
+        for (sale_id, shard), quantity in sorted(units.items()):
+            StockShard.objects.filter(sale_id=sale_id, shard=shard).update(stock=F('stock') + quantity)
+    _cache().delete_many([_sold_out_key(sale_id) for sale_id in {sale_id for sale_id, _ in units}])
+    return len(expired)
@@ -0,0 +1,171 @@
+"""
+Full-text product search.
+
+Views and signals talk to the backend returned by get_search_backend(),
+chosen by the database vendor:
+
+- SqliteSearchBackend keeps an FTS5 table (catalog_product_fts, rowid =
+  product id) ranked with bm25.
+- PostgresSearchBackend keeps a weighted tsvector per product
+  (catalog_product_search) behind a GIN index, ranked with ts_rank.
+
+Both index the products that are in the listing (active product in an active
+category): name, category name and description, weighted in that order. The
+last word of a query matches as a prefix, so results follow the search box
+while the user types. The tables are created by migration 0002 and kept in
+sync by catalog.signals; `manage.py reindex_catalog_search` rebuilds them.
+"""
+from django.conf import settings
+from django.db import connection, connections, router, transaction
+import re
+from .models import Category, Product
+
+MAX_TERMS = 8
+
+PRODUCT = Product._meta.db_table
+CATEGORY = Category._meta.db_table
+
+_WORD = re.compile(r'\w+')
+
+
+def search_terms(query):
+    """Lowercased words of a query, at most MAX_TERMS"""
+    return _WORD.findall(query.lower())[:MAX_TERMS]
+
+
+class BaseSearchBackend:
+    """Index visible products and rank them for a query"""
+
+    table = None
+    # Column holding the product id
+    key = None
+
+    def _delete(self, cursor, where, params):
+        """Drop the rows of the products matching where (SQL on p = product)"""
+        raise NotImplementedError
+
+    def _insert(self, cursor, where, params):
+        """Index the visible products matching where (SQL on p = product, c = category)"""
+        raise NotImplementedError
+
+    def _reindex(self, where, params):
+        with transaction.atomic(), connection.cursor() as cursor:
+            self._delete(cursor, where, params)
+            self._insert(cursor, where, params)
+            return cursor.rowcount
+
+    def update_products(self, product_ids):
+        """(Re)index products by id, dropping those that are hidden"""
+        product_ids = list(product_ids)
+        if product_ids:
+            placeholders = ', '.join(['%s'] * len(product_ids))
+            self._reindex(f"p.id IN ({placeholders})", product_ids)
+
+    def remove_products(self, product_ids):
+        """Drop products from the index, e.g. after they were deleted"""
+        product_ids = list(product_ids)
+        if product_ids:
+            placeholders = ', '.join(['%s'] * len(product_ids))
+            with connection.cursor() as cursor:
+                cursor.execute(f"DELETE FROM {self.table} WHERE {self.key} IN ({placeholders})", product_ids)
+
+    def update_category(self, category_id):
+        """(Re)index every product of a category, e.g. after a rename"""
+        self._reindex("p.category_id = %s", [category_id])
+
+    def rebuild(self):
+        """
+        Recreate the whole index
+
+        Returns:
+            int: products indexed
+        """
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {self.table}")
+            self._insert(cursor, "TRUE", [])
+            return cursor.rowcount
+
+    def _read_cursor(self):
+        # Raw SQL bypasses the router: follow it, so search views can use a replica
+        return connections[router.db_for_read(Product)].cursor()
+
+    def search(self, query, limit):
+        """Ids of the best matching products, best first"""
+        raise NotImplementedError
+
+
+class SqliteSearchBackend(BaseSearchBackend):
+    table = 'catalog_product_fts'
+    key = 'rowid'
+
+    def _delete(self, cursor, where, params):
+        cursor.execute(f"DELETE FROM {self.table} WHERE rowid IN (SELECT p.id FROM {PRODUCT} p WHERE {where})", params)
+
+    def _insert(self, cursor, where, params):
+        cursor.execute(f"""
+            INSERT INTO {self.table} (rowid, name, category, description)
+            SELECT p.id, p.name, c.name, p.description
+            FROM {PRODUCT} p JOIN {CATEGORY} c ON c.id = p.category_id
+            WHERE p.is_active AND c.is_active AND {where}
+        """, params)
+
+    def search(self, query, limit):
+        terms = search_terms(query)
+        if not terms:
+            return []
+        # Quoted terms, so FTS5 operators typed by users are plain words
+        match = ' '.join(f'"{term}"' for term in terms) + '*'
+        with self._read_cursor() as cursor:
+            cursor.execute(
+                f"SELECT rowid FROM {self.table} WHERE {self.table} MATCH %s ORDER BY bm25({self.table}, 10.0, 4.0, 1.0) LIMIT %s",
+                [match, limit],
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+
+class PostgresSearchBackend(BaseSearchBackend):
+    table = 'catalog_product_search'
+    key = 'product_id'
+
+    def _delete(self, cursor, where, params):
+        # Rows of deleted products go with them (ON DELETE CASCADE)
+        cursor.execute(f"DELETE FROM {self.table} s USING {PRODUCT} p WHERE s.product_id = p.id AND {where}", params)
+
+    def _insert(self, cursor, where, params):
+        cursor.execute(f"""
+            INSERT INTO {self.table} (product_id, document)
+            SELECT p.id,
+                   setweight(to_tsvector(%s::regconfig, p.name), 'A')
+                   || setweight(to_tsvector(%s::regconfig, c.name), 'B')
+                   || setweight(to_tsvector(%s::regconfig, p.description), 'C')
+            FROM {PRODUCT} p JOIN {CATEGORY} c ON c.id = p.category_id
+            WHERE p.is_active AND c.is_active AND {where}
+        """, [settings.CATALOG_SEARCH_CONFIG] * 3 + list(params))
+
+    def search(self, query, limit):
+        terms = search_terms(query)
+        if not terms:
+            return []
+        tsquery = ' & '.join(f"'{term}'" for term in terms) + ':*'
+        with self._read_cursor() as cursor:
+            cursor.execute(f"""
+                SELECT product_id FROM {self.table}, to_tsquery(%s::regconfig, %s) query
+                WHERE document @@ query
+                ORDER BY ts_rank(document, query) DESC, product_id DESC
+                LIMIT %s
+            """, [settings.CATALOG_SEARCH_CONFIG, tsquery, limit])
+            return [row[0] for row in cursor.fetchall()]
+
+
+BACKENDS = {
+    'sqlite': SqliteSearchBackend,
+    'postgresql': PostgresSearchBackend,
+}
+
+
+def get_search_backend():
+    """Search backend for the default database"""
+    try:
+        return BACKENDS[connection.vendor]()
+    except KeyError:
+        raise NotImplementedError(f"Product search does not support {connection.vendor}")
@@ -0,0 +1,57 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from functools import partial
+from . import home, mirrors
+from .listing import sync_category, sync_product
+from .models import Category, FlashSale, HomeSlide, Product
+from .reservations import open_sale
+from .search import get_search_backend
+
+
+@receiver(post_save, sender=Product)
+def sync_product_listing(sender, instance, **kwargs):
+    """Keep the product's listing row and search entry in step (deleting a product cascades to the listing)"""
+    listed = sync_product(instance)
+    get_search_backend().update_products([instance.pk])
+    transaction.on_commit(lambda: mirrors.product_changed(instance, listed))
+
+
+@receiver(post_delete, sender=Product)
+def remove_product_search(sender, instance, **kwargs):
+    get_search_backend().remove_products([instance.pk])
+    transaction.on_commit(mirrors.invalidate)
+
+
+@receiver(post_save, sender=Category)
+def sync_category_listing(sender, instance, created=False, **kwargs):
+    """A renamed or (de)activated category changes its products' rows"""
+    if not created:
+        sync_category(instance)
+        get_search_backend().update_category(instance.pk)
+        transaction.on_commit(mirrors.invalidate)
+
+
+@receiver(post_save, sender=FlashSale)
+def open_flash_sale(sender, instance, created=False, **kwargs):
+    """Split a new sale's quantity into its stock shards"""
+    if created:
+        open_sale(instance)
+
+
+# Home page sections showing each model's rows (catalog.home)
+HOME_SECTIONS = {
+    Category: ('categories', 'flashSales', 'featuredProducts'),
+    Product: ('flashSales', 'featuredProducts'),
+    FlashSale: ('flashSales',),
+    HomeSlide: ('slides',),
+}
+
+
+def invalidate_home(sender, **kwargs):
+    transaction.on_commit(partial(home.invalidate, *HOME_SECTIONS[sender]))
+
+
+for model in HOME_SECTIONS:
+    post_save.connect(invalidate_home, sender=model, dispatch_uid=f'catalog_home_save_{model.__name__}')
+    post_delete.connect(invalidate_home, sender=model, dispatch_uid=f'catalog_home_delete_{model.__name__}')
@@ -0,0 +1,388 @@
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
+import threading
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.db.models import Sum
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings, skipUnlessDBFeature
+from django.utils import timezone
+from account import tokens
+from . import home, mirrors
+from .autocomplete import PrefixIndex
+from .facets import FacetCounts
+from .listing import SORTS
+from .models import Category, FlashSale, Product, ProductListing, Reservation, StockShard
+from .reservations import ReservationError, confirm, release, release_expired, remaining, reserve
+
+
+def make_products(category, specs):
+    """Products from (name, price, rating) tuples, in creation order"""
+    return [
+        Product.objects.create(category=category, name=name, slug=f"{category.slug}-{i}", price=Decimal(price), rating=Decimal(rating))
+        for i, (name, price, rating) in enumerate(specs)
+    ]
+
+
+@override_settings(RATE_LIMIT_ENABLED=False)
+class CatalogTestCase(TestCase):
+
+    def setUp(self):
+        caches['default'].clear()
+        # Per-process mirrors would otherwise outlive each test's rows
+        mirrors._mirrors.clear()
+        self.addCleanup(mirrors._mirrors.clear)
+        self.shoes = Category.objects.create(name='Shoes', slug='shoes')
+        self.bags = Category.objects.create(name='Bags', slug='bags')
+        # Repeated prices and ratings, so pages split inside runs of equal values
+        make_products(self.shoes, [(f"Shoe {i}", 100 + (i % 4) * 50, f"{3 + (i % 3) * 0.5}") for i in range(14)])
+        make_products(self.bags, [(f"Bag {i}", 400 + (i % 3) * 300, f"{4 + (i % 2) * 0.5}") for i in range(9)])
+
+
+class ListingTests(CatalogTestCase):
+
+    def pages(self, **params):
+        """Product ids of every page, following next_cursor"""
+        ids, after = [], None
+        while True:
+            query = dict(params, limit=5, **({'after': after} if after else {}))
+            response = self.client.get('/catalog/api/products/', query)
+            self.assertEqual(response.status_code, 200)
+            body = response.json()
+            self.assertLessEqual(len(body['products']), 5)
+            ids.extend(product['id'] for product in body['products'])
+            after = body['next_cursor']
+            if after is None:
+                return ids
+
+    def expected(self, sort, rows=None):
+        column, descending = SORTS[sort]
+        rows = rows if rows is not None else ProductListing.objects.all()
+        order = ['product_id'] if column == 'product_id' else [column, 'product_id']
+        return list(rows.order_by(*[f"{'-' if descending else ''}{name}" for name in order]).values_list('product_id', flat=True))
+
+    def test_keyset_pages_cover_every_row_once_in_order(self):
+        for sort in SORTS:
+            with self.subTest(sort=sort):
+                self.assertEqual(self.pages(sort=sort), self.expected(sort))
+
+    def test_keyset_pages_with_filters(self):
+        rows = ProductListing.objects.filter(category_slug='shoes', price__gte=150, price__lte=200, rating__gte=Decimal('3.5'))
+        for sort in SORTS:
+            with self.subTest(sort=sort):
+                ids = self.pages(sort=sort, category='shoes', min_price=150, max_price=200, min_rating=3.5)
+                self.assertEqual(ids, self.expected(sort, rows))
+                self.assertTrue(ids)
+
+    def test_inactive_products_and_categories_are_not_listed(self):
+        product = Product.objects.filter(category=self.shoes).first()
+        product.is_active = False
+        product.save()
+        self.assertNotIn(product.pk, self.pages(sort='newest'))
+        self.bags.is_active = False
+        self.bags.save()
+        self.assertFalse(ProductListing.objects.filter(category_slug='bags').exists())
+
+    def test_invalid_cursor_and_sort(self):
+        for params in ({'sort': 'price_asc', 'after': 'nope'}, {'sort': 'price_asc', 'after': 'NaN|3'}, {'sort': 'popular'}):
+            with self.subTest(params=params):
+                self.assertEqual(self.client.get('/catalog/api/products/', params).status_code, 400)
+
+
+class PrefixIndexTests(TestCase):
+
+    def test_suggestions_rank_name_starts_then_weight(self):
+        index = PrefixIndex()
+        index.load([(1, 'Red Running Shoe', 5), (2, 'Running Shorts', 2), (3, 'Trail Running Shoe', 9), (4, 'Rain Coat', 50)])
+        self.assertEqual([item['id'] for item in index.suggest('run', 10)], [2, 3, 1])
+        self.assertEqual([item['id'] for item in index.suggest('  RUNNING  sh', 10)], [2, 3, 1])
+        self.assertEqual([item['id'] for item in index.suggest('r', 2)], [4, 1])
+        self.assertEqual(index.suggest('', 10), [])
+
+    def test_add_replace_and_remove(self):
+        index = PrefixIndex()
+        index.add(1, 'Blue Shirt')
+        index.add(1, 'Green Shirt')
+        self.assertEqual(index.suggest('blue', 10), [])
+        self.assertEqual(index.suggest('shirt', 10), [{'id': 1, 'name': 'Green Shirt'}])
+        index.remove(1)
+        self.assertEqual(index.suggest('shirt', 10), [])
+        self.assertEqual(index.keys, [])
+
+    def test_suggest_while_products_change(self):
+        index = PrefixIndex()
+        index.load((pk, f"Widget {pk}", pk) for pk in range(500))
+        stop = threading.Event()
+        errors = []
+
+        def churn():
+            pk = 0
+            while not stop.is_set():
+                index.remove(pk % 500)
+                index.add(pk % 500, f"Widget {pk % 500}", pk % 500)
+                pk += 1
+
+        def read():
+            try:
+                for _ in range(300):
+                    suggestions = index.suggest('widget', 20)
+                    self.assertLessEqual(len(suggestions), 20)
+            except Exception as e:
+                errors.append(e)
+
+        writer = threading.Thread(target=churn)
+        readers = [threading.Thread(target=read) for _ in range(4)]
+        writer.start()
+        for reader in readers:
+            reader.start()
+        for reader in readers:
+            reader.join()
+        stop.set()
+        writer.join()
+        self.assertEqual(errors, [])
+
+
+class AutocompleteApiTests(CatalogTestCase):
+
+    def suggest(self, q):
+        response = self.client.get('/catalog/api/autocomplete/', {'q': q})
+        self.assertEqual(response.status_code, 200)
+        return [item['name'] for item in response.json()['suggestions']]
+
+    def test_follows_product_saves(self):
+        self.assertIn('Bag 3', self.suggest('bag'))
+        with self.captureOnCommitCallbacks(execute=True):
+            Product.objects.create(category=self.bags, name='Tote Bag', slug='tote', price=Decimal('10'))
+        self.assertIn('Tote Bag', self.suggest('tote'))
+        with self.captureOnCommitCallbacks(execute=True):
+            Product.objects.filter(slug='tote').first().delete()
+        self.assertNotIn('Tote Bag', self.suggest('tote'))
+
+
+class FacetTests(CatalogTestCase):
+
+    def counts(self, **params):
+        response = self.client.get('/catalog/api/facets/', params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_counts_match_the_listing(self):
+        body = self.counts()
+        self.assertEqual(body['total'], ProductListing.objects.count())
+        self.assertEqual(body['category'], {'shoes': 14, 'bags': 9})
+        self.assertEqual(sum(body['price'].values()), ProductListing.objects.count())
+        self.assertEqual(body['price']['500-1000'], ProductListing.objects.filter(price__gte=500, price__lt=1000).count())
+        self.assertEqual(body['rating']['4.5'], ProductListing.objects.filter(rating__gte=Decimal('4.5')).count())
+
+    def test_each_facet_counts_with_the_other_filters(self):
+        body = self.counts(category='bags', price='0-500,500-1000', min_rating='4.5')
+        bags = ProductListing.objects.filter(category_slug='bags')
+        self.assertEqual(body['total'], bags.filter(price__lt=1000, rating__gte=Decimal('4.5')).count())
+        # Category counts ignore the category filter, price counts the price filter
+        self.assertEqual(body['category']['shoes'], ProductListing.objects.filter(category_slug='shoes', price__lt=1000, rating__gte=Decimal('4.5')).count())
+        self.assertEqual(body['price']['1000-2000'], bags.filter(price__gte=1000, price__lt=2000, rating__gte=Decimal('4.5')).count())
+        self.assertEqual(body['rating']['3'], bags.filter(price__lt=1000).count())
+
+    def test_equal_rating_spellings(self):
+        expected = ProductListing.objects.filter(rating__gte=4).count()
+        self.assertGreater(expected, 0)
+        for min_rating in ('4', '4.0', '4.00'):
+            with self.subTest(min_rating=min_rating):
+                self.assertEqual(self.counts(min_rating=min_rating)['total'], expected)
+        self.assertEqual(self.counts(min_rating='4.50')['total'], ProductListing.objects.filter(rating__gte=Decimal('4.5')).count())
+        self.assertEqual(self.client.get('/catalog/api/facets/', {'min_rating': '4.2'}).status_code, 400)
+
+    def test_apply_moves_products_between_bitmaps(self):
+        facets = FacetCounts()
+        facets.load(mirrors.listing_rows().iterator())
+        product = Product.objects.filter(category=self.shoes).first()
+        product.price, product.rating = Decimal('5500'), Decimal('5')
+        facets.apply(product.pk, mirrors.product_row(product))
+        counts = facets.counts(prices=['5000+'])
+        self.assertEqual(counts['total'], ProductListing.objects.filter(price__gte=5000).count() + 1)
+        facets.apply(product.pk, None)
+        self.assertEqual(facets.counts()['total'], ProductListing.objects.count() - 1)
+
+
+class HomeTests(CatalogTestCase):
+
+    def get(self, **headers):
+        return self.client.get('/catalog/api/home/', headers=headers)
+
+    def test_payload_and_etag(self):
+        Product.objects.filter(name='Bag 1').update(is_featured=True)
+        response = self.get()
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual([category['id'] for category in body['categories']], ['bags', 'shoes'])
+        self.assertEqual([product['title'] for product in body['featuredProducts']], ['Bag 1'])
+        with self.assertNumQueries(0):
+            self.assertEqual(self.get(if_none_match=response['ETag']).status_code, 304)
+
+    def test_saves_invalidate_the_payload(self):
+        etag = self.get()['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            Category.objects.create(name='Hats', slug='hats')
+        # The stale payload is served while it is rebuilt; a second request sees the new one
+        with mock.patch.object(home, 'threading') as threading_:
+            # Rebuild in this thread, on the test's database connection
+            threading_.Thread.side_effect = lambda target, **kwargs: mock.Mock(start=target)
+            with mock.patch.object(home, 'connections'):
+                self.assertEqual(self.get()['ETag'], etag)
+        response = self.get()
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertIn('hats', [category['id'] for category in response.json()['categories']])
+
+    def test_invalidate_survives_an_evicted_version(self):
+        cache = caches['default']
+        with mock.patch.object(type(cache), 'add', return_value=False):
+            home.invalidate('categories')
+        self.assertEqual(cache.get(home.VERSION_KEY), 1)
+
+
+@override_settings(RATE_LIMIT_ENABLED=False, CATALOG_FLASH_SALE_MAX_HOLDS_PER_USER=2)
+class ReservationTests(TestCase):
+
+    def setUp(self):
+        caches['default'].clear()
+        category = Category.objects.create(name='Deals', slug='deals')
+        self.product = Product.objects.create(category=category, name='Deal', slug='deal', price=Decimal('100'))
+        self.sale = self.make_sale(quantity=10, shards=3)
+        self.users = [User.objects.create_user(f"buyer{i}@example.com", f"buyer{i}@example.com") for i in range(12)]
+
+    def make_sale(self, **fields):
+        now = timezone.now()
+        return FlashSale.objects.create(
+            product=self.product, price=Decimal('50'), starts_at=now - timedelta(minutes=1), ends_at=now + timedelta(hours=1), **fields
+        )
+
+    def held(self, sale):
+        return Reservation.objects.filter(sale=sale, status=Reservation.HELD).aggregate(units=Sum('quantity'))['units'] or 0
+
+    def test_reserve_never_oversells(self):
+        self.assertEqual(sorted(StockShard.objects.filter(sale=self.sale).values_list('stock', flat=True)), [3, 3, 4])
+        reserved, messages = 0, []
+        for user in self.users:
+            try:
+                reserved += reserve(self.sale, user.pk, 2).quantity
+            except ReservationError as e:
+                messages.append(e.message)
+        # Two units can be stranded on shards of 3 units; a single unit is still there
+        self.assertEqual(reserved, self.held(self.sale))
+        self.assertEqual(reserved + remaining(self.sale), 10)
+        self.assertIn('Not enough stock left for that quantity', messages)
+        while remaining(self.sale):
+            reserve(self.sale, self.users.pop().pk, 1)
+        with self.assertRaisesMessage(ReservationError, 'Sold out'):
+            reserve(self.sale, self.users[0].pk, 1)
+        self.assertEqual(self.held(self.sale), 10)
+
+    def test_sale_without_shards(self):
+        sale = self.make_sale(quantity=3, shards=0)
+        self.assertEqual(reserve(sale, self.users[0].pk, 2).shard, 0)
+        self.assertEqual(remaining(sale), 1)
+
+    def test_hold_limit_per_user_and_sale(self):
+        user = self.users[0]
+        first = reserve(self.sale, user.pk)
+        reserve(self.sale, user.pk)
+        with self.assertRaisesMessage(ReservationError, 'at most 2 reservations'):
+            reserve(self.sale, user.pk)
+        self.assertEqual(remaining(self.sale), 8)
+        # Other sales and users are not limited by these holds
+        reserve(self.make_sale(quantity=5, shards=1), user.pk)
+        reserve(self.sale, self.users[1].pk)
+        # Released and expired holds free a place
+        release(first)
+        reserve(self.sale, user.pk)
+        Reservation.objects.filter(sale=self.sale, user=user).update(expires_at=timezone.now() - timedelta(seconds=1))
+        reserve(self.sale, user.pk)
+
+    def test_release_expired_returns_units_to_their_shards(self):
+        holds = [reserve(self.sale, user.pk, 2) for user in self.users[:4]]
+        self.assertTrue(confirm(holds[0]))
+        expected = dict(StockShard.objects.filter(sale=self.sale).values_list('shard', 'stock'))
+        for hold in holds[1:]:
+            expected[hold.shard] += hold.quantity
+        Reservation.objects.filter(sale=self.sale).update(expires_at=timezone.now() - timedelta(seconds=1))
+        with self.assertNumQueries(2 + len({hold.shard for hold in holds[1:]}) + 2):
+            self.assertEqual(release_expired(), 3)
+        self.assertEqual(dict(StockShard.objects.filter(sale=self.sale).values_list('shard', 'stock')), expected)
+        self.assertEqual(release_expired(), 0)
+        self.assertEqual(Reservation.objects.get(pk=holds[0].pk).status, Reservation.CONFIRMED)
+        self.assertFalse(release(holds[1]))
+
+    def test_release_expired_in_batches(self):
+        for user in self.users[:5]:
+            reserve(self.sale, user.pk)
+        Reservation.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+        self.assertEqual([release_expired(batch_size=2) for _ in range(4)], [2, 2, 1, 0])
+        self.assertEqual(remaining(self.sale), 10)
+
+    def test_release_reopens_a_sold_out_sale(self):
+        sale = self.make_sale(quantity=1, shards=1)
+        hold = reserve(sale, self.users[0].pk)
+        with self.assertRaisesMessage(ReservationError, 'Sold out'):
+            reserve(sale, self.users[1].pk)
+        self.assertFalse(confirm(Reservation(pk=hold.pk + 1)))
+        self.assertTrue(release(hold))
+        self.assertFalse(release(hold))
+        self.assertFalse(confirm(hold))
+        reserve(sale, self.users[1].pk)
+
+    def test_reserve_and_release_api(self):
+        user, other = self.users[:2]
+        url = f'/catalog/api/flash-sales/{self.sale.pk}/reserve/'
+        self.assertEqual(self.client.post(url, {'quantity': 1}, content_type='application/json').status_code, 401)
+
+        auth = {'Authorization': f"Bearer {tokens.issue_tokens(user)['access_token']}"}
+        self.assertEqual(self.client.post('/catalog/api/flash-sales/0/reserve/', {}, content_type='application/json', headers=auth).status_code, 404)
+        self.assertEqual(self.client.post(url, {'quantity': 99}, content_type='application/json', headers=auth).status_code, 400)
+        response = self.client.post(url, {'quantity': 3}, content_type='application/json', headers=auth)
+        self.assertEqual(response.status_code, 200)
+        reservation = response.json()['reservation']
+        self.assertEqual((reservation['quantity'], reservation['status']), (3, 'held'))
+
+        release_url = f"/catalog/api/reservations/{reservation['id']}/release/"
+        other_auth = {'Authorization': f"Bearer {tokens.issue_tokens(other)['access_token']}"}
+        self.assertEqual(self.client.post(release_url, headers=other_auth).status_code, 404)
+        self.assertEqual(self.client.post(release_url, headers=auth).status_code, 200)
+        self.assertEqual(self.client.post(release_url, headers=auth).status_code, 409)
+        self.assertEqual(remaining(self.sale), 10)
+
+
+@override_settings(RATE_LIMIT_ENABLED=False, CATALOG_FLASH_SALE_MAX_HOLDS_PER_USER=1000)
+class ConcurrentReservationTests(TransactionTestCase):
+
+    @skipUnlessDBFeature('test_db_allows_multiple_connections')
+    def test_concurrent_buyers_never_oversell(self):
+        caches['default'].clear()
+        category = Category.objects.create(name='Deals', slug='deals')
+        product = Product.objects.create(category=category, name='Deal', slug='deal', price=Decimal('100'))
+        now = timezone.now()
+        sale = FlashSale.objects.create(
+            product=product, price=Decimal('50'), quantity=60, shards=4, starts_at=now - timedelta(minutes=1), ends_at=now + timedelta(hours=1)
+        )
+        users = [User.objects.create_user(f"buyer{i}@example.com", f"buyer{i}@example.com") for i in range(8)]
+        told = []
+
+        def buy(user):
+            try:
+                while True:
+                    try:
+                        told.append(reserve(sale, user.pk, 2).quantity)
+                    except ReservationError:
+                        break
+            finally:
+                connection.close()
+
+        buyers = [threading.Thread(target=buy, args=(user,)) for user in users]
+        for buyer in buyers:
+            buyer.start()
+        for buyer in buyers:
+            buyer.join()
+        held = Reservation.objects.filter(sale=sale).aggregate(units=Sum('quantity'))['units']
+        self.assertEqual(sum(told), held)
+        self.assertEqual(held + remaining(sale), 60)
+        self.assertGreaterEqual(held, 60 - 4)
@@ -0,0 +1,12 @@
+from django.urls import path
+from . import views
+
+urlpatterns = [
+    path('api/products/', views.product_list_api, name='product_list_api'),
+    path('api/search/', views.product_search_api, name='product_search_api'),
+    path('api/autocomplete/', views.autocomplete_api, name='autocomplete_api'),
+    path('api/facets/', views.facet_counts_api, name='facet_counts_api'),
+    path('api/home/', views.home_api, name='home_api'),
+    path('api/flash-sales/<int:sale_id>/reserve/', views.reserve_api, name='reserve_api'),
+    path('api/reservations/<int:reservation_id>/release/', views.release_reservation_api, name='release_reservation_api'),
+]
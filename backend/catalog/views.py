@@ -0,0 +1,242 @@
+from asgiref.sync import sync_to_async
+from decimal import Decimal
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.http import http_date
+from account.api import ApiError, ApiView, Number, Schema, String
+from account.profile_cache import is_not_modified
+from account.responses import json_response
+from ecommerce.routers import read_from_replica
+from . import autocomplete, home
+from .facets import facet_counts, price_buckets
+from .listing import COLUMNS, SORTS, decode_cursor, listing_page, serialize_listing
+from .models import FlashSale, ProductListing, Reservation
+from .reservations import ReservationError, release, reserve
+from .search import get_search_backend
+
+
+class ProductListApi(ApiView):
+    """
+    API endpoint for the shop grid, one keyset-paginated page at a time
+    Query parameters: category, min_price, max_price, min_rating,
+    sort=newest|price_asc|price_desc|rating, limit, after (next_cursor of the previous page)
+    """
+    methods = ('GET',)
+    schema = Schema(
+        String('category', lower=True),
+        Number('min_price', minimum=0, message='min_price must be a positive number'),
+        Number('max_price', minimum=0, message='max_price must be a positive number'),
+        Number('min_rating', minimum=0, maximum=5, message='min_rating must be between 0 and 5'),
+        String('sort'),
+        Number('limit', integer=True, minimum=1, message='limit must be a positive whole number'),
+        String('after'),
+    )
+    
+    async def get(self, request, data):
+        sort = data.get('sort') or 'newest'
+        if sort not in SORTS:
+            raise ApiError(400, f"Unsupported sort. Use one of: {', '.join(SORTS)}")
+        
+        after = None
+        if data.get('after'):
+            after = decode_cursor(data['after'], sort)
+            if after is None:
+                raise ApiError(400, 'Invalid cursor')
+        
+        products, next_cursor = await sync_to_async(listing_page)(
+            sort=sort,
+            after=after,
+            limit=min(data.get('limit') or settings.CATALOG_PAGE_SIZE, settings.CATALOG_MAX_PAGE_SIZE),
+            category=data.get('category'),
+            min_price=data.get('min_price'),
+            max_price=data.get('max_price'),
+            min_rating=data.get('min_rating'),
+        )
+        
+        return json_response({
+            'success': True,
+            'products': products,
+            'next_cursor': next_cursor
+        })
+
+
+def search_products(query, limit, category=None):
+    """Serialized listing rows of the best matches, best first"""
+    # Category filtering happens after ranking; fetch extra matches for it
+    product_ids = get_search_backend().search(query, limit * 4 if category else limit)
+    rows = ProductListing.objects.filter(product_id__in=product_ids)
+    if category:
+        rows = rows.filter(category_slug=category)
+    rows = {row['product_id']: row for row in rows.values(*COLUMNS)}
+    return [serialize_listing(rows[pk]) for pk in product_ids if pk in rows][:limit]
+
+
+class ProductSearchApi(ApiView):
+    """
+    API endpoint for the search box: products ranked by relevance
+    Query parameters: q, category, limit
+    """
+    methods = ('GET',)
+    schema = Schema(
+        String('q', required=True),
+        String('category', lower=True),
+        Number('limit', integer=True, minimum=1, message='limit must be a positive whole number'),
+        required_message='Search text is required',
+    )
+    
+    async def get(self, request, data):
+        limit = min(data.get('limit') or settings.CATALOG_PAGE_SIZE, settings.CATALOG_MAX_PAGE_SIZE)
+        products = await sync_to_async(search_products)(data['q'], limit, data.get('category'))
+        return json_response({
+            'success': True,
+            'products': products
+        })
+
+
+class AutocompleteApi(ApiView):
+    """
+    API endpoint for search box suggestions while typing
+    Query parameters: q (prefix of any word of a product name), limit
+    """
+    methods = ('GET',)
+    schema = Schema(
+        String('q', required=True),
+        Number('limit', integer=True, minimum=1, message='limit must be a positive whole number'),
+        required_message='Search text is required',
+    )
+    
+    async def get(self, request, data):
+        limit = min(data.get('limit') or settings.CATALOG_AUTOCOMPLETE_LIMIT, settings.CATALOG_MAX_PAGE_SIZE)
+        # Only touches the database to build or refresh the process's index
+        suggestions = await sync_to_async(autocomplete.suggest)(data['q'], limit)
+        return json_response({
+            'success': True,
+            'suggestions': suggestions
+        })
+
+
+class FacetCountsApi(ApiView):
+    """
+    API endpoint for the shop sidebar counts, e.g. "Electronics (1,204)"
+    Query parameters: category, price (comma-separated bucket keys such as 0-500,500-1000),
+    min_rating (0 or one of the rating options)
+    Each facet is counted with the other facets' filters applied.
+    """
+    methods = ('GET',)
+    schema = Schema(
+        String('category', lower=True),
+        String('price'),
+        Number('min_rating', message='min_rating must be a number'),
+    )
+    
+    async def get(self, request, data):
+        prices = [key.strip() for key in data.get('price', '').split(',') if key.strip()]
+        buckets = [key for key, _, _ in price_buckets()]
+        if any(key not in buckets for key in prices):
+            raise ApiError(400, f"Unknown price range. Use any of: {', '.join(buckets)}")
+        
+        min_rating = data.get('min_rating') or None
+        ratings = [Decimal(rating) for rating in settings.CATALOG_FACET_RATINGS]
+        if min_rating is not None and min_rating not in ratings:
+            raise ApiError(400, f"min_rating must be 0 or one of: {', '.join(settings.CATALOG_FACET_RATINGS)}")
+        
+        # Answered from memory; only touches the database to build or refresh the counts
+        counts = await sync_to_async(facet_counts)(category=data.get('category'), prices=prices, min_rating=min_rating)
+        return json_response({
+            'success': True,
+            **counts
+        })
+
+
+def set_home_validators(response, payload):
+    response['ETag'] = payload['etag']
+    response['Last-Modified'] = http_date(payload['last_modified'])
+    # Same for every visitor; browsers revalidate with the ETag each time
+    response['Cache-Control'] = 'public, no-cache'
+    return response
+
+
+class HomeApi(ApiView):
+    """
+    API endpoint for the Home page: slides, flashSales, categories and
+    featuredProducts in one response, served from a cached pre-serialized body
+    """
+    methods = ('GET',)
+    parse_body = False
+    
+    async def get(self, request):
+        payload = await sync_to_async(home.get_payload)()
+        
+        if is_not_modified(request, payload):
+            return set_home_validators(HttpResponseNotModified(), payload)
+        
+        response = HttpResponse(payload['body'], content_type='application/json')
+        return set_home_validators(response, payload)
+
+
+def serialize_reservation(reservation):
+    return {
+        'id': reservation.pk,
+        'sale_id': reservation.sale_id,
+        'quantity': reservation.quantity,
+        'status': reservation.status,
+        'expires_at': reservation.expires_at.isoformat(),
+    }
+
+
+class ReserveApi(ApiView):
+    """
+    API endpoint to hold flash sale units for the current user
+    Requires a valid access token; the hold expires unless confirmed at checkout.
+    """
+    auth = 'token'
+    schema = Schema(
+        Number('quantity', integer=True, minimum=1, message='quantity must be a positive whole number'),
+    )
+    
+    async def post(self, request, data, sale_id):
+        sale = await FlashSale.objects.filter(pk=sale_id).afirst()
+        if sale is None:
+            raise ApiError(404, 'Flash sale not found')
+        
+        try:
+            reservation = await sync_to_async(reserve)(sale, request.token_user_id, data.get('quantity', 1))
+        except ReservationError as e:
+            raise ApiError(e.status, e.message)
+        
+        return json_response({
+            'success': True,
+            'message': 'Reserved',
+            'reservation': serialize_reservation(reservation)
+        })
+
+
+class ReleaseReservationApi(ApiView):
+    """
+    API endpoint to give back a held reservation (e.g. item removed from the cart)
+    Requires a valid access token; users can only release their own reservations.
+    """
+    auth = 'token'
+    parse_body = False
+    
+    async def post(self, request, reservation_id):
+        reservation = await Reservation.objects.filter(pk=reservation_id, user_id=request.token_user_id).afirst()
+        if reservation is None:
+            raise ApiError(404, 'Reservation not found')
+        
+        if not await sync_to_async(release)(reservation):
+            raise ApiError(409, 'Reservation is no longer held')
+        
+        return json_response({
+            'success': True,
+            'message': 'Reservation released'
+        })
+
+
+product_list_api = read_from_replica(ProductListApi.as_view())
+product_search_api = read_from_replica(ProductSearchApi.as_view())
+autocomplete_api = read_from_replica(AutocompleteApi.as_view())
+facet_counts_api = read_from_replica(FacetCountsApi.as_view())
+home_api = read_from_replica(HomeApi.as_view())
+reserve_api = ReserveApi.as_view()
+release_reservation_api = ReleaseReservationApi.as_view()
@@ -14,3 +14,7 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ecommerce.settings')
 
 application = get_asgi_application()
+
+# Periodic OTP pruning in web processes only (no-op unless OTP_PRUNE_INTERVAL is set)
+from account import scheduler  # noqa: E402
+scheduler.start()
@@ -0,0 +1,68 @@
+"""
+Database routing for read replicas.
+
+Every query goes to 'default' except reads made while a view decorated with
+read_from_replica is running, which go to a random replica alias
+(settings.DATABASE_REPLICAS). Without replicas configured everything uses
+'default', so local development needs no extra setup.
+
+Replicas lag behind the primary: only mark views that can show slightly old
+data, and refresh caches from the primary after writes (see
+account.profile_cache.cache_profile).
+"""
+from asgiref.sync import iscoroutinefunction
+from contextlib import contextmanager
+from contextvars import ContextVar
+from django.conf import settings
+from functools import wraps
+import random
+
+# Copied into sync_to_async threads along with the rest of the context
+_replica_reads = ContextVar('replica_reads', default=False)
+
+
+@contextmanager
+def replica_reads():
+    """Send reads inside the block to a replica"""
+    token = _replica_reads.set(True)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+def read_from_replica(view):
+    """Decorator for read-only views (sync or async)"""
+    if iscoroutinefunction(view):
+        @wraps(view)
+        async def wrapper(*args, **kwargs):
+            with replica_reads():
+                return await view(*args, **kwargs)
+    else:
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            with replica_reads():
+                return view(*args, **kwargs)
+    return wrapper
+
+
+class ReplicaRouter:
+    # Always read from the primary: a session written at login must be visible
+    # on the very next request
+    primary_app_labels = {'sessions'}
+
+    def db_for_read(self, model, **hints):
+        replicas = settings.DATABASE_REPLICAS
+        if replicas and _replica_reads.get() and model._meta.app_label not in self.primary_app_labels:
+            return random.choice(replicas)
+        return 'default'
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same data as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == 'default'
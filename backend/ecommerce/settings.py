@@ -10,6 +10,8 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/6.0/ref/settings/
 """
 
+import os
+from copy import deepcopy
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -38,14 +40,18 @@ INSTALLED_APPS = [
     'django.contrib.messages',
     'django.contrib.staticfiles',
     'account',
+    'catalog',
 ]
 
 MIDDLEWARE = [
+    'account.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'account.middleware.TokenAuthMiddleware',
+    'account.middleware.RateLimitMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -72,14 +78,144 @@ WSGI_APPLICATION = 'ecommerce.wsgi.application'
 
 # Database
 # https://docs.djangoproject.com/en/6.0/ref/settings/#databases
+#
+# SQLite by default for local development. For production set DB_ENGINE=postgresql
+# and DB_NAME, DB_USER, DB_PASSWORD, DB_HOST, DB_PORT. DB_REPLICAS is a
+# comma-separated list of read replicas used by views decorated with
+# ecommerce.routers.read_from_replica: hosts (host or host:port) for PostgreSQL,
+# database files for SQLite (point one at the primary file to try the routing).
+
+DB_ENGINE = os.environ.get('DB_ENGINE', 'sqlite')
+DB_REPLICAS = [replica.strip() for replica in os.environ.get('DB_REPLICAS', '').split(',') if replica.strip()]
+
+if DB_ENGINE == 'postgresql':
+    _primary = {
+        'ENGINE': 'django.db.backends.postgresql',
+        'NAME': os.environ.get('DB_NAME', 'sreca'),
+        'USER': os.environ.get('DB_USER', 'sreca'),
+        'PASSWORD': os.environ.get('DB_PASSWORD', ''),
+        'HOST': os.environ.get('DB_HOST', 'localhost'),
+        'PORT': os.environ.get('DB_PORT', '5432'),
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {},
+    }
+    _pool_size = int(os.environ.get('DB_POOL_MAX_SIZE', '0'))
+    if _pool_size:
+        # psycopg 3 connection pool per process (replaces persistent connections)
+        _primary['CONN_MAX_AGE'] = 0
+        _primary['OPTIONS']['pool'] = {
+            'min_size': int(os.environ.get('DB_POOL_MIN_SIZE', '2')),
+            'max_size': _pool_size,
+            'timeout': int(os.environ.get('DB_POOL_TIMEOUT', '10')),
+        }
+    else:
+        # Seconds a connection is kept open between requests
+        _primary['CONN_MAX_AGE'] = int(os.environ.get('DB_CONN_MAX_AGE', '60'))
+
+    def _replica(address):
+        host, _, port = address.partition(':')
+        return {**_primary, 'HOST': host, 'PORT': port or _primary['PORT'], 'OPTIONS': deepcopy(_primary['OPTIONS'])}
+else:
+    _primary = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.environ.get('DB_NAME') or BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            # WAL lets readers run alongside the single writer
+            'init_command': 'PRAGMA journal_mode=WAL; PRAGMA synchronous=NORMAL;',
+            'transaction_mode': 'IMMEDIATE',
+        },
+    }
+
+    def _replica(path):
+        return {**_primary, 'NAME': path, 'OPTIONS': deepcopy(_primary['OPTIONS'])}
 
-DATABASES = {
+DATABASES = {'default': _primary}
+for _index, _address in enumerate(DB_REPLICAS):
+    # Tests read replicas through the default connection
+    DATABASES[f'replica_{_index}'] = {**_replica(_address), 'TEST': {'MIRROR': 'default'}}
+
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+DATABASE_ROUTERS = ['ecommerce.routers.ReplicaRouter']
+
+
+# Cache
+# https://docs.djangoproject.com/en/6.0/topics/cache/
+
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'sreca-default',
     }
 }
 
+# Cache alias holding serialized profiles for get_profile_api
+PROFILE_CACHE_ALIAS = 'default'
+PROFILE_CACHE_TIMEOUT = 60 * 60
+
+# CORS for the JSON API (account.middleware.CorsMiddleware)
+CORS_PATH_PREFIXES = ['/account/api/', '/catalog/api/']
+CORS_ALLOW_ORIGIN = '*'
+CORS_ALLOW_METHODS = ['GET', 'POST', 'PUT', 'DELETE', 'OPTIONS']
+CORS_ALLOW_HEADERS = ['Content-Type', 'Authorization']
+# Seconds browsers may cache a preflight result
+CORS_MAX_AGE = 86400
+
+# API rate limits (rules per URL name are in account/urls.py). Counters must
+# live in a cache shared by all workers (e.g. Redis) to be exact in production.
+RATE_LIMIT_ENABLED = os.environ.get('RATE_LIMIT_ENABLED', 'true').lower() != 'false'
+RATE_LIMIT_CACHE_ALIAS = 'default'
+# Header holding the client address when behind a trusted proxy, e.g. 'HTTP_X_FORWARDED_FOR'
+RATE_LIMIT_IP_HEADER = os.environ.get('RATE_LIMIT_IP_HEADER') or None
+
+# user_list admin page
+USER_LIST_PAGE_SIZE = 50
+USER_COUNT_CACHE_TIMEOUT = 5 * 60
+# Above this many rows (PostgreSQL only) the total comes from the planner estimate
+USER_COUNT_ESTIMATE_THRESHOLD = 100000
+# Records read per import_users_api request; its passwords are hashed inline
+# in the web worker, so larger imports belong to `manage.py import_users`
+USER_IMPORT_API_MAX_ROWS = 100
+
+
+# Shop grid (catalog.views.product_list_api)
+CATALOG_PAGE_SIZE = 24
+CATALOG_MAX_PAGE_SIZE = 100
+# PostgreSQL text search configuration of the product search index (catalog.search)
+CATALOG_SEARCH_CONFIG = 'english'
+# Suggestions per autocomplete_api response
+CATALOG_AUTOCOMPLETE_LIMIT = 8
+# In-memory listing copies (catalog.mirrors: autocomplete, facet counts):
+# how often each process catches up with products saved by other processes,
+# and rebuilds in full to drop any drift
+CATALOG_MIRROR_REFRESH_SECONDS = 10
+CATALOG_MIRROR_REBUILD_SECONDS = 15 * 60
+# Cache alias holding the mirrors' generation counter; must be shared by all workers
+CATALOG_MIRROR_CACHE_ALIAS = 'default'
+# Sidebar facet counts (catalog.facets): price bucket edges and min rating options
+CATALOG_FACET_PRICE_EDGES = [500, 1000, 2000, 5000]
+CATALOG_FACET_RATINGS = ['3', '4', '4.5']
+# Home page payload (catalog.home): seconds each section stays fresh, and how
+# long a stale payload is still served while one worker rebuilds it
+CATALOG_HOME_TTLS = {
+    'slides': 60 * 60,
+    'flashSales': 60,
+    'categories': 60 * 60,
+    'featuredProducts': 10 * 60,
+}
+CATALOG_HOME_STALE_SECONDS = 5 * 60
+CATALOG_HOME_FLASH_SALES = 8
+CATALOG_HOME_FEATURED_PRODUCTS = 8
+# Cache alias holding the payload and its rebuild lock; must be shared by all workers
+CATALOG_HOME_CACHE_ALIAS = 'default'
+# Flash sale reservations (catalog.reservations): how long units stay held
+# before the sweeper (manage.py release_expired_holds) returns them, the most
+# units per reservation and the most unexpired holds a user may have on a sale
+CATALOG_FLASH_SALE_HOLD_SECONDS = 10 * 60
+CATALOG_FLASH_SALE_MAX_QUANTITY = 5
+CATALOG_FLASH_SALE_MAX_HOLDS_PER_USER = 2
+# Cache alias holding the sold-out flags; must be shared by all workers
+CATALOG_FLASH_SALE_CACHE_ALIAS = 'default'
+
 
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
@@ -100,6 +236,31 @@ AUTH_PASSWORD_VALIDATORS = [
 ]
 
 
+# Authentication
+
+AUTHENTICATION_BACKENDS = [
+    'account.backends.EmailBackend',
+    'django.contrib.auth.backends.ModelBackend',
+]
+
+# PBKDF2 work factor; unset keeps Django's default. Tune it so one hash takes
+# the target time on the deployment hardware (see `manage.py bench_login`).
+PASSWORD_HASH_ITERATIONS = int(os.environ['PASSWORD_HASH_ITERATIONS']) if os.environ.get('PASSWORD_HASH_ITERATIONS') else None
+
+# Lifetimes (seconds) of the signed API tokens issued by login_api
+ACCESS_TOKEN_LIFETIME = 15 * 60
+REFRESH_TOKEN_LIFETIME = 14 * 24 * 60 * 60
+
+PASSWORD_HASHERS = [
+    'account.hashers.TunablePBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+]
+
+
 # Internationalization
 # https://docs.djangoproject.com/en/6.0/topics/i18n/
 
@@ -120,3 +281,65 @@ STATIC_URL = 'static/'
 # Media files (User uploaded files)
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
+
+STORAGES = {
+    # Uploads are stored once per distinct content, named by hash (account.storage)
+    'default': {'BACKEND': 'account.storage.ContentAddressedStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+}
+
+# How MEDIA_URL is served (account.media): 'django' streams files from Python
+# (development), 'x-accel-redirect' (nginx) or 'x-sendfile' (Apache, lighttpd)
+# let the web server send them
+MEDIA_SERVE_MODE = os.environ.get('MEDIA_SERVE_MODE', 'django')
+# nginx `internal` location aliased to MEDIA_ROOT
+MEDIA_ACCEL_REDIRECT_PREFIX = os.environ.get('MEDIA_ACCEL_REDIRECT_PREFIX', '/protected-media/')
+
+# Profile images (variants are made by `manage.py process_profile_images`)
+PROFILE_IMAGE_MAX_UPLOAD_SIZE = 5 * 1024 * 1024
+PROFILE_IMAGE_MAX_PIXELS = 40_000_000
+PROFILE_IMAGE_FORMATS = ('JPEG', 'PNG', 'GIF', 'WEBP')
+# Longest side of the re-encoded original
+PROFILE_IMAGE_MAX_DIMENSION = 1024
+# Square thumbnail sizes in pixels, each saved as WebP and JPEG (PNG with transparency)
+PROFILE_IMAGE_SIZES = (64, 256)
+# Variant returned by the profile APIs (the frontend shows avatars up to 128 CSS px)
+PROFILE_IMAGE_API_SIZE = 256
+# Returned as the image URL until the variants exist (uploads as received keep
+# their EXIF metadata and are never served); None shows the initials avatar
+PROFILE_IMAGE_PLACEHOLDER_URL = os.environ.get('PROFILE_IMAGE_PLACEHOLDER_URL') or None
+
+
+# Mailjet
+# Point MAILJET_API_URL at `manage.py mailjet_stub_server` to run without the real API
+MAILJET_API_URL = os.environ.get('MAILJET_API_URL', 'https://api.mailjet.com/')
+MAILJET_TIMEOUT = 10
+MAILJET_POOL_SIZE = 10
+# Mailjet v3.1 accepts at most 50 messages per send call
+MAILJET_MAX_MESSAGES_PER_CALL = 50
+# Seconds other worker processes may keep using cached MailjetSettings after a change
+MAILJET_SETTINGS_CACHE_TTL = 60
+
+# Email outbox (delivered by `manage.py process_email_outbox`)
+EMAIL_OUTBOX_MAX_ATTEMPTS = 5
+EMAIL_OUTBOX_BACKOFF_SECONDS = 30
+EMAIL_OUTBOX_MAX_BACKOFF_SECONDS = 3600
+EMAIL_OUTBOX_LEASE_SECONDS = 300
+# Sent rows are deleted by the worker this long after sending (failed ones are
+# kept for the admin; the OTP in a row's context is blanked once it is done)
+EMAIL_OUTBOX_KEEP_SENT_SECONDS = 24 * 60 * 60
+EMAIL_OUTBOX_PRUNE_INTERVAL = 10 * 60
+
+# Password reset OTPs
+# account.otp_store.DatabaseOTPStore (PasswordResetOTP table) or account.otp_store.CacheOTPStore
+OTP_STORE = os.environ.get('OTP_STORE', 'account.otp_store.DatabaseOTPStore')
+# Cache alias used by CacheOTPStore; must be shared by all workers (e.g. Redis) in production
+OTP_CACHE_ALIAS = 'default'
+OTP_TTL_SECONDS = 15 * 60
+# Both OTP stores lock an email's codes after this many wrong guesses, until a new code is issued
+OTP_MAX_ATTEMPTS = 5
+# Expired and used PasswordResetOTP rows are deleted by `manage.py prune_otps`
+OTP_PRUNE_BATCH_SIZE = 1000
+# Seconds between prune runs in each web process (account.scheduler, started by
+# ecommerce.wsgi/asgi); 0 disables it (use cron or `prune_otps --interval` instead)
+OTP_PRUNE_INTERVAL = int(os.environ.get('OTP_PRUNE_INTERVAL', '0'))
@@ -95,11 +95,10 @@ export const resendPasswordResetOTP = async (email) => {
 };
 
 // Profile API functions
-export const getProfile = async (userId) => {
+// The caller is identified by the access token, so no user ID is sent
+export const getProfile = async () => {
   try {
-    const response = await api.get('/account/api/profile/', {
-      params: { user_id: userId }
-    });
+    const response = await api.get('/account/api/profile/');
     return response.data;
   } catch (error) {
     const errorData = error.response?.data || {};
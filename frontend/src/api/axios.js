@@ -11,14 +11,51 @@ const api = axios.create({
   },
 });
 
+const ACCESS_TOKEN_KEY = 'accessToken';
+const REFRESH_TOKEN_KEY = 'refreshToken';
+
+export const setTokens = (accessToken, refreshToken) => {
+  localStorage.setItem(ACCESS_TOKEN_KEY, accessToken);
+  if (refreshToken) {
+    localStorage.setItem(REFRESH_TOKEN_KEY, refreshToken);
+  }
+};
+
+export const clearTokens = () => {
+  localStorage.removeItem(ACCESS_TOKEN_KEY);
+  localStorage.removeItem(REFRESH_TOKEN_KEY);
+};
+
+// Exchange the refresh token for a new token pair (shared by concurrent 401s)
+let refreshPromise = null;
+const refreshTokens = () => {
+  if (!refreshPromise) {
+    const refreshToken = localStorage.getItem(REFRESH_TOKEN_KEY);
+    refreshPromise = axios
+      .post(`${API_BASE_URL}/account/api/token/refresh/`, { refresh_token: refreshToken })
+      .then((response) => {
+        setTokens(response.data.access_token, response.data.refresh_token);
+        return response.data.access_token;
+      })
+      .catch((error) => {
+        clearTokens();
+        throw error;
+      })
+      .finally(() => {
+        refreshPromise = null;
+      });
+  }
+  return refreshPromise;
+};
+
 // Request interceptor
 api.interceptors.request.use(
   (config) => {
-    // You can add auth tokens here if needed
-    // const token = localStorage.getItem('token');
-    // if (token) {
-    //   config.headers.Authorization = `Bearer ${token}`;
-    // }
+    // Send the access token issued at login
+    const token = localStorage.getItem(ACCESS_TOKEN_KEY);
+    if (token) {
+      config.headers.Authorization = `Bearer ${token}`;
+    }
     return config;
   },
   (error) => {
@@ -31,7 +68,26 @@ api.interceptors.response.use(
   (response) => {
     return response;
   },
-  (error) => {
+  async (error) => {
+    const originalRequest = error.config;
+
+    // Access token expired: refresh once and retry the request
+    if (
+      error.response?.status === 401 &&
+      originalRequest &&
+      !originalRequest._retried &&
+      localStorage.getItem(REFRESH_TOKEN_KEY)
+    ) {
+      originalRequest._retried = true;
+      try {
+        const token = await refreshTokens();
+        originalRequest.headers.Authorization = `Bearer ${token}`;
+        return api(originalRequest);
+      } catch (refreshError) {
+        return Promise.reject(error);
+      }
+    }
+
     // Handle common errors
     if (error.response) {
       // Server responded with error status
@@ -50,8 +50,8 @@ function ProtectedRoute({ children }) {
         }
       } catch (error) {
         // Check if it's a 404 (user not found) or network error
-        if (error.response?.status === 404) {
-          // User not found in backend, clear localStorage and redirect
+        if (error.response?.status === 404 || error.response?.status === 401) {
+          // User not found in backend or session expired, clear localStorage and redirect
           localStorage.removeItem('user');
           setIsAuthenticated(false);
         } else {
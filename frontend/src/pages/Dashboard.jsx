@@ -3,6 +3,7 @@ import { useNavigate, useLocation } from "react-router-dom";
 import { useTheme } from "../context/ThemeContext";
 import avatar from "../images/avatar.png";
 import { getProfile } from "../api/auth";
+import { clearTokens } from "../api/axios";
 import {
   FaUser,
   FaStore,
@@ -123,8 +124,9 @@ function Dashboard() {
 
   // Logout handler
   const handleLogout = () => {
-    // Clear user data from localStorage
+    // Clear user data and API tokens from localStorage
     localStorage.removeItem('user');
+    clearTokens();
     // Redirect to login page
     navigate('/login');
   };
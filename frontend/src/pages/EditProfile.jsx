@@ -230,7 +230,6 @@ function EditProfile() {
       // Prepare profile data
       const profileData = {
         user_id: id,
-        authenticated_user_id: user.id, // SECURITY: Send logged-in user ID for authorization check
         email: user.email, // Add email for FormData compatibility
         full_name: formData.fullName,
         date_of_birth: formData.dateOfBirth,
@@ -2,6 +2,7 @@ import React, { useState, useEffect } from "react";
 import { Link, useNavigate } from "react-router-dom";
 import { useTheme } from '../context/ThemeContext';
 import { login } from '../api/auth';
+import { setTokens } from '../api/axios';
 import logoBlack from "../images/branding-black.png";
 import logoWhite from "../images/branding-white.png";
 import googleLogo from "../images/google-logo.png";
@@ -118,6 +119,10 @@ function Login() {
                 if (response.user) {
                     localStorage.setItem('user', JSON.stringify(response.user));
                 }
+                // Store API tokens (sent as a Bearer header by the axios instance)
+                if (response.access_token) {
+                    setTokens(response.access_token, response.refresh_token);
+                }
                 // Redirect to dashboard after 1 second
                 setTimeout(() => {
                     navigate('/dashboard');